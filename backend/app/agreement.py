@@ -0,0 +1,434 @@
+"""Avaliações independentes por revisor e concordância entre revisores.
+
+Cada revisor grava a sua própria avaliação de um resultado (``revisor_id``
+preenchido); a avaliação de consenso continua sendo a de ``revisor_id``
+NULL, editada pelo caminho normal de `main`. Só a de consenso entra no
+resumo, na matriz e nas exportações do projeto.
+
+As respostas e julgamentos de todos os revisores de um projeto ficam
+codificados em matrizes ``int8`` com a mesma codificação de `analytics`.
+Para cada par de revisores são mantidas as matrizes de confusão de todas as
+perguntas (perguntas × 7 × 7) e de todos os julgamentos (colunas × 4 × 4),
+das quais saem kappa de Cohen e concordância percentual de uma vez. Cada
+gravação de revisão atualiza só a linha do resultado e a contribuição dele
+às matrizes de confusão em cache; uma gravação feita por outro processo
+muda a impressão digital (quantidade e soma das versões das revisões) e
+força a reconstrução na leitura seguinte.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from . import models, revisions
+from .analytics import ANSWER_LABELS, NO_ANSWER_CODE, _ANSWER_INDEX, load_questions
+from .import_export import _score_domains
+from .matrix import CODE_LABELS, MATRIX_COLUMNS, PROJECT_DOMAINS, judgement_code
+
+_ANSWER_WIDTH = len(ANSWER_LABELS)
+_JUDGEMENT_WIDTH = len(CODE_LABELS)
+_GLOBAL_COLUMN = len(PROJECT_DOMAINS)
+
+_MATRIX_CACHE_SIZE = int(os.getenv("AGREEMENT_CACHE_SIZE", "16"))
+_MATRIX_CACHE: Dict[int, "ReviewMatrix"] = {}
+_PAIR_CACHE: Dict[Tuple[int, int, int], "PairConfusion"] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+class ReviewerRows(NamedTuple):
+    presente: np.ndarray  # bool, (n,): o revisor avaliou o resultado
+    respostas: np.ndarray  # int8, (n, perguntas)
+    julgamentos: np.ndarray  # int8, (n, colunas de MATRIX_COLUMNS)
+
+
+class ReviewMatrix(NamedTuple):
+    impressao: Tuple[int, int]  # (quantidade, soma das versões) das revisões do projeto
+    resultado_ids: np.ndarray  # int32, (n,)
+    linhas: Dict[int, int]  # resultado_id -> linha
+    revisores: Dict[int, ReviewerRows]
+
+
+class PairConfusion(NamedTuple):
+    impressao: Tuple[int, int]
+    perguntas: np.ndarray  # int64, (perguntas, 7, 7): [pergunta, resposta A, resposta B]
+    julgamentos: np.ndarray  # int64, (colunas, 4, 4): [coluna, julgamento A, julgamento B]
+
+
+# --- Gravação -----------------------------------------------------------------
+
+
+def get_review(db, resultado_id: int, revisor_id: int) -> Optional[models.Evaluation]:
+    return db.execute(
+        select(models.Evaluation)
+        .options(selectinload(models.Evaluation.dominios))
+        .where(models.Evaluation.resultado_id == resultado_id, models.Evaluation.revisor_id == revisor_id)
+    ).scalar_one_or_none()
+
+
+def list_reviews(db, resultado_id: int) -> List[models.Evaluation]:
+    """Avaliações independentes do resultado, por revisor."""
+    return list(
+        db.execute(
+            select(models.Evaluation)
+            .options(selectinload(models.Evaluation.dominios))
+            .where(models.Evaluation.resultado_id == resultado_id, models.Evaluation.revisor_id.is_not(None))
+            .order_by(models.Evaluation.revisor_id)
+        ).scalars()
+    )
+
+
+def save_review(
+    db,
+    usuario: models.User,
+    resultado: models.Result,
+    dominios: List[Dict[str, Any]],
+    pre_consideracoes: Optional[str] = None,
+) -> Tuple[models.Evaluation, bool]:
+    """Cria ou atualiza a avaliação independente de ``usuario`` para o resultado.
+
+    Não faz commit; depois do commit, chame `apply_saved_review` para
+    atualizar as estatísticas em cache. Devolve a avaliação e se ela é nova.
+    """
+    avaliacao = get_review(db, resultado.id, usuario.id)
+    nova = avaliacao is None
+    if nova:
+        avaliacao = models.Evaluation(resultado_id=resultado.id, revisor_id=usuario.id, criado_por_id=usuario.id)
+        db.add(avaliacao)
+        db.flush()
+    else:
+        avaliacao.versao = models.Evaluation.versao + 1
+    estado_anterior = revisions.evaluation_state(avaliacao)
+
+    domain_values, evaluation_values = _score_domains(dominios)
+    avaliacao.pre_consideracoes = pre_consideracoes
+    for field, value in evaluation_values.items():
+        setattr(avaliacao, field, value)
+    avaliacao.dominios.clear()
+    novos_dominios = [models.Domain(avaliacao_id=avaliacao.id, **values) for values in domain_values]
+    db.add_all(novos_dominios)
+    db.flush()
+
+    revisions.record_revision(
+        db, avaliacao.id, usuario.id, estado_anterior, revisions.evaluation_state(avaliacao, novos_dominios)
+    )
+    return avaliacao, nova
+
+
+# --- Codificação --------------------------------------------------------------
+
+
+def _fingerprint(db, project_id: int) -> Tuple[int, int]:
+    count, total = db.execute(
+        select(func.count(models.Evaluation.id), func.coalesce(func.sum(models.Evaluation.versao), 0))
+        .join(models.Result, models.Result.id == models.Evaluation.resultado_id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .where(models.Study.projeto_id == project_id, models.Evaluation.revisor_id.is_not(None))
+    ).one()
+    return int(count), int(total)
+
+
+def _empty_rows(n: int, perguntas: int) -> ReviewerRows:
+    return ReviewerRows(
+        np.zeros(n, dtype=bool),
+        np.zeros((n, perguntas), dtype=np.int8),
+        np.zeros((n, len(MATRIX_COLUMNS)), dtype=np.int8),
+    )
+
+
+def encode_review(
+    dominios: Dict[int, Tuple[Dict[str, str], Optional[str]]], julgamento_global: Optional[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Linha codificada de uma avaliação; ``dominios`` mapeia tipo ->
+    (respostas, julgamento)."""
+    perguntas = load_questions()
+    question_index = {qid: idx for idx, qid in enumerate(perguntas)}
+    respostas = np.zeros(len(perguntas), dtype=np.int8)
+    julgamentos = np.zeros(len(MATRIX_COLUMNS), dtype=np.int8)
+    julgamentos[_GLOBAL_COLUMN] = judgement_code(julgamento_global)
+    for tipo, (answers, julgamento) in dominios.items():
+        if tipo in PROJECT_DOMAINS:
+            julgamentos[PROJECT_DOMAINS.index(tipo)] = judgement_code(julgamento)
+        for qid, answer in (answers or {}).items():
+            idx = question_index.get(qid)
+            if idx is not None:
+                respostas[idx] = _ANSWER_INDEX.get(answer, NO_ANSWER_CODE)
+    return respostas, julgamentos
+
+
+def build_review_matrix(db, project_id: int, impressao: Tuple[int, int] = (0, 0)) -> ReviewMatrix:
+    """Codifica as revisões de todo o projeto com duas consultas Core."""
+    perguntas = load_questions()
+    ids = db.execute(
+        select(models.Result.id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .where(models.Study.projeto_id == project_id)
+        .order_by(models.Result.id)
+    ).scalars().all()
+    linhas = {resultado_id: idx for idx, resultado_id in enumerate(ids)}
+
+    avaliacoes: Dict[Tuple[int, int], Tuple[Optional[str], Dict[int, Tuple[Dict[str, str], Optional[str]]]]] = {}
+    stmt = (
+        select(
+            models.Evaluation.revisor_id,
+            models.Evaluation.resultado_id,
+            models.Evaluation.julgamento_global,
+            models.Domain.tipo,
+            models.Domain.respostas,
+            models.Domain.julgamento,
+        )
+        .join(models.Result, models.Result.id == models.Evaluation.resultado_id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .outerjoin(models.Domain, models.Domain.avaliacao_id == models.Evaluation.id)
+        .where(models.Study.projeto_id == project_id, models.Evaluation.revisor_id.is_not(None))
+    )
+    for revisor_id, resultado_id, julgamento_global, tipo, answers, julgamento in db.execute(stmt):
+        _, dominios = avaliacoes.setdefault((revisor_id, resultado_id), (julgamento_global, {}))
+        if tipo is not None:
+            dominios[tipo] = (answers, julgamento)
+
+    revisores: Dict[int, ReviewerRows] = {}
+    for (revisor_id, resultado_id), (julgamento_global, dominios) in avaliacoes.items():
+        rows = revisores.get(revisor_id)
+        if rows is None:
+            rows = revisores[revisor_id] = _empty_rows(len(ids), len(perguntas))
+        row = linhas[resultado_id]
+        rows.presente[row] = True
+        rows.respostas[row], rows.julgamentos[row] = encode_review(dominios, julgamento_global)
+    return ReviewMatrix(impressao, np.array(ids, dtype=np.int32), linhas, revisores)
+
+
+def get_review_matrix(db, project_id: int) -> ReviewMatrix:
+    """Matriz de revisões em cache, reconstruída quando a impressão digital muda."""
+    impressao = _fingerprint(db, project_id)
+    with _CACHE_LOCK:
+        cached = _MATRIX_CACHE.get(project_id)
+        if cached is not None and cached.impressao == impressao:
+            return cached
+    matrix = build_review_matrix(db, project_id, impressao)
+    with _CACHE_LOCK:
+        _MATRIX_CACHE.pop(project_id, None)
+        _MATRIX_CACHE[project_id] = matrix
+        while len(_MATRIX_CACHE) > _MATRIX_CACHE_SIZE:
+            _MATRIX_CACHE.pop(next(iter(_MATRIX_CACHE)))
+    return matrix
+
+
+def apply_saved_review(project_id: int, avaliacao: models.Evaluation, nova: bool) -> None:
+    """Atualiza a linha do revisor e as matrizes de confusão em cache depois
+    do commit de `save_review`, sem reler o projeto."""
+    respostas, julgamentos = encode_review(
+        {dom.tipo: (dom.respostas, dom.julgamento) for dom in avaliacao.dominios}, avaliacao.julgamento_global
+    )
+    with _CACHE_LOCK:
+        matrix = _MATRIX_CACHE.get(project_id)
+        if matrix is None:
+            return
+        row = matrix.linhas.get(avaliacao.resultado_id)
+        if row is None:
+            # Resultado criado depois da montagem da matriz: reconstrói na próxima leitura
+            del _MATRIX_CACHE[project_id]
+            return
+        impressao = (matrix.impressao[0] + int(nova), matrix.impressao[1] + 1)
+        revisor_id = avaliacao.revisor_id
+        rows = matrix.revisores.get(revisor_id)
+        if rows is None:
+            rows = matrix.revisores[revisor_id] = _empty_rows(matrix.resultado_ids.size, respostas.size)
+
+        for key in [key for key in _PAIR_CACHE if key[0] == project_id]:
+            pair = _PAIR_CACHE[key]
+            if pair.impressao != matrix.impressao:
+                del _PAIR_CACHE[key]
+                continue
+            if revisor_id in key[1:]:
+                primeiro = key[1] == revisor_id
+                outro = matrix.revisores.get(key[2] if primeiro else key[1])
+                if outro is not None and outro.presente[row]:
+                    if rows.presente[row]:
+                        _accumulate(pair, rows.respostas[row], rows.julgamentos[row], outro, row, primeiro, -1)
+                    _accumulate(pair, respostas, julgamentos, outro, row, primeiro, 1)
+            _PAIR_CACHE[key] = pair._replace(impressao=impressao)
+
+        rows.presente[row] = True
+        rows.respostas[row] = respostas
+        rows.julgamentos[row] = julgamentos
+        _MATRIX_CACHE[project_id] = matrix._replace(impressao=impressao)
+
+
+def _accumulate(
+    pair: PairConfusion,
+    respostas: np.ndarray,
+    julgamentos: np.ndarray,
+    outro: ReviewerRows,
+    row: int,
+    primeiro: bool,
+    sinal: int,
+) -> None:
+    """Soma (ou subtrai) às matrizes de confusão a contribuição de uma linha."""
+    a_resp, b_resp = (respostas, outro.respostas[row]) if primeiro else (outro.respostas[row], respostas)
+    a_julg, b_julg = (julgamentos, outro.julgamentos[row]) if primeiro else (outro.julgamentos[row], julgamentos)
+    np.add.at(pair.perguntas, (np.arange(a_resp.size), a_resp.astype(np.intp), b_resp.astype(np.intp)), sinal)
+    np.add.at(pair.julgamentos, (np.arange(a_julg.size), a_julg.astype(np.intp), b_julg.astype(np.intp)), sinal)
+
+
+# --- Concordância ---------------------------------------------------------------
+
+
+def _confusion(a: np.ndarray, b: np.ndarray, width: int) -> np.ndarray:
+    """Matrizes de confusão de todas as colunas com um único ``bincount``."""
+    columns = a.shape[1]
+    flat = (a.astype(np.intp) * width + b) + (width * width) * np.arange(columns, dtype=np.intp)
+    return np.bincount(flat.ravel(), minlength=columns * width * width).reshape(columns, width, width)
+
+
+def pair_confusion(db, project_id: int, revisor_a: int, revisor_b: int) -> Tuple[ReviewMatrix, PairConfusion]:
+    """Matriz de revisões do projeto e matrizes de confusão do par, em cache."""
+    matrix = get_review_matrix(db, project_id)
+    key = (project_id, revisor_a, revisor_b)
+    with _CACHE_LOCK:
+        cached = _PAIR_CACHE.get(key)
+        if cached is not None and cached.impressao == matrix.impressao:
+            return matrix, cached
+    rows_a = _reviewer_rows(matrix, revisor_a)
+    rows_b = _reviewer_rows(matrix, revisor_b)
+    both = rows_a.presente & rows_b.presente
+    pair = PairConfusion(
+        matrix.impressao,
+        _confusion(rows_a.respostas[both], rows_b.respostas[both], _ANSWER_WIDTH),
+        _confusion(rows_a.julgamentos[both], rows_b.julgamentos[both], _JUDGEMENT_WIDTH),
+    )
+    with _CACHE_LOCK:
+        _PAIR_CACHE[key] = pair
+    return matrix, pair
+
+
+def _reviewer_rows(matrix: ReviewMatrix, revisor_id: int) -> ReviewerRows:
+    rows = matrix.revisores.get(revisor_id)
+    if rows is None:
+        return _empty_rows(matrix.resultado_ids.size, len(load_questions()))
+    return rows
+
+
+def kappa_statistics(confusion: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Kappa de Cohen, concordância percentual e número de pares de cada
+    matriz de confusão, ignorando a categoria 0 (sem resposta/informação).
+    Valores indefinidos (sem pares) saem como NaN."""
+    table = confusion[:, 1:, 1:].astype(np.float64)
+    n = table.sum(axis=(1, 2))
+    safe_n = np.where(n > 0, n, 1)
+    po = np.trace(table, axis1=1, axis2=2) / safe_n
+    pe = (table.sum(axis=2) * table.sum(axis=1)).sum(axis=1) / (safe_n * safe_n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # pe == 1: os dois revisores usaram uma única categoria, a mesma
+        kappa = np.where(pe < 1, (po - pe) / (1 - pe), 1.0)
+    kappa[n == 0] = np.nan
+    po[n == 0] = np.nan
+    return kappa, po, n.astype(np.int64)
+
+
+def _stat(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def _resolve_reviewers(matrix: ReviewMatrix, revisor_a: Optional[int], revisor_b: Optional[int]) -> Tuple[int, int]:
+    """Sem revisores informados, usa os dois com mais avaliações no projeto."""
+    if revisor_a is None and revisor_b is None:
+        ranked = sorted(matrix.revisores, key=lambda revisor_id: (-int(matrix.revisores[revisor_id].presente.sum()), revisor_id))
+        if len(ranked) < 2:
+            raise ValueError("O projeto precisa de avaliações de ao menos dois revisores.")
+        return ranked[0], ranked[1]
+    if revisor_a is None or revisor_b is None:
+        raise ValueError("Informe os dois revisores ou nenhum.")
+    if revisor_a == revisor_b:
+        raise ValueError("Informe dois revisores diferentes.")
+    return revisor_a, revisor_b
+
+
+def agreement_report(db, project_id: int, revisor_a: Optional[int] = None, revisor_b: Optional[int] = None) -> Dict[str, Any]:
+    """Kappa e concordância percentual por pergunta e por domínio (e global)."""
+    revisor_a, revisor_b = _resolve_reviewers(get_review_matrix(db, project_id), revisor_a, revisor_b)
+    matrix, pair = pair_confusion(db, project_id, revisor_a, revisor_b)
+    perguntas = load_questions()
+
+    q_kappa, q_po, q_n = kappa_statistics(pair.perguntas)
+    j_kappa, j_po, j_n = kappa_statistics(pair.julgamentos)
+    comuns = _reviewer_rows(matrix, revisor_a).presente & _reviewer_rows(matrix, revisor_b).presente
+    return {
+        "revisor_a": revisor_a,
+        "revisor_b": revisor_b,
+        "resultados_em_comum": int(comuns.sum()),
+        "perguntas": {
+            qid: {"kappa": _stat(q_kappa[idx]), "concordancia": _stat(q_po[idx]), "pares": int(q_n[idx])}
+            for idx, qid in enumerate(perguntas)
+        },
+        "dominios": {
+            coluna: {
+                "kappa": _stat(j_kappa[idx]),
+                "concordancia": _stat(j_po[idx]),
+                "pares": int(j_n[idx]),
+                "confusao": pair.julgamentos[idx, 1:, 1:].tolist(),
+            }
+            for idx, coluna in enumerate(MATRIX_COLUMNS)
+        },
+    }
+
+
+def disagreements(
+    db,
+    project_id: int,
+    revisor_a: Optional[int] = None,
+    revisor_b: Optional[int] = None,
+    page: int = 1,
+    page_size: int = 50,
+) -> Dict[str, Any]:
+    """Resultados em que os dois revisores divergem em alguma pergunta
+    respondida por ambos ou em algum julgamento, paginados."""
+    matrix = get_review_matrix(db, project_id)
+    revisor_a, revisor_b = _resolve_reviewers(matrix, revisor_a, revisor_b)
+    rows_a, rows_b = _reviewer_rows(matrix, revisor_a), _reviewer_rows(matrix, revisor_b)
+
+    both = rows_a.presente & rows_b.presente
+    answers = (rows_a.respostas != rows_b.respostas) & (rows_a.respostas > 0) & (rows_b.respostas > 0)
+    judgements = (rows_a.julgamentos != rows_b.julgamentos) & (rows_a.julgamentos > 0) & (rows_b.julgamentos > 0)
+    divergent = np.flatnonzero(both & (answers.any(axis=1) | judgements.any(axis=1)))
+    page_rows = divergent[(page - 1) * page_size : page * page_size].tolist()
+
+    perguntas = load_questions()
+    ids = matrix.resultado_ids[page_rows].tolist()
+    info = {
+        resultado_id: (referencia, desfecho)
+        for resultado_id, referencia, desfecho in db.execute(
+            select(models.Result.id, models.Study.referencia, models.Result.desfecho)
+            .join(models.Study, models.Study.id == models.Result.estudo_id)
+            .where(models.Result.id.in_(ids))
+        )
+    }
+    itens = []
+    for row, resultado_id in zip(page_rows, ids):
+        referencia, desfecho = info.get(resultado_id, (None, None))
+        itens.append(
+            {
+                "resultado_id": resultado_id,
+                "referencia": referencia,
+                "desfecho": desfecho,
+                "perguntas": {
+                    perguntas[idx]: [ANSWER_LABELS[rows_a.respostas[row, idx]], ANSWER_LABELS[rows_b.respostas[row, idx]]]
+                    for idx in np.flatnonzero(answers[row]).tolist()
+                },
+                "dominios": {
+                    MATRIX_COLUMNS[idx]: [CODE_LABELS[rows_a.julgamentos[row, idx]], CODE_LABELS[rows_b.julgamentos[row, idx]]]
+                    for idx in np.flatnonzero(judgements[row]).tolist()
+                },
+            }
+        )
+    return {
+        "revisor_a": revisor_a,
+        "revisor_b": revisor_b,
+        "total": int(divergent.size),
+        "pagina": page,
+        "tamanho": page_size,
+        "itens": itens,
+    }
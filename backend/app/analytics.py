@@ -0,0 +1,267 @@
+"""Snapshot analítico de um projeto em arrays NumPy.
+
+Todas as respostas às perguntas sinalizadoras e todos os julgamentos do
+projeto são codificados em matrizes ``int8`` (resultados × perguntas e
+resultados × colunas de `matrix.MATRIX_COLUMNS`). Distribuições, tabelas
+cruzadas e a reavaliação do projeto sob uma variante de regras ("e se")
+passam a ser operações vetorizadas, sem percorrer o ORM por resultado.
+
+O snapshot fica em cache por projeto e é invalidado pela ``versao`` do
+resumo do projeto (`summary`), incrementada a cada gravação de avaliação.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from . import models, rule_engine, summary
+from .answer_filters import ANSWER_CODES
+from .matrix import CODE_LABELS, MATRIX_COLUMNS, PROJECT_DOMAINS, judgement_code
+
+PERGUNTAS_PATH = rule_engine.ROOT_DIR / "domain" / "perguntas.json"
+
+# Código 0 = sem resposta; 1..6 = posição em ANSWER_CODES
+NO_ANSWER_CODE = 0
+ANSWER_LABELS = ("Sem resposta",) + ANSWER_CODES
+_ANSWER_INDEX = {code: idx for idx, code in enumerate(ANSWER_CODES, start=1)}
+_GLOBAL_COLUMN = len(PROJECT_DOMAINS)
+
+_SNAPSHOT_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "32"))
+_SNAPSHOT_CACHE: "OrderedDict[int, AnalyticsSnapshot]" = OrderedDict()
+_SNAPSHOT_LOCK = threading.Lock()
+
+_QUESTIONS_CACHE: Optional[Tuple[str, ...]] = None
+
+
+class AnalyticsSnapshot(NamedTuple):
+    versao: int
+    resultado_ids: np.ndarray  # int32, (n,)
+    perguntas: Tuple[str, ...]
+    respostas: np.ndarray  # int8, (n, perguntas)
+    julgamentos: np.ndarray  # int8, (n, colunas de MATRIX_COLUMNS)
+    avaliados: np.ndarray  # bool, (n, domínios): domínio preenchido na avaliação
+
+
+def load_questions() -> Tuple[str, ...]:
+    """Ids das perguntas sinalizadoras, na ordem de ``perguntas.json``."""
+    global _QUESTIONS_CACHE
+    if _QUESTIONS_CACHE is None:
+        with open(PERGUNTAS_PATH, "r", encoding="utf-8-sig") as file_obj:
+            data = json.load(file_obj)
+        _QUESTIONS_CACHE = tuple(item["id"] for dominio in data.get("dominios", []) for item in dominio.get("itens", []))
+    return _QUESTIONS_CACHE
+
+
+def _domain_question_columns(perguntas: Tuple[str, ...]) -> Dict[int, np.ndarray]:
+    return {
+        tipo: np.array([idx for idx, qid in enumerate(perguntas) if qid.split(".")[0] == str(tipo)], dtype=np.intp)
+        for tipo in PROJECT_DOMAINS
+    }
+
+
+def build_snapshot(db, project_id: int, versao: int = 0) -> AnalyticsSnapshot:
+    """Codifica respostas e julgamentos do projeto com duas consultas Core."""
+    perguntas = load_questions()
+    question_index = {qid: idx for idx, qid in enumerate(perguntas)}
+    domain_index = {tipo: idx for idx, tipo in enumerate(PROJECT_DOMAINS)}
+
+    ids = db.execute(
+        select(models.Result.id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .where(models.Study.projeto_id == project_id)
+        .order_by(models.Result.id)
+    ).scalars().all()
+    resultado_ids = np.array(ids, dtype=np.int32)
+    row_index = {resultado_id: idx for idx, resultado_id in enumerate(ids)}
+
+    respostas = np.zeros((len(ids), len(perguntas)), dtype=np.int8)
+    julgamentos = np.zeros((len(ids), len(MATRIX_COLUMNS)), dtype=np.int8)
+    avaliados = np.zeros((len(ids), len(PROJECT_DOMAINS)), dtype=bool)
+
+    stmt = (
+        select(
+            models.Evaluation.resultado_id,
+            models.Evaluation.julgamento_global,
+            models.Domain.tipo,
+            models.Domain.respostas,
+            models.Domain.julgamento,
+        )
+        .join(models.Result, models.Result.id == models.Evaluation.resultado_id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .outerjoin(models.Domain, models.Domain.avaliacao_id == models.Evaluation.id)
+        .where(models.Study.projeto_id == project_id, models.Evaluation.revisor_id.is_(None))
+    )
+    for resultado_id, julgamento_global, tipo, answers, julgamento in db.execute(stmt):
+        row = row_index[resultado_id]
+        julgamentos[row, _GLOBAL_COLUMN] = judgement_code(julgamento_global)
+        column = domain_index.get(tipo)
+        if column is None:
+            continue
+        avaliados[row, column] = True
+        julgamentos[row, column] = judgement_code(julgamento)
+        for qid, answer in (answers or {}).items():
+            idx = question_index.get(qid)
+            if idx is not None:
+                respostas[row, idx] = _ANSWER_INDEX.get(answer, NO_ANSWER_CODE)
+
+    return AnalyticsSnapshot(versao, resultado_ids, perguntas, respostas, julgamentos, avaliados)
+
+
+def get_snapshot(db, project_id: int) -> AnalyticsSnapshot:
+    """Snapshot em cache, reconstruído quando a ``versao`` do resumo muda."""
+    versao = summary.ensure_summary(db, project_id).versao
+    with _SNAPSHOT_LOCK:
+        cached = _SNAPSHOT_CACHE.get(project_id)
+        if cached is not None and cached.versao == versao:
+            _SNAPSHOT_CACHE.move_to_end(project_id)
+            return cached
+    snapshot = build_snapshot(db, project_id, versao)
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT_CACHE[project_id] = snapshot
+        _SNAPSHOT_CACHE.move_to_end(project_id)
+        while len(_SNAPSHOT_CACHE) > _SNAPSHOT_CACHE_SIZE:
+            _SNAPSHOT_CACHE.popitem(last=False)
+    return snapshot
+
+
+# --- Distribuições e tabelas cruzadas ---------------------------------------
+
+
+def answer_distribution(snapshot: AnalyticsSnapshot, perguntas: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Contagem de cada resposta por pergunta (um único ``bincount``)."""
+    selected = list(perguntas) if perguntas else list(snapshot.perguntas)
+    columns = [_question_column(snapshot, qid) for qid in selected]
+    width = len(ANSWER_LABELS)
+    values = snapshot.respostas[:, columns].astype(np.intp) + width * np.arange(len(columns), dtype=np.intp)
+    counts = np.bincount(values.ravel(), minlength=width * len(columns)).reshape(len(columns), width)
+    return {
+        "versao": snapshot.versao,
+        "resultados": int(snapshot.resultado_ids.size),
+        "perguntas": {qid: dict(zip(ANSWER_LABELS, row.tolist())) for qid, row in zip(selected, counts)},
+    }
+
+
+def crosstab(snapshot: AnalyticsSnapshot, linha: str, coluna: str) -> Dict[str, Any]:
+    """Tabela cruzada entre dois eixos: colunas de julgamento (D1..D5, Global)
+    ou perguntas sinalizadoras."""
+    row_values, row_labels = _axis(snapshot, linha)
+    col_values, col_labels = _axis(snapshot, coluna)
+    flat = row_values.astype(np.intp) * len(col_labels) + col_values
+    counts = np.bincount(flat, minlength=len(row_labels) * len(col_labels)).reshape(len(row_labels), len(col_labels))
+    return {
+        "versao": snapshot.versao,
+        "linha": linha,
+        "coluna": coluna,
+        "categorias_linha": list(row_labels),
+        "categorias_coluna": list(col_labels),
+        "contagens": counts.tolist(),
+    }
+
+
+def _question_column(snapshot: AnalyticsSnapshot, qid: str) -> int:
+    try:
+        return snapshot.perguntas.index(qid)
+    except ValueError:
+        raise ValueError(f"Pergunta desconhecida: '{qid}'.") from None
+
+
+def _axis(snapshot: AnalyticsSnapshot, name: str) -> Tuple[np.ndarray, Tuple[str, ...]]:
+    if name in MATRIX_COLUMNS:
+        return snapshot.julgamentos[:, MATRIX_COLUMNS.index(name)], CODE_LABELS
+    return snapshot.respostas[:, _question_column(snapshot, name)], ANSWER_LABELS
+
+
+# --- Reavaliação "e se" -----------------------------------------------------
+
+
+def validate_variant(regras: Dict[int, List[dict]], regra_global: Optional[dict]) -> None:
+    """Rejeita variantes com domínios ou resultados desconhecidos."""
+    for tipo, rules in regras.items():
+        if tipo not in PROJECT_DOMAINS:
+            raise ValueError(f"Domínio desconhecido na variante: {tipo}.")
+        for rule in rules:
+            if not isinstance(rule, dict) or not isinstance(rule.get("quando", {}), dict):
+                raise ValueError(f"Regra inválida para o domínio {tipo}.")
+            if rule.get("resultado") not in CODE_LABELS[1:]:
+                raise ValueError(f"Resultado inválido em regra do domínio {tipo}: {rule.get('resultado')!r}.")
+    if regra_global is not None and not isinstance(regra_global, dict):
+        raise ValueError("A regra global deve ser um objeto.")
+
+
+def rescore(
+    snapshot: AnalyticsSnapshot, regras: Optional[Dict[int, List[dict]]] = None, regra_global: Optional[dict] = None
+) -> np.ndarray:
+    """Reavalia todos os julgamentos do snapshot sob a variante de regras.
+
+    O motor de regras roda uma vez por padrão distinto de respostas de cada
+    domínio (``np.unique`` por linhas) e uma vez por combinação distinta de
+    julgamentos de domínio; os códigos são espalhados de volta pelo índice
+    inverso. Devolve uma matriz com a mesma forma de ``julgamentos``.
+    """
+    novos = np.zeros_like(snapshot.julgamentos)
+    for column, (tipo, question_columns) in enumerate(_domain_question_columns(snapshot.perguntas).items()):
+        mask = snapshot.avaliados[:, column]
+        if not mask.any():
+            continue
+        qids = [snapshot.perguntas[idx] for idx in question_columns]
+        patterns, inverse = np.unique(snapshot.respostas[np.ix_(mask, question_columns)], axis=0, return_inverse=True)
+        codes = np.array(
+            [
+                judgement_code(rule_engine.evaluate_domain(tipo, _decode_answers(qids, pattern), regras)[0])
+                for pattern in patterns
+            ],
+            dtype=np.int8,
+        )
+        novos[mask, column] = codes[inverse.ravel()]
+
+    evaluated = snapshot.avaliados.any(axis=1)
+    if evaluated.any():
+        patterns, inverse = np.unique(novos[evaluated, :_GLOBAL_COLUMN], axis=0, return_inverse=True)
+        codes = np.array(
+            [
+                judgement_code(rule_engine.evaluate_global([CODE_LABELS[code] for code in pattern if code], regra_global))
+                for pattern in patterns
+            ],
+            dtype=np.int8,
+        )
+        novos[evaluated, _GLOBAL_COLUMN] = codes[inverse.ravel()]
+    return novos
+
+
+def what_if(
+    snapshot: AnalyticsSnapshot, regras: Optional[Dict[int, List[dict]]] = None, regra_global: Optional[dict] = None
+) -> Dict[str, Any]:
+    """Compara os julgamentos gravados com os obtidos sob a variante."""
+    validate_variant(regras or {}, regra_global)
+    novos = rescore(snapshot, regras, regra_global)
+    antes = snapshot.julgamentos
+    changed = antes != novos
+    size = len(CODE_LABELS)
+
+    colunas = {}
+    for idx, name in enumerate(MATRIX_COLUMNS):
+        flat = antes[:, idx].astype(np.intp) * size + novos[:, idx]
+        transitions = np.bincount(flat, minlength=size * size).reshape(size, size)
+        colunas[name] = {
+            "alterados": int(changed[:, idx].sum()),
+            "antes": dict(zip(CODE_LABELS, transitions.sum(axis=1).tolist())),
+            "depois": dict(zip(CODE_LABELS, transitions.sum(axis=0).tolist())),
+            "transicoes": transitions.tolist(),
+        }
+    alterados = snapshot.resultado_ids[changed.any(axis=1)]
+    return {
+        "versao": snapshot.versao,
+        "resultados": int(snapshot.resultado_ids.size),
+        "categorias": list(CODE_LABELS),
+        "colunas": colunas,
+        "resultados_alterados": alterados.tolist(),
+    }
+
+
+def _decode_answers(qids: List[str], pattern: np.ndarray) -> Dict[str, str]:
+    return {qid: ANSWER_LABELS[code] for qid, code in zip(qids, pattern.tolist()) if code != NO_ANSWER_CODE}
@@ -0,0 +1,106 @@
+"""Consulta de resultados pelas respostas às perguntas sinalizadoras.
+
+Predicados como ``1.2:N,PN`` ("pergunta 1.2 respondida N ou PN") viram
+consultas de contenção JSONB (``respostas @> '{"1.2": "N"}'``), atendidas pelo
+índice GIN ``jsonb_path_ops`` de ``dominios.respostas``. Predicados de um
+mesmo domínio são combinados no mesmo ``EXISTS``; todos os predicados
+precisam ser satisfeitos.
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_, exists, func, or_, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from . import models
+
+ANSWER_CODES = ("Y", "PY", "PN", "N", "NI", "NA")
+MAX_PAGE_SIZE = 500
+
+_PREDICATE_PATTERN = re.compile(r"^\s*(?P<qid>(?P<tipo>\d+)\.\d+)\s*[:=]\s*(?P<codes>[A-Za-z,/| ]+)$")
+
+# {tipo do domínio: [(pergunta, [códigos aceitos])]}
+Predicates = Dict[int, List[Tuple[str, List[str]]]]
+
+
+def parse_predicates(values: List[str]) -> Predicates:
+    """Interpreta predicados ``pergunta:códigos`` (códigos separados por , / ou |)."""
+    predicates: Predicates = {}
+    for value in values:
+        match = _PREDICATE_PATTERN.match(value or "")
+        if not match:
+            raise ValueError(f"Predicado inválido: '{value}'. Use o formato 1.2:N,PN.")
+        codes = [code.strip().upper() for code in re.split(r"[,/|]", match.group("codes")) if code.strip()]
+        invalid = [code for code in codes if code not in ANSWER_CODES]
+        if invalid or not codes:
+            raise ValueError(f"Resposta inválida em '{value}'. Use {', '.join(ANSWER_CODES)}.")
+        predicates.setdefault(int(match.group("tipo")), []).append((match.group("qid"), codes))
+    return predicates
+
+
+def _answer_condition(qid: str, codes: List[str], dialect: str):
+    if dialect == "postgresql":
+        respostas = type_coerce(models.Domain.respostas, JSONB)
+        return or_(*(respostas.contains({qid: code}) for code in codes))
+    # Outros bancos (testes com SQLite): extração do valor JSON
+    return models.Domain.respostas[qid].as_string().in_(codes)
+
+
+def filter_results(db, project_id: int, predicates: Predicates, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+    """Resultados do projeto cujas avaliações satisfazem todos os predicados.
+
+    Três consultas: total, página de resultados (ordenada por id) e as
+    respostas das perguntas filtradas para os resultados da página.
+    """
+    dialect = db.get_bind().dialect.name
+    conditions = [models.Study.projeto_id == project_id]
+    for tipo, items in predicates.items():
+        conditions.append(
+            exists().where(
+                models.Domain.avaliacao_id == models.Evaluation.id,
+                models.Domain.tipo == tipo,
+                and_(*(_answer_condition(qid, codes, dialect) for qid, codes in items)),
+            )
+        )
+
+    base = (
+        select(
+            models.Result.id,
+            models.Study.id,
+            models.Study.referencia,
+            models.Result.desfecho,
+            models.Evaluation.id,
+            models.Evaluation.julgamento_global,
+        )
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .join(models.Evaluation, models.Evaluation.resultado_id == models.Result.id)
+        .where(models.Evaluation.revisor_id.is_(None), *conditions)
+    )
+    total = db.execute(select(func.count()).select_from(base.subquery())).scalar_one()
+    page_rows = db.execute(base.order_by(models.Result.id).limit(page_size).offset((page - 1) * page_size)).all()
+
+    items = []
+    by_evaluation = {}
+    for resultado_id, estudo_id, referencia, desfecho, avaliacao_id, julgamento_global in page_rows:
+        item = {
+            "resultado_id": resultado_id,
+            "estudo_id": estudo_id,
+            "referencia": referencia,
+            "desfecho": desfecho,
+            "julgamento_global": julgamento_global,
+            "respostas": {},
+        }
+        items.append(item)
+        by_evaluation[avaliacao_id] = item
+
+    if by_evaluation:
+        wanted = {tipo: [qid for qid, _ in entries] for tipo, entries in predicates.items()}
+        answers = select(models.Domain.avaliacao_id, models.Domain.tipo, models.Domain.respostas).where(
+            models.Domain.avaliacao_id.in_(by_evaluation), models.Domain.tipo.in_(wanted)
+        )
+        for avaliacao_id, tipo, respostas in db.execute(answers):
+            for qid in wanted[tipo]:
+                by_evaluation[avaliacao_id]["respostas"][qid] = (respostas or {}).get(qid)
+
+    return {"total": total, "pagina": page, "tamanho": page_size, "itens": items}
@@ -0,0 +1,152 @@
+"""Validação das respostas às perguntas sinalizadoras.
+
+O validador é compilado uma única vez a partir de ``domain/perguntas.json``:
+perguntas permitidas por domínio, códigos de resposta aceitos por pergunta e
+dependências (``dependeDe``). Uma pergunta dependente só é aplicável quando
+a pergunta de que depende foi respondida com um dos códigos de
+``aplicavelSe`` (padrão: Y/PY, a mesma regra que desabilita a pergunta no
+frontend); respondida a pergunta-mãe com outro código, a dependente vale "NA".
+
+`normalize_answers` roda em toda gravação (API, lote e importações): no modo
+estrito rejeita perguntas e códigos desconhecidos com ``ValueError``; no
+modo tolerante (importações) descarta-os e registra avisos. O caso comum,
+respostas já válidas, não copia o dicionário.
+"""
+
+import json
+import unicodedata
+from pathlib import Path
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+PERGUNTAS_PATH = Path(__file__).resolve().parents[2] / "domain" / "perguntas.json"
+
+NOT_APPLICABLE = "NA"
+DEFAULT_APPLICABLE_WHEN = ("Y", "PY")
+
+# Rótulos por extenso aceitos na entrada (comparados sem acentos e sem caixa)
+_ANSWER_ALIASES = {
+    "sim": "Y",
+    "provavelmente sim": "PY",
+    "provavelmente nao": "PN",
+    "nao": "N",
+    "sem informacao": "NI",
+    "nao se aplica": "NA",
+}
+
+
+class Dependency(NamedTuple):
+    pergunta: str
+    depende_de: str
+    aplicavel_se: FrozenSet[str]
+
+
+class DomainSpec(NamedTuple):
+    respostas: Dict[str, Tuple[str, ...]]  # pergunta -> códigos aceitos
+    dependencias: Tuple[Dependency, ...]
+
+
+_VALIDATOR_CACHE: Optional[Dict[int, DomainSpec]] = None
+
+
+def load_validator() -> Dict[int, DomainSpec]:
+    global _VALIDATOR_CACHE
+    if _VALIDATOR_CACHE is None:
+        with open(PERGUNTAS_PATH, "r", encoding="utf-8-sig") as file_obj:
+            data = json.load(file_obj)
+        compiled = {}
+        for dominio in data.get("dominios", []):
+            itens = dominio.get("itens", [])
+            compiled[int(dominio["dominio"])] = DomainSpec(
+                {item["id"]: tuple(item.get("respostas", [])) for item in itens},
+                tuple(
+                    Dependency(
+                        item["id"],
+                        item["dependeDe"],
+                        frozenset(item.get("aplicavelSe") or DEFAULT_APPLICABLE_WHEN),
+                    )
+                    for item in itens
+                    if item.get("dependeDe")
+                ),
+            )
+        _VALIDATOR_CACHE = compiled
+    return _VALIDATOR_CACHE
+
+
+def _fold(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value.strip().lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _normalize_code(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    code = value.strip().upper()
+    return code if code else None
+
+
+def not_applicable(domain_type: int, respostas: Dict[str, str]) -> List[str]:
+    """Perguntas dependentes que não se aplicam dadas as respostas."""
+    spec = load_validator().get(domain_type)
+    if spec is None:
+        return []
+    return [
+        dep.pergunta
+        for dep in spec.dependencias
+        if respostas.get(dep.depende_de) is not None and respostas[dep.depende_de] not in dep.aplicavel_se
+    ]
+
+
+def normalize_answers(
+    domain_type: int,
+    respostas: Dict[str, str],
+    warnings: Optional[List[str]] = None,
+) -> Dict[str, str]:
+    """Valida e normaliza as respostas de um domínio.
+
+    Códigos em minúsculas, com espaços ou por extenso ("Provavelmente sim")
+    são convertidos; respostas vazias são descartadas e perguntas
+    dependentes não aplicáveis passam a "NA". Com ``warnings`` (modo
+    tolerante), perguntas e códigos inválidos são descartados com um aviso;
+    sem ele, levantam ``ValueError``.
+    """
+    spec = load_validator().get(domain_type)
+    if spec is None:
+        raise ValueError(f"Domínio desconhecido: {domain_type}.")
+    respostas = respostas or {}
+
+    clean = all(spec.respostas.get(qid) and value in spec.respostas[qid] for qid, value in respostas.items())
+    normalized = respostas if clean else {}
+    if not clean:
+        for qid, value in respostas.items():
+            if value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            pergunta = qid.strip() if isinstance(qid, str) else qid
+            allowed = spec.respostas.get(pergunta)
+            if allowed is None:
+                _invalid(f"Pergunta '{qid}' não pertence ao domínio {domain_type}.", warnings)
+                continue
+            code = _normalize_code(value)
+            if code not in allowed:
+                code = _ANSWER_ALIASES.get(_fold(value)) if isinstance(value, str) else None
+            if code not in allowed:
+                _invalid(
+                    f"Resposta '{value}' inválida para a pergunta {pergunta}. Use {', '.join(allowed)}.",
+                    warnings,
+                )
+                continue
+            normalized[pergunta] = code
+
+    for qid in not_applicable(domain_type, normalized):
+        if normalized.get(qid, NOT_APPLICABLE) != NOT_APPLICABLE:
+            if warnings is not None:
+                warnings.append(f"Pergunta {qid} não se aplica dadas as respostas; resposta '{normalized[qid]}' trocada por NA.")
+            if normalized is respostas:
+                normalized = dict(respostas)
+            normalized[qid] = NOT_APPLICABLE
+    return normalized
+
+
+def _invalid(message: str, warnings: Optional[List[str]]) -> None:
+    if warnings is None:
+        raise ValueError(message)
+    warnings.append(message)
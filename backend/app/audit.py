@@ -0,0 +1,170 @@
+"""Trilha de auditoria gravada em segundo plano.
+
+As rotas apenas enfileiram eventos (`record` / `record_project`) em uma fila
+limitada em memória, sem tocar no banco durante a requisição. Uma thread de
+gravação agrupa os eventos e os insere em ``auditorias`` com INSERTs de
+várias linhas, quando o lote atinge ``AUDIT_BATCH_SIZE`` ou a cada
+``AUDIT_FLUSH_INTERVAL`` segundos. Eventos de projeto (exportações completas)
+são uma única linha com ``projeto_id``, qualquer que seja o tamanho do
+projeto. Com a fila cheia, novos eventos são descartados e contados, nunca bloqueiam a
+requisição. `stop` grava o que restar na fila no desligamento da aplicação.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import insert
+
+from . import database, models
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2.0"))
+
+# Ações registradas
+CRIACAO = "criacao"
+ATUALIZACAO = "atualizacao"
+IMPORTACAO = "importacao"
+LOTE = "lote"
+CLONAGEM = "clonagem"
+REVISAO = "revisao"
+EXPORTACAO = "exportacao"
+
+
+class AuditEvent(NamedTuple):
+    acao: str
+    usuario_id: int
+    avaliacao_id: Optional[int]
+    projeto_id: Optional[int]
+    data_hora: datetime
+
+
+_QUEUE: "queue.Queue[AuditEvent]" = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_STOP = threading.Event()
+_WRITER: Optional[threading.Thread] = None
+_WRITER_LOCK = threading.Lock()
+_FLUSH_LOCK = threading.Lock()
+_DROPPED_LOCK = threading.Lock()
+_dropped = 0
+
+
+def record(acao: str, usuario_id: int, avaliacao_id: int) -> None:
+    """Enfileira um evento sobre uma avaliação."""
+    _enqueue(AuditEvent(acao, usuario_id, avaliacao_id, None, datetime.now(timezone.utc)))
+
+
+def record_many(acao: str, usuario_id: int, avaliacao_ids: Iterable[int]) -> None:
+    now = datetime.now(timezone.utc)
+    for avaliacao_id in avaliacao_ids:
+        _enqueue(AuditEvent(acao, usuario_id, avaliacao_id, None, now))
+
+
+def record_project(acao: str, usuario_id: int, projeto_id: int) -> None:
+    """Enfileira um evento sobre o projeto inteiro (uma linha, sem avaliação)."""
+    _enqueue(AuditEvent(acao, usuario_id, None, projeto_id, datetime.now(timezone.utc)))
+
+
+def dropped_events() -> int:
+    return _dropped
+
+
+def _enqueue(event: AuditEvent) -> None:
+    global _dropped
+    try:
+        _QUEUE.put_nowait(event)
+    except queue.Full:
+        # Chamado das threads do threadpool: o incremento precisa de trava
+        with _DROPPED_LOCK:
+            _dropped += 1
+            dropped = _dropped
+        if dropped == 1 or dropped % 1000 == 0:
+            logger.warning("Fila de auditoria cheia: %d eventos descartados", dropped)
+
+
+def start() -> None:
+    """Inicia a thread de gravação (idempotente)."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is not None and _WRITER.is_alive():
+            return
+        _STOP.clear()
+        _WRITER = threading.Thread(target=_writer_loop, name="audit-writer", daemon=True)
+        _WRITER.start()
+
+
+def stop(timeout: float = 10.0) -> None:
+    """Para a thread de gravação e grava os eventos restantes."""
+    global _WRITER
+    with _WRITER_LOCK:
+        writer, _WRITER = _WRITER, None
+    _STOP.set()
+    if writer is not None:
+        writer.join(timeout)
+    flush()
+
+
+def flush(session_factory=None) -> int:
+    """Grava imediatamente todos os eventos enfileirados; devolve quantos."""
+    total = 0
+    while True:
+        batch = _drain(AUDIT_BATCH_SIZE, timeout=0)
+        if not batch:
+            return total
+        _write(batch, session_factory)
+        total += len(batch)
+
+
+def _writer_loop() -> None:
+    while not _STOP.is_set():
+        batch = _drain(AUDIT_BATCH_SIZE, timeout=AUDIT_FLUSH_INTERVAL)
+        if batch:
+            _write(batch)
+
+
+def _drain(limit: int, timeout: float) -> List[AuditEvent]:
+    """Coleta até ``limit`` eventos, esperando no máximo ``timeout`` segundos."""
+    batch: List[AuditEvent] = []
+    deadline = time.monotonic() + timeout
+    while len(batch) < limit:
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining > 0 and not _STOP.is_set():
+                batch.append(_QUEUE.get(timeout=min(remaining, 0.5)))
+            else:
+                batch.append(_QUEUE.get_nowait())
+        except queue.Empty:
+            if remaining <= 0 or _STOP.is_set():
+                break
+    return batch
+
+
+def _write(batch: List[AuditEvent], session_factory=None) -> None:
+    table = models.Audit.__table__
+    rows = [
+        {
+            "avaliacao_id": event.avaliacao_id,
+            "projeto_id": event.projeto_id,
+            "usuario_id": event.usuario_id,
+            "acao": event.acao,
+            "data_hora": event.data_hora,
+        }
+        for event in batch
+    ]
+    with _FLUSH_LOCK:
+        db = (session_factory or database.SessionLocal.session_factory)()
+        try:
+            if rows:
+                db.execute(insert(table), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Falha ao gravar %d eventos de auditoria", len(batch))
+        finally:
+            db.close()
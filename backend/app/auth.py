@@ -16,7 +16,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
-from . import models, database
+from . import models, database, tracing
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM = "HS256"
@@ -65,18 +65,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_identifier = payload.get("sub")
-        if user_identifier is None:
+    with tracing.span("auth"):
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_identifier = payload.get("sub")
+            if user_identifier is None:
+                raise credentials_exception
+            user_id = int(user_identifier)
+        except (JWTError, ValueError):
             raise credentials_exception
-        user_id = int(user_identifier)
-    except (JWTError, ValueError):
-        raise credentials_exception
-    user = db.get(models.User, user_id)
-    if user is None:
-        raise credentials_exception
-    return user
+        user = db.get(models.User, user_id)
+        if user is None:
+            raise credentials_exception
+        return user
+
+
+async def get_current_user_optional(
+    token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(database.get_db)
+) -> Optional[models.User]:
+    """Variante de `get_current_user` para rotas que também aceitam anônimos."""
+    if not token:
+        return None
+    return await get_current_user(token, db)
 
 
 def check_project_role(db: Session, user: models.User, project_id: int, allowed_roles: list) -> None:
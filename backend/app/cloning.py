@@ -0,0 +1,175 @@
+"""Cópia de domínios entre os resultados de um mesmo estudo.
+
+Domínios como o 1 (randomização) costumam ser idênticos para todos os
+desfechos de um estudo. `clone_domains` copia respostas, comentários e
+observações dos domínios escolhidos de um resultado para os demais
+resultados do estudo com instruções set-based: um INSERT ... SELECT cria as
+avaliações que faltam, um UPDATE ... FROM sobrescreve os domínios existentes
+e um INSERT ... SELECT cria os ausentes. O motor de regras roda uma vez por
+domínio copiado (as respostas são as mesmas em todos os destinos) e os
+julgamentos globais afetados são recalculados em lote.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, exists, insert, literal, select, true, update
+from sqlalchemy.orm import aliased
+
+from . import models, revisions, rule_engine, summary
+
+
+def clone_domains(
+    db,
+    user_id: int,
+    source: models.Result,
+    tipos: List[int],
+    target_ids: Optional[List[int]] = None,
+) -> List[Dict[str, Any]]:
+    """Copia os domínios ``tipos`` de ``source`` para os resultados irmãos.
+
+    ``target_ids`` restringe os destinos a alguns resultados do estudo.
+    Não faz commit. Devolve, por resultado alterado, a avaliação e o novo
+    julgamento global.
+    """
+    avaliacao = source.avaliacao
+    if avaliacao is None:
+        raise ValueError("O resultado de origem não possui avaliação.")
+    origem = {dom.tipo: dom for dom in avaliacao.dominios if dom.tipo in tipos}
+    faltando = sorted(set(tipos) - set(origem))
+    if faltando:
+        raise ValueError(f"O resultado de origem não possui o(s) domínio(s) {', '.join(map(str, faltando))}.")
+
+    irmao = aliased(models.Result)
+    destinos = select(irmao.id).where(irmao.estudo_id == source.estudo_id, irmao.id != source.id)
+    if target_ids is not None:
+        destinos = destinos.where(irmao.id.in_(target_ids))
+
+    db.execute(
+        insert(models.Evaluation).from_select(
+            ["resultado_id", "criado_por_id"],
+            select(models.Result.id, literal(user_id)).where(
+                models.Result.id.in_(destinos),
+                ~exists().where(models.Evaluation.resultado_id == models.Result.id, models.Evaluation.revisor_id.is_(None)),
+            ),
+        )
+    )
+    targets = dict(
+        db.execute(
+            select(models.Evaluation.id, models.Evaluation.resultado_id).where(
+                models.Evaluation.resultado_id.in_(destinos), models.Evaluation.revisor_id.is_(None)
+            )
+        ).all()
+    )
+    if not targets:
+        return []
+    avaliacao_ids = list(targets)
+    old_states = revisions.load_states(db, avaliacao_ids)
+
+    scored = dict(zip(tipos, rule_engine.evaluate_domains((tipo, origem[tipo].respostas or {}) for tipo in tipos)))
+    dom = models.Domain.__table__
+    src = dom.alias("origem")
+    julgamento = case({tipo: julgamento for tipo, (julgamento, _) in scored.items()}, value=src.c.tipo)
+    justificativa = case({tipo: justificativa for tipo, (_, justificativa) in scored.items()}, value=src.c.tipo)
+
+    db.execute(
+        update(dom)
+        .where(
+            dom.c.avaliacao_id.in_(avaliacao_ids),
+            dom.c.tipo.in_(tipos),
+            src.c.avaliacao_id == avaliacao.id,
+            src.c.tipo == dom.c.tipo,
+        )
+        .values(
+            respostas=src.c.respostas,
+            comentarios=src.c.comentarios,
+            observacoes_itens=src.c.observacoes_itens,
+            julgamento=julgamento,
+            justificativa=justificativa,
+        )
+    )
+    alvo = models.Evaluation.__table__.alias("alvo")
+    existente = dom.alias("existente")
+    db.execute(
+        insert(dom).from_select(
+            ["avaliacao_id", "tipo", "respostas", "comentarios", "observacoes_itens", "julgamento", "justificativa", "direcao"],
+            select(
+                alvo.c.id,
+                src.c.tipo,
+                src.c.respostas,
+                src.c.comentarios,
+                src.c.observacoes_itens,
+                julgamento,
+                justificativa,
+                src.c.direcao,
+            )
+            # Produto de cada avaliação de destino com cada domínio de origem
+            .select_from(alvo.join(src, true()))
+            .where(
+                alvo.c.id.in_(avaliacao_ids),
+                src.c.avaliacao_id == avaliacao.id,
+                src.c.tipo.in_(tipos),
+                ~exists().where(existente.c.avaliacao_id == alvo.c.id, existente.c.tipo == src.c.tipo),
+            ),
+        )
+    )
+
+    globais = _rescore_globals(db, avaliacao_ids)
+    db.execute(update(models.Evaluation), [{"id": avaliacao_id, **values} for avaliacao_id, values in globais.items()])
+    db.execute(
+        update(models.Evaluation)
+        .where(models.Evaluation.id.in_(avaliacao_ids))
+        .values(versao=models.Evaluation.versao + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    new_states = revisions.load_states(db, avaliacao_ids)
+    summary.apply_delta(
+        db,
+        source.estudo.projeto_id,
+        summary.snapshot_delta((_judgements(old_states[i]), _judgements(new_states[i])) for i in avaliacao_ids),
+    )
+    revisions.record_revisions(db, user_id, {i: (old_states[i], new_states[i]) for i in avaliacao_ids})
+    return [
+        {"resultado_id": targets[i], "avaliacao_id": i, "julgamento_global": globais[i]["julgamento_global"]}
+        for i in sorted(avaliacao_ids, key=targets.get)
+    ]
+
+
+def _rescore_globals(db, avaliacao_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Recalcula os campos globais a partir dos domínios gravados (uma consulta)."""
+    rows = db.execute(
+        select(
+            models.Domain.avaliacao_id,
+            models.Domain.tipo,
+            models.Domain.julgamento,
+            models.Domain.justificativa,
+            models.Domain.direcao,
+        )
+        .where(models.Domain.avaliacao_id.in_(avaliacao_ids))
+        .order_by(models.Domain.avaliacao_id, models.Domain.tipo)
+    )
+    domains: Dict[int, List[Any]] = {avaliacao_id: [] for avaliacao_id in avaliacao_ids}
+    for avaliacao_id, *values in rows:
+        domains[avaliacao_id].append(values)
+
+    cache: Dict[tuple, str] = {}
+    globais = {}
+    for avaliacao_id, values in domains.items():
+        julgamentos = tuple(julgamento for _, julgamento, _, _ in values)
+        if julgamentos not in cache:
+            cache[julgamentos] = rule_engine.evaluate_global(list(julgamentos))
+        justificativas = [f"Domínio {tipo}: {texto}" for tipo, _, texto, _ in values if texto]
+        direcoes = [direcao for _, _, _, direcao in values if direcao and direcao != models.DirectionType.NA]
+        globais[avaliacao_id] = {
+            "julgamento_global": cache[julgamentos],
+            "justificativa_global": "\n".join(justificativas) if justificativas else None,
+            "direcao_global": direcoes[0] if direcoes else models.DirectionType.NA,
+        }
+    return globais
+
+
+def _judgements(state: revisions.State) -> summary.Snapshot:
+    return (
+        {int(tipo): domain["julgamento"] for tipo, domain in state["dominios"].items()},
+        state["avaliacao"]["julgamento_global"],
+    )
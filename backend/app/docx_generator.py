@@ -1,19 +1,29 @@
 """Geracao de relatorios (PDF/DOCX) para avaliacoes RoB 2."""
 
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
 from io import BytesIO
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Flowable
 from docx import Document
-from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from docx.shared import RGBColor
+from lxml import etree
+from PIL import Image, ImageDraw, ImageFont
 
-from . import models
+from . import models, tracing
+from .matrix import MATRIX_COLUMNS, NO_INFO_CODE
 
 
 def _answer_map() -> Dict[str, str]:
@@ -38,13 +48,7 @@ _JUDGEMENT_COLOR_SCHEME: Dict[str, Tuple[str, str]] = {
 _DEFAULT_SCHEME = ("#d1d5db", "#111827")
 _HEADER_SCHEME = ("#e5e7eb", "#111827")
 
-
-def _resolve_color(julgamento: str) -> Tuple[colors.Color, colors.Color]:
-    normalized = (julgamento or "").strip().lower()
-    for prefix, (fill, font) in _JUDGEMENT_COLOR_SCHEME.items():
-        if normalized.startswith(prefix):
-            return colors.HexColor(fill), colors.HexColor(font)
-    return colors.HexColor(_DEFAULT_SCHEME[0]), colors.HexColor(_DEFAULT_SCHEME[1])
+_LEGEND_TEXT = "Legenda: Baixo (verde), Algumas preocupacoes (laranja), Alto (vermelho)."
 
 
 def _resolve_hex_colors(julgamento: str) -> Tuple[str, str]:
@@ -55,29 +59,332 @@ def _resolve_hex_colors(julgamento: str) -> Tuple[str, str]:
     return _DEFAULT_SCHEME
 
 
-def _apply_docx_cell_fill(cell, fill_hex: str, font_hex: str) -> None:
-    """Apply background and font colors to a python-docx table cell."""
-    tc_pr = cell._tc.get_or_add_tcPr()
-    shd = OxmlElement("w:shd")
-    shd.set(qn("w:val"), "clear")
-    shd.set(qn("w:color"), "auto")
-    shd.set(qn("w:fill"), fill_hex.lstrip("#").upper())
-    tc_pr.append(shd)
+# --- DOCX -----------------------------------------------------------------
+#
+# The DOCX report is emitted directly as WordprocessingML. A blank python-docx
+# document is serialized once per process: every package part except
+# ``word/document.xml`` is kept as an already-compressed zip, and each report
+# only appends its own document part. Paragraphs and tables are built with
+# lxml element factories, producing the same markup python-docx would.
+
+_W_P = qn("w:p")
+_W_PPR = qn("w:pPr")
+_W_PSTYLE = qn("w:pStyle")
+_W_R = qn("w:r")
+_W_RPR = qn("w:rPr")
+_W_B = qn("w:b")
+_W_I = qn("w:i")
+_W_COLOR = qn("w:color")
+_W_T = qn("w:t")
+_W_TAB = qn("w:tab")
+_W_BR = qn("w:br")
+_W_TBL = qn("w:tbl")
+_W_TBLPR = qn("w:tblPr")
+_W_TBLW = qn("w:tblW")
+_W_TBLLOOK = qn("w:tblLook")
+_W_TBLGRID = qn("w:tblGrid")
+_W_GRIDCOL = qn("w:gridCol")
+_W_TR = qn("w:tr")
+_W_TC = qn("w:tc")
+_W_TCPR = qn("w:tcPr")
+_W_TCW = qn("w:tcW")
+_W_SHD = qn("w:shd")
+_W_VAL = qn("w:val")
+_W_W = qn("w:w")
+_W_TYPE = qn("w:type")
+_W_FILL = qn("w:fill")
+_W_BODY = qn("w:body")
+_W_SECTPR = qn("w:sectPr")
+_W_PGSZ = qn("w:pgSz")
+_W_PGMAR = qn("w:pgMar")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+_DOCX_DOCUMENT_PART = "word/document.xml"
+_DOCX_SPECIAL_CHARS = re.compile(r"([\t\n\r])")
+
+# (base package bytes, document.xml bytes, usable block width in twips)
+_DOCX_TEMPLATE_CACHE: Optional[Tuple[bytes, bytes, int]] = None
+
+# A cell is (text, (fill hex, font hex) or None, bold)
+_DocxCell = Tuple[str, Optional[Tuple[str, str]], bool]
+
+
+def _load_docx_template() -> Tuple[bytes, bytes, int]:
+    """Serialize the default python-docx template once and split its parts."""
+    global _DOCX_TEMPLATE_CACHE
+    if _DOCX_TEMPLATE_CACHE is None:
+        source = BytesIO()
+        Document().save(source)
+        base = BytesIO()
+        with zipfile.ZipFile(source) as template_zip, zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as base_zip:
+            document_xml = template_zip.read(_DOCX_DOCUMENT_PART)
+            for info in template_zip.infolist():
+                if info.filename != _DOCX_DOCUMENT_PART:
+                    base_zip.writestr(info, template_zip.read(info.filename))
+
+        sect_pr = etree.fromstring(document_xml).find(f"{_W_BODY}/{_W_SECTPR}")
+        page_width = int(sect_pr.find(_W_PGSZ).get(_W_W))
+        margins = sect_pr.find(_W_PGMAR)
+        block_width = page_width - int(margins.get(qn("w:left"))) - int(margins.get(qn("w:right")))
+        _DOCX_TEMPLATE_CACHE = (base.getvalue(), document_xml, block_width)
+    return _DOCX_TEMPLATE_CACHE
+
+
+def _docx_add_run(paragraph, text: str, bold: bool = False, italic: bool = False, color: Optional[str] = None) -> None:
+    run = etree.SubElement(paragraph, _W_R)
+    if bold or italic or color:
+        r_pr = etree.SubElement(run, _W_RPR)
+        if bold:
+            etree.SubElement(r_pr, _W_B)
+        if italic:
+            etree.SubElement(r_pr, _W_I)
+        if color:
+            etree.SubElement(r_pr, _W_COLOR).set(_W_VAL, color.lstrip("#").upper())
+    # Same translation python-docx applies: tabs and line breaks become
+    # dedicated elements between text nodes.
+    for chunk in _DOCX_SPECIAL_CHARS.split(text):
+        if not chunk:
+            continue
+        if chunk == "\t":
+            etree.SubElement(run, _W_TAB)
+        elif chunk in ("\n", "\r"):
+            etree.SubElement(run, _W_BR)
+        else:
+            t = etree.SubElement(run, _W_T)
+            t.text = chunk
+            if chunk.strip() != chunk:
+                t.set(_XML_SPACE, "preserve")
+
+
+def _docx_paragraph(body, text: str = "", style: Optional[str] = None, italic: bool = False) -> None:
+    paragraph = etree.SubElement(body, _W_P)
+    if style:
+        etree.SubElement(etree.SubElement(paragraph, _W_PPR), _W_PSTYLE).set(_W_VAL, style)
+    if text:
+        _docx_add_run(paragraph, text, italic=italic)
+
+
+def _docx_table(
+    body, rows: List[List[_DocxCell]], block_width: int, col_weights: Optional[List[int]] = None
+) -> None:
+    """Append a table whose cells carry optional shading and font colors.
+
+    Columns share ``block_width`` equally unless ``col_weights`` is given.
+    """
+    col_weights = col_weights or [1] * len(rows[0])
+    total_weight = sum(col_weights)
+    col_widths = [str(block_width * weight // total_weight) for weight in col_weights]
+
+    table = etree.SubElement(body, _W_TBL)
+    tbl_pr = etree.SubElement(table, _W_TBLPR)
+    tbl_w = etree.SubElement(tbl_pr, _W_TBLW)
+    tbl_w.set(_W_TYPE, "auto")
+    tbl_w.set(_W_W, "0")
+    tbl_look = etree.SubElement(tbl_pr, _W_TBLLOOK)
+    for attr, value in (
+        ("firstColumn", "1"),
+        ("firstRow", "1"),
+        ("lastColumn", "0"),
+        ("lastRow", "0"),
+        ("noHBand", "0"),
+        ("noVBand", "1"),
+        ("val", "04A0"),
+    ):
+        tbl_look.set(qn(f"w:{attr}"), value)
+    grid = etree.SubElement(table, _W_TBLGRID)
+    for col_width in col_widths:
+        etree.SubElement(grid, _W_GRIDCOL).set(_W_W, col_width)
+
+    for row in rows:
+        tr = etree.SubElement(table, _W_TR)
+        for (text, scheme, bold), col_width in zip(row, col_widths):
+            tc = etree.SubElement(tr, _W_TC)
+            tc_pr = etree.SubElement(tc, _W_TCPR)
+            tc_w = etree.SubElement(tc_pr, _W_TCW)
+            tc_w.set(_W_TYPE, "dxa")
+            tc_w.set(_W_W, col_width)
+            font_hex = None
+            if scheme:
+                fill_hex, font_hex = scheme
+                shd = etree.SubElement(tc_pr, _W_SHD)
+                shd.set(_W_VAL, "clear")
+                shd.set(qn("w:color"), "auto")
+                shd.set(_W_FILL, fill_hex.lstrip("#").upper())
+            _docx_add_run(etree.SubElement(tc, _W_P), text, bold=bold, color=font_hex)
+
+
+def _docx_page_break(body) -> None:
+    run = etree.SubElement(etree.SubElement(body, _W_P), _W_R)
+    etree.SubElement(run, _W_BR).set(_W_TYPE, "page")
+
+
+def _docx_header_row(*titles: str) -> List[_DocxCell]:
+    return [(title, _HEADER_SCHEME, True) for title in titles]
+
+
+def _docx_judgement_row(label: str, julgamento: str) -> List[_DocxCell]:
+    return [(label, None, False), (julgamento, _resolve_hex_colors(julgamento), False)]
+
+
+def _render_docx(build_body: Callable[[Any, int], None]) -> bytes:
+    """Render a DOCX package whose body content is produced by ``build_body``."""
+    base_package, document_xml, block_width = _load_docx_template()
+    root = etree.fromstring(document_xml)
+    body = root.find(_W_BODY)
+    sect_pr = body.find(_W_SECTPR)
+    body.remove(sect_pr)
+    build_body(body, block_width)
+    body.append(sect_pr)
+
+    buffer = BytesIO(base_package)
+    buffer.seek(0, 2)
+    with zipfile.ZipFile(buffer, "a", zipfile.ZIP_DEFLATED) as package:
+        package.writestr(
+            _DOCX_DOCUMENT_PART,
+            etree.tostring(root, encoding="UTF-8", xml_declaration=True, standalone=True),
+        )
+    return buffer.getvalue()
 
-    rgb = RGBColor.from_string(font_hex.lstrip("#"))
-    for paragraph in cell.paragraphs:
-        for run in paragraph.runs:
-            run.font.color.rgb = rgb
 
+# --- PDF ------------------------------------------------------------------
+#
+# Styles, colors and the flowables that never change between reports are
+# built once per process. Each domain section is cached as a fragment keyed by
+# a hash of the domain content, so re-rendering an evaluation only rebuilds
+# the domains that changed. Builds never touch the cached objects: platypus
+# stores layout state on the flowables it handles, so every report receives
+# shallow copies that share the parsed paragraphs and computed table styles.
 
-def _docx_header_style(cell) -> None:
-    fill_hex, font_hex = _HEADER_SCHEME
-    _apply_docx_cell_fill(cell, fill_hex, font_hex)
-    for paragraph in cell.paragraphs:
-        for run in paragraph.runs:
-            run.font.bold = True
+_PDF_COLORS: Dict[str, Tuple[colors.Color, colors.Color]] = {
+    prefix: (colors.HexColor(fill), colors.HexColor(font)) for prefix, (fill, font) in _JUDGEMENT_COLOR_SCHEME.items()
+}
+_PDF_DEFAULT_COLORS = (colors.HexColor(_DEFAULT_SCHEME[0]), colors.HexColor(_DEFAULT_SCHEME[1]))
+_PDF_HEADER_COLORS = (colors.HexColor(_HEADER_SCHEME[0]), colors.HexColor(_HEADER_SCHEME[1]))
+
+_PDF_DASHBOARD_BASE_STYLE = (
+    ("BACKGROUND", (0, 0), (-1, 0), _PDF_HEADER_COLORS[0]),
+    ("TEXTCOLOR", (0, 0), (-1, 0), _PDF_HEADER_COLORS[1]),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+)
+_PDF_ITEMS_TABLE_STYLE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, 0), _PDF_HEADER_COLORS[0]),
+        ("TEXTCOLOR", (0, 0), (-1, 0), _PDF_HEADER_COLORS[1]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]
+)
+_PDF_DASHBOARD_HEADER = ("Escopo", "Julgamento")
+_PDF_ITEMS_HEADER = ("Item", "Resposta", "Observacao")
+
+_PDF_FRAGMENT_CACHE_SIZE = int(os.getenv("PDF_FRAGMENT_CACHE_SIZE", "512"))
+_PDF_FRAGMENT_CACHE: "OrderedDict[str, Tuple[Any, ...]]" = OrderedDict()
+_PDF_FRAGMENT_LOCK = threading.Lock()
+
+_PDF_STYLES_CACHE = None
+_PDF_STATIC_CACHE = None
+
+
+def _pdf_styles():
+    global _PDF_STYLES_CACHE
+    if _PDF_STYLES_CACHE is None:
+        _PDF_STYLES_CACHE = getSampleStyleSheet()
+    return _PDF_STYLES_CACHE
+
+
+def _pdf_static_flowables() -> Dict[str, Any]:
+    """Headings, legend and spacers shared by every PDF report."""
+    global _PDF_STATIC_CACHE
+    if _PDF_STATIC_CACHE is None:
+        styles = _pdf_styles()
+        _PDF_STATIC_CACHE = {
+            "title": Paragraph("Relatorio de Avaliacao RoB 2", styles["Title"]),
+            "dashboard_heading": Paragraph("Resumo visual do risco de vies", styles["Heading2"]),
+            "legend": Paragraph(_LEGEND_TEXT, styles["Italic"]),
+            "pre_heading": Paragraph("Pre-consideracoes", styles["Heading2"]),
+            "global_heading": Paragraph("Julgamento global", styles["Heading2"]),
+            "space_xs": Spacer(1, 0.2 * cm),
+            "space_sm": Spacer(1, 0.3 * cm),
+            "space_md": Spacer(1, 0.4 * cm),
+            "space_lg": Spacer(1, 0.5 * cm),
+        }
+    return _PDF_STATIC_CACHE
+
+
+def _pdf_static(name: str) -> Any:
+    return copy.copy(_pdf_static_flowables()[name])
+
+
+def _pdf_domain_key(dom: models.Domain) -> str:
+    content = [
+        dom.tipo,
+        list((dom.respostas or {}).items()),
+        dom.observacoes_itens or {},
+        dom.julgamento,
+        dom.justificativa,
+    ]
+    encoded = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def _resolve_color(julgamento: str) -> Tuple[colors.Color, colors.Color]:
+    normalized = (julgamento or "").strip().lower()
+    for prefix, pdf_colors in _PDF_COLORS.items():
+        if normalized.startswith(prefix):
+            return pdf_colors
+    return _PDF_DEFAULT_COLORS
 
 
+def _build_pdf_domain_fragment(dom: models.Domain) -> Tuple[Any, ...]:
+    styles = _pdf_styles()
+    static = _pdf_static_flowables()
+    ans_map = _answer_map()
+
+    itens = [list(_PDF_ITEMS_HEADER)]
+    obs_map = dom.observacoes_itens or {}
+    for pergunta_id, resposta in (dom.respostas or {}).items():
+        itens.append(
+            [
+                pergunta_id,
+                ans_map.get(resposta, resposta),
+                obs_map.get(pergunta_id) or "-",
+            ]
+        )
+    table = Table(itens, colWidths=[3 * cm, 4 * cm, 9 * cm])
+    table.setStyle(_PDF_ITEMS_TABLE_STYLE)
+
+    fragment = [
+        Paragraph(f"Dominio {dom.tipo}", styles["Heading2"]),
+        table,
+        static["space_xs"],
+        Paragraph(f"Julgamento do dominio: {dom.julgamento or '-'}", styles["Italic"]),
+    ]
+    if dom.justificativa:
+        fragment.append(Paragraph(dom.justificativa, styles["Normal"]))
+    fragment.append(static["space_md"])
+    return tuple(fragment)
+
+
+def _pdf_domain_fragment(dom: models.Domain) -> List[Any]:
+    key = _pdf_domain_key(dom)
+    with _PDF_FRAGMENT_LOCK:
+        fragment = _PDF_FRAGMENT_CACHE.get(key)
+        if fragment is not None:
+            _PDF_FRAGMENT_CACHE.move_to_end(key)
+
+    if fragment is None:
+        fragment = _build_pdf_domain_fragment(dom)
+        with _PDF_FRAGMENT_LOCK:
+            _PDF_FRAGMENT_CACHE[key] = fragment
+            while len(_PDF_FRAGMENT_CACHE) > _PDF_FRAGMENT_CACHE_SIZE:
+                _PDF_FRAGMENT_CACHE.popitem(last=False)
+    return [copy.copy(flowable) for flowable in fragment]
+
+
+@tracing.traced("renderizacao")
 def generate_pdf_report(avaliacao: models.Evaluation) -> bytes:
     """Gera um relatorio PDF para uma avaliacao."""
     buffer = BytesIO()
@@ -89,30 +396,23 @@ def generate_pdf_report(avaliacao: models.Evaluation) -> bytes:
         topMargin=2 * cm,
         bottomMargin=2 * cm,
     )
-    styles = getSampleStyleSheet()
+    styles = _pdf_styles()
     story = []
 
     estudo = avaliacao.resultado.estudo
     resultado = avaliacao.resultado
 
-    story.append(Paragraph("Relatorio de Avaliacao RoB 2", styles["Title"]))
-    story.append(Spacer(1, 0.3 * cm))
+    story.append(_pdf_static("title"))
+    story.append(_pdf_static("space_sm"))
     story.append(Paragraph(f"Artigo/Referencia: {estudo.referencia}", styles["Normal"]))
     story.append(Paragraph(f"Dominio do estudo: {estudo.desenho or '-'}", styles["Normal"]))
     story.append(Paragraph(f"Desfecho avaliado: {resultado.desfecho}", styles["Normal"]))
-    story.append(Spacer(1, 0.5 * cm))
+    story.append(_pdf_static("space_lg"))
 
     # Dashboard resumido
-    story.append(Paragraph("Resumo visual do risco de vies", styles["Heading2"]))
-    dashboard_rows = [["Escopo", "Julgamento"]]
-    dashboard_styles = [
-        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor(_HEADER_SCHEME[0])),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor(_HEADER_SCHEME[1])),
-        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-    ]
+    story.append(_pdf_static("dashboard_heading"))
+    dashboard_rows = [list(_PDF_DASHBOARD_HEADER)]
+    dashboard_styles = list(_PDF_DASHBOARD_BASE_STYLE)
 
     global_judgement = avaliacao.julgamento_global or "Nao calculado"
     dashboard_rows.append(["Global", global_judgement])
@@ -131,48 +431,19 @@ def generate_pdf_report(avaliacao: models.Evaluation) -> bytes:
     dashboard_table = Table(dashboard_rows, colWidths=[6 * cm, 6 * cm])
     dashboard_table.setStyle(TableStyle(dashboard_styles))
     story.append(dashboard_table)
-    story.append(Spacer(1, 0.2 * cm))
-    story.append(Paragraph("Legenda: Baixo (verde), Algumas preocupacoes (laranja), Alto (vermelho).", styles["Italic"]))
-    story.append(Spacer(1, 0.4 * cm))
+    story.append(_pdf_static("space_xs"))
+    story.append(_pdf_static("legend"))
+    story.append(_pdf_static("space_md"))
 
     if avaliacao.pre_consideracoes:
-        story.append(Paragraph("Pre-consideracoes", styles["Heading2"]))
+        story.append(_pdf_static("pre_heading"))
         story.append(Paragraph(avaliacao.pre_consideracoes, styles["Normal"]))
-        story.append(Spacer(1, 0.4 * cm))
+        story.append(_pdf_static("space_md"))
 
-    ans_map = _answer_map()
     for dom in dominios:
-        story.append(Paragraph(f"Dominio {dom.tipo}", styles["Heading2"]))
-
-        itens = [["Item", "Resposta", "Observacao"]]
-        obs_map = dom.observacoes_itens or {}
-        for pergunta_id, resposta in (dom.respostas or {}).items():
-            itens.append(
-                [
-                    pergunta_id,
-                    ans_map.get(resposta, resposta),
-                    obs_map.get(pergunta_id) or "-",
-                ]
-            )
-        table = Table(itens, colWidths=[3 * cm, 4 * cm, 9 * cm])
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor(_HEADER_SCHEME[0])),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor(_HEADER_SCHEME[1])),
-                    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                ]
-            )
-        )
-        story.append(table)
-        story.append(Spacer(1, 0.2 * cm))
-        story.append(Paragraph(f"Julgamento do dominio: {dom.julgamento or '-'}", styles["Italic"]))
-        if dom.justificativa:
-            story.append(Paragraph(dom.justificativa, styles["Normal"]))
-        story.append(Spacer(1, 0.4 * cm))
-
-    story.append(Paragraph("Julgamento global", styles["Heading2"]))
+        story.extend(_pdf_domain_fragment(dom))
+
+    story.append(_pdf_static("global_heading"))
     story.append(Paragraph(global_judgement, styles["Normal"]))
     if avaliacao.justificativa_global:
         story.append(Paragraph(avaliacao.justificativa_global, styles["Normal"]))
@@ -185,78 +456,379 @@ def generate_pdf_report(avaliacao: models.Evaluation) -> bytes:
     return pdf_bytes
 
 
+@tracing.traced("renderizacao")
 def generate_docx_report(avaliacao: models.Evaluation) -> bytes:
     """Generate a DOCX narrative report for an evaluation."""
-    buffer = BytesIO()
-    document = Document()
-
     estudo = avaliacao.resultado.estudo
     resultado = avaliacao.resultado
+    global_judgement = avaliacao.julgamento_global or "Nao calculado"
+    dominios = sorted(avaliacao.dominios, key=lambda item: item.tipo)
+    ans_map = _answer_map()
 
-    document.add_heading("Relatorio de Avaliacao RoB 2", level=1)
-    document.add_paragraph(f"Artigo/Referencia: {estudo.referencia}")
-    document.add_paragraph(f"Dominio do estudo: {estudo.desenho or '-'}")
-    document.add_paragraph(f"Desfecho avaliado: {resultado.desfecho}")
+    def build_body(body, block_width: int) -> None:
+        _docx_paragraph(body, "Relatorio de Avaliacao RoB 2", style="Heading1")
+        _docx_paragraph(body, f"Artigo/Referencia: {estudo.referencia}")
+        _docx_paragraph(body, f"Dominio do estudo: {estudo.desenho or '-'}")
+        _docx_paragraph(body, f"Desfecho avaliado: {resultado.desfecho}")
+
+        # Dashboard
+        _docx_paragraph(body, "Resumo visual do risco de vies", style="Heading2")
+        dashboard_rows = [_docx_header_row("Escopo", "Julgamento"), _docx_judgement_row("Global", global_judgement)]
+        for dom in dominios:
+            dashboard_rows.append(_docx_judgement_row(f"Dominio {dom.tipo}", dom.julgamento or "Nao avaliado"))
+        _docx_table(body, dashboard_rows, block_width)
+        _docx_paragraph(body, _LEGEND_TEXT, italic=True)
+
+        if avaliacao.pre_consideracoes:
+            _docx_paragraph(body, "Pre-consideracoes", style="Heading2")
+            _docx_paragraph(body, avaliacao.pre_consideracoes)
+
+        for dom in dominios:
+            _docx_paragraph(body, f"Dominio {dom.tipo}", style="Heading2")
+            item_rows = [_docx_header_row("Item", "Resposta", "Observacao")]
+            obs_map = dom.observacoes_itens or {}
+            for pergunta_id, resposta in (dom.respostas or {}).items():
+                item_rows.append(
+                    [
+                        (str(pergunta_id), None, False),
+                        (ans_map.get(resposta, resposta or "-"), None, False),
+                        (str(obs_map.get(pergunta_id) or "-"), None, False),
+                    ]
+                )
+            _docx_table(body, item_rows, block_width)
+            _docx_paragraph(body, f"Julgamento do dominio: {dom.julgamento or '-'}")
+            if dom.justificativa:
+                _docx_paragraph(body, dom.justificativa)
+            _docx_paragraph(body, "")
+
+        _docx_paragraph(body, "Julgamento global", style="Heading2")
+        _docx_paragraph(body, global_judgement)
+        if avaliacao.justificativa_global:
+            _docx_paragraph(body, avaliacao.justificativa_global)
+        if avaliacao.direcao_global:
+            _docx_paragraph(body, f"Direcao do vies: {avaliacao.direcao_global.value}")
+
+    return _render_docx(build_body)
+
+
+# --- Project summary ------------------------------------------------------
+#
+# Standard RoB 2 project summary: the study x domain traffic-light matrix and
+# the (optionally weighted) summary bar chart. All judgements of a project are
+# loaded with a single query and reduced to small integer codes; the plots are
+# drawn directly on the canvas in fixed-height pages, so rendering cost grows
+# linearly with the number of results instead of going through reportlab's
+# table auto-layout.
+
+# Judgement codes (see `matrix`) index the tuples below: 0 = no information,
+# 1 = low, 2 = some concerns, 3 = high.
+_NO_INFO_CODE = NO_INFO_CODE
+_CATEGORY_LABELS = ("Sem informacao", "Baixo", "Algumas preocupacoes", "Alto")
+_CATEGORY_SYMBOLS = ("?", "+", "!", "-")
+_CATEGORY_PREFIXES = ("baixo", "algumas", "alto")
+_CATEGORY_HEX = (_DEFAULT_SCHEME,) + tuple(_JUDGEMENT_COLOR_SCHEME[prefix] for prefix in _CATEGORY_PREFIXES)
+_CATEGORY_COLORS = tuple((colors.HexColor(fill), colors.HexColor(font)) for fill, font in _CATEGORY_HEX)
+# Plotting order used by robvis: low, some concerns, high, no information.
+_CATEGORY_ORDER = (1, 2, 3, _NO_INFO_CODE)
+
+_MATRIX_COLUMNS = MATRIX_COLUMNS
+_TRAFFIC_LIGHT_ROWS_PER_PAGE = 45
+_TRAFFIC_LIGHT_ROW_HEIGHT = 15
+_PNG_SCALE = 2
+
+
+def summarize_judgements(rows: List[Dict[str, Any]], weights: Optional[Dict[int, float]] = None) -> List[List[float]]:
+    """Return, per matrix column, the weighted share of each judgement code.
+
+    ``weights`` maps result ids to their weight (e.g. meta-analysis weight);
+    results not listed count with weight 1.
+    """
+    weights = weights or {}
+    totals = [[0.0] * len(_CATEGORY_LABELS) for _ in _MATRIX_COLUMNS]
+    for row in rows:
+        weight = float(weights.get(row["resultado_id"], 1.0))
+        for column, code in enumerate(row["codes"]):
+            totals[column][code] += weight
+    shares = []
+    for column_totals in totals:
+        total = sum(column_totals)
+        shares.append([value / total if total else 0.0 for value in column_totals])
+    return shares
+
+
+def _paginate(rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    size = _TRAFFIC_LIGHT_ROWS_PER_PAGE
+    return [rows[start:start + size] for start in range(0, len(rows), size)] or [[]]
+
+
+def _fit_text(text: str, width: float, font: str, size: float) -> str:
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "...", font, size) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def _category_legend() -> str:
+    return "Legenda: " + ", ".join(f"{_CATEGORY_SYMBOLS[code]} {_CATEGORY_LABELS[code]}" for code in _CATEGORY_ORDER)
+
+
+def _light_forms(canvas, radius: float) -> Tuple[str, ...]:
+    """Define (once per document) a form XObject with each coloured light.
+
+    Each light is then placed with a single ``doForm`` instead of emitting the
+    circle's bezier path again for every cell.
+    """
+    names = tuple(f"rob2_light_{code}" for code in range(len(_CATEGORY_LABELS)))
+    if getattr(canvas, "_rob2_light_forms", None) != radius:
+        for name, (fill_color, font_color), symbol in zip(names, _CATEGORY_COLORS, _CATEGORY_SYMBOLS):
+            canvas.beginForm(name, lowerx=-radius, lowery=-radius, upperx=radius, uppery=radius)
+            canvas.setFillColor(fill_color)
+            canvas.circle(0, 0, radius, stroke=0, fill=1)
+            canvas.setFillColor(font_color)
+            canvas.setFont("Helvetica-Bold", 7)
+            canvas.drawCentredString(0, -2.5, symbol)
+            canvas.endForm()
+        canvas._rob2_light_forms = radius
+    return names
+
+
+class _TrafficLightFlowable(Flowable):
+    """One page of the traffic-light matrix drawn with a fixed row height."""
+
+    label_widths = (6 * cm, 4 * cm)
+    light_width = 1.1 * cm
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        super().__init__()
+        self.rows = rows
+        self.width = sum(self.label_widths) + self.light_width * len(_MATRIX_COLUMNS)
+        self.height = _TRAFFIC_LIGHT_ROW_HEIGHT * (len(rows) + 1)
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        canvas = self.canv
+        row_height = _TRAFFIC_LIGHT_ROW_HEIGHT
+        radius = row_height * 0.4
+        light_x0 = sum(self.label_widths)
+
+        y = self.height - row_height
+        canvas.setFillColor(_PDF_HEADER_COLORS[0])
+        canvas.rect(0, y, self.width, row_height, stroke=0, fill=1)
+        canvas.setFillColor(_PDF_HEADER_COLORS[1])
+        canvas.setFont("Helvetica-Bold", 8)
+        canvas.drawString(2, y + 4, "Estudo")
+        canvas.drawString(self.label_widths[0] + 2, y + 4, "Desfecho")
+        for column, title in enumerate(_MATRIX_COLUMNS):
+            canvas.drawCentredString(light_x0 + (column + 0.5) * self.light_width, y + 4, title)
+
+        form_names = _light_forms(canvas, radius)
+        canvas.setStrokeColor(colors.lightgrey)
+        canvas.setFont("Helvetica", 7)
+        for row in self.rows:
+            y -= row_height
+            canvas.setFillColor(colors.black)
+            canvas.drawString(2, y + 4, _fit_text(str(row["referencia"]), self.label_widths[0] - 4, "Helvetica", 7))
+            canvas.drawString(
+                self.label_widths[0] + 2,
+                y + 4,
+                _fit_text(str(row["desfecho"]), self.label_widths[1] - 4, "Helvetica", 7),
+            )
+            for column, code in enumerate(row["codes"]):
+                canvas.saveState()
+                canvas.translate(light_x0 + (column + 0.5) * self.light_width, y + row_height / 2)
+                canvas.doForm(form_names[code])
+                canvas.restoreState()
+            canvas.line(0, y, self.width, y)
+
+
+class _SummaryBarFlowable(Flowable):
+    """Stacked horizontal bars with the share of each judgement per column."""
+
+    label_width = 2 * cm
+    bar_height = 0.7 * cm
+    gap = 0.25 * cm
+
+    def __init__(self, shares: List[List[float]], width: float = 15 * cm):
+        super().__init__()
+        self.shares = shares
+        self.width = width
+        self.height = len(shares) * (self.bar_height + self.gap)
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        canvas = self.canv
+        bar_width = self.width - self.label_width
+        y = self.height
+        for title, column_shares in zip(_MATRIX_COLUMNS, self.shares):
+            y -= self.bar_height + self.gap
+            canvas.setFillColor(colors.black)
+            canvas.setFont("Helvetica-Bold", 8)
+            canvas.drawString(0, y + self.bar_height / 2 - 3, title)
+            x = self.label_width
+            for code in _CATEGORY_ORDER:
+                segment = column_shares[code] * bar_width
+                if segment <= 0:
+                    continue
+                fill_color, font_color = _CATEGORY_COLORS[code]
+                canvas.setFillColor(fill_color)
+                canvas.rect(x, y, segment, self.bar_height, stroke=0, fill=1)
+                if segment > 1 * cm:
+                    canvas.setFillColor(font_color)
+                    canvas.setFont("Helvetica", 7)
+                    canvas.drawCentredString(x + segment / 2, y + self.bar_height / 2 - 2.5, f"{column_shares[code]:.0%}")
+                x += segment
+
+
+@tracing.traced("renderizacao")
+def generate_project_pdf_report(
+    project_name: str, rows: List[Dict[str, Any]], weights: Optional[Dict[int, float]] = None
+) -> bytes:
+    """Gera o resumo PDF (barras + semaforo paginado) de um projeto."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2 * cm,
+        leftMargin=2 * cm,
+        topMargin=2 * cm,
+        bottomMargin=2 * cm,
+    )
+    styles = _pdf_styles()
+    story = [
+        Paragraph(f"Resumo RoB 2 do projeto: {project_name}", styles["Title"]),
+        Paragraph(f"Resultados avaliados: {len(rows)}", styles["Normal"]),
+        _pdf_static("space_md"),
+        Paragraph("Resumo por dominio", styles["Heading2"]),
+        _SummaryBarFlowable(summarize_judgements(rows, weights)),
+        _pdf_static("space_xs"),
+        Paragraph(_category_legend(), styles["Italic"]),
+    ]
+    for page_rows in _paginate(rows):
+        story.append(PageBreak())
+        story.append(_TrafficLightFlowable(page_rows))
 
-    # Dashboard
-    document.add_heading("Resumo visual do risco de vies", level=2)
-    dashboard_table = document.add_table(rows=1, cols=2)
-    header_cells = dashboard_table.rows[0].cells
-    header_cells[0].text = "Escopo"
-    header_cells[1].text = "Julgamento"
-    for cell in header_cells:
-        _docx_header_style(cell)
+    doc.build(story)
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+    return pdf_bytes
 
-    global_judgement = avaliacao.julgamento_global or "Nao calculado"
-    row = dashboard_table.add_row().cells
-    row[0].text = "Global"
-    row[1].text = global_judgement
-    fill_hex, font_hex = _resolve_hex_colors(global_judgement)
-    _apply_docx_cell_fill(row[1], fill_hex, font_hex)
-
-    for dom in sorted(avaliacao.dominios, key=lambda item: item.tipo):
-        row = dashboard_table.add_row().cells
-        row[0].text = f"Dominio {dom.tipo}"
-        row[1].text = dom.julgamento or "Nao avaliado"
-        fill_hex, font_hex = _resolve_hex_colors(dom.julgamento or "")
-        _apply_docx_cell_fill(row[1], fill_hex, font_hex)
-
-    legend_paragraph = document.add_paragraph()
-    legend_run = legend_paragraph.add_run("Legenda: Baixo (verde), Algumas preocupacoes (laranja), Alto (vermelho).")
-    legend_run.italic = True
 
-    if avaliacao.pre_consideracoes:
-        document.add_heading("Pre-consideracoes", level=2)
-        document.add_paragraph(avaliacao.pre_consideracoes)
+@tracing.traced("renderizacao")
+def generate_project_docx_report(
+    project_name: str, rows: List[Dict[str, Any]], weights: Optional[Dict[int, float]] = None
+) -> bytes:
+    """Generate the DOCX project summary.
 
-    ans_map = _answer_map()
-    for dom in sorted(avaliacao.dominios, key=lambda item: item.tipo):
-        document.add_heading(f"Dominio {dom.tipo}", level=2)
-        table = document.add_table(rows=1, cols=3)
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = "Item"
-        hdr_cells[1].text = "Resposta"
-        hdr_cells[2].text = "Observacao"
-        for cell in hdr_cells:
-            _docx_header_style(cell)
-        obs_map = dom.observacoes_itens or {}
-        for pergunta_id, resposta in (dom.respostas or {}).items():
-            row_cells = table.add_row().cells
-            row_cells[0].text = str(pergunta_id)
-            row_cells[1].text = ans_map.get(resposta, resposta or "-")
-            row_cells[2].text = str(obs_map.get(pergunta_id) or "-")
-        document.add_paragraph(f"Julgamento do dominio: {dom.julgamento or '-'}")
-        if dom.justificativa:
-            document.add_paragraph(dom.justificativa)
-        document.add_paragraph("")
-
-    document.add_heading("Julgamento global", level=2)
-    document.add_paragraph(global_judgement)
-    if avaliacao.justificativa_global:
-        document.add_paragraph(avaliacao.justificativa_global)
-    if avaliacao.direcao_global:
-        document.add_paragraph(f"Direcao do vies: {avaliacao.direcao_global.value}")
+    The summary bars become a table of weighted shares per column and the
+    traffic-light matrix is split into one table per page.
+    """
+    shares = summarize_judgements(rows, weights)
 
-    document.save(buffer)
-    buffer.seek(0)
+    def build_body(body, block_width: int) -> None:
+        _docx_paragraph(body, f"Resumo RoB 2 do projeto: {project_name}", style="Heading1")
+        _docx_paragraph(body, f"Resultados avaliados: {len(rows)}")
+
+        _docx_paragraph(body, "Resumo por dominio", style="Heading2")
+        summary_rows = [_docx_header_row("Escopo", *(_CATEGORY_LABELS[code] for code in _CATEGORY_ORDER))]
+        for title, column_shares in zip(_MATRIX_COLUMNS, shares):
+            summary_rows.append(
+                [(title, None, True)]
+                + [(f"{column_shares[code]:.0%}", _CATEGORY_HEX[code], False) for code in _CATEGORY_ORDER]
+            )
+        _docx_table(body, summary_rows, block_width)
+        _docx_paragraph(body, _category_legend(), italic=True)
+
+        for page_rows in _paginate(rows):
+            _docx_page_break(body)
+            matrix_rows = [_docx_header_row("Estudo", "Desfecho", *_MATRIX_COLUMNS)]
+            for row in page_rows:
+                matrix_rows.append(
+                    [(str(row["referencia"]), None, False), (str(row["desfecho"]), None, False)]
+                    + [(_CATEGORY_SYMBOLS[code], _CATEGORY_HEX[code], True) for code in row["codes"]]
+                )
+            _docx_table(body, matrix_rows, block_width, col_weights=[6, 4] + [1] * len(_MATRIX_COLUMNS))
+
+    return _render_docx(build_body)
+
+
+def project_png_page_count(rows: List[Dict[str, Any]]) -> int:
+    """Page 1 holds the summary bars; every following page one matrix chunk."""
+    return 1 + len(_paginate(rows))
+
+
+def _png_summary_page(project_name: str, shares: List[List[float]]):
+    scale = _PNG_SCALE
+    font = ImageFont.load_default(size=9 * scale)
+    bold_font = ImageFont.load_default(size=10 * scale)
+    label_width, bar_width, bar_height, gap = 70 * scale, 480 * scale, 22 * scale, 8 * scale
+
+    image = Image.new("RGB", (label_width + bar_width + 20 * scale, 40 * scale + len(shares) * (bar_height + gap)), "white")
+    draw = ImageDraw.Draw(image)
+    draw.text((10 * scale, 10 * scale), f"Resumo RoB 2: {project_name}", fill="black", font=bold_font)
+    y = 35 * scale
+    for title, column_shares in zip(_MATRIX_COLUMNS, shares):
+        draw.text((10 * scale, y + bar_height / 2), title, fill="black", font=bold_font, anchor="lm")
+        x = float(label_width)
+        for code in _CATEGORY_ORDER:
+            segment = column_shares[code] * bar_width
+            if segment <= 0:
+                continue
+            fill_hex, font_hex = _CATEGORY_HEX[code]
+            draw.rectangle([x, y, x + segment, y + bar_height], fill=fill_hex)
+            if segment > 30 * scale:
+                draw.text((x + segment / 2, y + bar_height / 2), f"{column_shares[code]:.0%}", fill=font_hex, font=font, anchor="mm")
+            x += segment
+        y += bar_height + gap
+    return image
+
+
+def _png_traffic_light_page(page_rows: List[Dict[str, Any]]):
+    scale = _PNG_SCALE
+    font = ImageFont.load_default(size=9 * scale)
+    bold_font = ImageFont.load_default(size=10 * scale)
+    row_height = _TRAFFIC_LIGHT_ROW_HEIGHT * scale
+    label_widths = (170 * scale, 110 * scale)
+    light_width = 32 * scale
+    light_x0 = sum(label_widths)
+    width = light_x0 + light_width * len(_MATRIX_COLUMNS) + 8 * scale
+
+    image = Image.new("RGB", (width, row_height * (len(page_rows) + 1)), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, row_height], fill=_HEADER_SCHEME[0])
+    draw.text((4, row_height / 2), "Estudo", fill=_HEADER_SCHEME[1], font=bold_font, anchor="lm")
+    draw.text((label_widths[0] + 4, row_height / 2), "Desfecho", fill=_HEADER_SCHEME[1], font=bold_font, anchor="lm")
+    for column, title in enumerate(_MATRIX_COLUMNS):
+        draw.text((light_x0 + (column + 0.5) * light_width, row_height / 2), title, fill=_HEADER_SCHEME[1], font=bold_font, anchor="mm")
+
+    radius = row_height * 0.4
+    for index, row in enumerate(page_rows, start=1):
+        center_y = index * row_height + row_height / 2
+        draw.text((4, center_y), str(row["referencia"])[:40], fill="black", font=font, anchor="lm")
+        draw.text((label_widths[0] + 4, center_y), str(row["desfecho"])[:24], fill="black", font=font, anchor="lm")
+        for column, code in enumerate(row["codes"]):
+            center_x = light_x0 + (column + 0.5) * light_width
+            fill_hex, font_hex = _CATEGORY_HEX[code]
+            draw.ellipse([center_x - radius, center_y - radius, center_x + radius, center_y + radius], fill=fill_hex)
+            draw.text((center_x, center_y), _CATEGORY_SYMBOLS[code], fill=font_hex, font=bold_font, anchor="mm")
+        bottom = (index + 1) * row_height - 1
+        draw.line([0, bottom, width, bottom], fill=_HEADER_SCHEME[0])
+    return image
+
+
+@tracing.traced("renderizacao")
+def generate_project_png_report(
+    project_name: str, rows: List[Dict[str, Any]], page: int = 1, weights: Optional[Dict[int, float]] = None
+) -> bytes:
+    """Render one page of the project summary as PNG (see `project_png_page_count`)."""
+    if page == 1:
+        image = _png_summary_page(project_name, summarize_judgements(rows, weights))
+    else:
+        image = _png_traffic_light_page(_paginate(rows)[page - 2])
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
     return buffer.getvalue()
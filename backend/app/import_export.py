@@ -1,33 +1,122 @@
-﻿"""Utilities for importing and exporting RoB 2 workbooks."""
+﻿"""Utilities for importing and exporting RoB 2 workbooks and flat files (CSV/NDJSON)."""
 
 from __future__ import annotations
 
+import csv
+import enum
+import itertools
+import json
+import multiprocessing
+import os
 import re
-from io import BytesIO
+import threading
+import zipfile
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO, StringIO, TextIOWrapper
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from xml.etree.ElementTree import ParseError
 
 import yaml
+from lxml.etree import XMLSyntaxError
 from openpyxl import Workbook, load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
 
-from . import models, rule_engine
+from . import answer_validation, audit, metrics, models, revisions, rule_engine, summary, tracing
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
 MAP_PATH = ROOT_DIR / "mapeamento.xlsx.yaml"
 
 
+_TOKEN_PATTERN = re.compile(r"(?P<key>[A-Za-z_][A-Za-z0-9_]*)(?:\[(?P<index>[^\]]+)\])?")
+
+Token = Tuple[str, Optional[str]]
+Getter = Callable[[Dict[str, Any]], Any]
+Setter = Callable[[Dict[str, Any], Any, List[str]], None]
+
+
+class ColumnSpec(NamedTuple):
+    """One mapped spreadsheet column with its precompiled accessors.
+
+    ``getter(record)`` reads the value from an export record and
+    ``setter(store, value, warnings)`` writes an imported value into the
+    intermediate payload; both are built once per mapping path.
+    """
+
+    header: str
+    path: str
+    getter: Getter
+    setter: Setter
+
+
+class SheetSpec(NamedTuple):
+    name: str
+    columns: Tuple[ColumnSpec, ...]
+
+
+class CompiledMapping(NamedTuple):
+    raw: dict
+    keys: Tuple[ColumnSpec, ...]
+    sheets: Tuple[SheetSpec, ...]
+
+
+_MAPPING_CACHE: CompiledMapping | None = None
+_MAPPING_MTIME: int | None = None
+_MAPPING_LOCK = threading.Lock()
+
+
+def get_compiled_mapping() -> CompiledMapping:
+    """Return the compiled mapping, recompiling only when the YAML file changes."""
+    global _MAPPING_CACHE, _MAPPING_MTIME
+    mtime = MAP_PATH.stat().st_mtime_ns
+    if _MAPPING_CACHE is not None and _MAPPING_MTIME == mtime:
+        return _MAPPING_CACHE
+    with _MAPPING_LOCK:
+        if _MAPPING_CACHE is None or _MAPPING_MTIME != mtime:
+            with open(MAP_PATH, "r", encoding="utf-8") as file_obj:
+                _MAPPING_CACHE = compile_mapping(yaml.safe_load(file_obj))
+            _MAPPING_MTIME = mtime
+    return _MAPPING_CACHE
+
+
 def load_mapping() -> dict:
-    with open(MAP_PATH, "r", encoding="utf-8") as file_obj:
-        return yaml.safe_load(file_obj)
+    return get_compiled_mapping().raw
+
+
+def compile_mapping(mapping: dict) -> CompiledMapping:
+    keys = tuple(_compile_column(header, path) for header, path in (mapping.get("chaves") or {}).items())
+    sheets = tuple(
+        SheetSpec(
+            sheet_name,
+            tuple(_compile_column(header, path) for header, path in (sheet_map.get("colunas") or {}).items()),
+        )
+        for sheet_name, sheet_map in (mapping.get("abas") or {}).items()
+    )
+    return CompiledMapping(mapping, keys, sheets)
 
 
-_TOKEN_PATTERN = re.compile(r"(?P<key>[A-Za-z_]+)(?:\[(?P<index>[^\]]+)\])?")
+def _resolve_mapping(mapping: dict | CompiledMapping | None) -> CompiledMapping:
+    if mapping is None:
+        return get_compiled_mapping()
+    if isinstance(mapping, CompiledMapping):
+        return mapping
+    return compile_mapping(mapping)
 
 
-def _split_path(path: str) -> List[Tuple[str, str | None]]:
+def _compile_column(header: str, path: str) -> ColumnSpec:
+    tokens = _split_path(path)
+    return ColumnSpec(header, path, _compile_getter(tokens), _compile_setter(path, tokens))
+
+
+def _split_path(path: str) -> List[Token]:
     return [(match.group("key"), match.group("index")) for match in _TOKEN_PATTERN.finditer(path)]
 
 
+# --- Import setters ---------------------------------------------------------
+
 def _ensure_domain(payload: Dict[int, Dict[str, Any]], domain_id: int) -> Dict[str, Any]:
     entry = payload.setdefault(domain_id, {})
     entry.setdefault("respostas", {})
@@ -37,45 +126,63 @@ def _ensure_domain(payload: Dict[int, Dict[str, Any]], domain_id: int) -> Dict[s
     return entry
 
 
-def _assign_value(store: Dict[str, Any], path: str, value: Any, warnings: List[str]) -> None:
-    tokens = _split_path(path)
+def _compile_setter(path: str, tokens: List[Token]) -> Setter:
     if not tokens:
-        return
+        return lambda store, value, warnings: None
 
     root_key, root_index = tokens[0]
+    rest = tokens[1:]
 
     if root_key == "Dominio":
         if root_index is None:
-            warnings.append(f"Caminho sem índice de domínio: {path}")
-            return
+            message = f"Caminho sem índice de domínio: {path}"
+            return lambda store, value, warnings: warnings.append(message)
         domain_id = int(root_index)
-        domain_entry = _ensure_domain(store.setdefault("dominios", {}), domain_id)
-        _assign_nested(domain_entry, tokens[1:], value)
-        return
+        if len(rest) == 1 and rest[0][1] is not None:
+            field, item = rest[0]
+
+            def set_domain_item(store, value, warnings):
+                domain = _ensure_domain(store.setdefault("dominios", {}), domain_id)
+                domain.setdefault(field, {})[item] = value
+
+            return set_domain_item
+        return lambda store, value, warnings: _assign_nested(
+            _ensure_domain(store.setdefault("dominios", {}), domain_id), rest, value
+        )
 
     if root_key == "Resultado":
-        target = store.setdefault("resultado", {})
-        _assign_nested(target, tokens[1:], value)
-        return
+        if len(rest) == 1 and rest[0][1] is None:
+            field = rest[0][0]
+
+            def set_result_field(store, value, warnings):
+                store.setdefault("resultado", {})[field] = value
+
+            return set_result_field
+        return lambda store, value, warnings: _assign_nested(store.setdefault("resultado", {}), rest, value)
 
     if root_key == "AvaliacaoRob2":
-        meta = store.setdefault("avaliacao_meta", {})
-        if root_index:
-            meta = meta.setdefault(root_key, {})
-        _assign_nested(meta, tokens[1:], value)
-        return
+
+        def set_avaliacao_meta(store, value, warnings):
+            meta = store.setdefault("avaliacao_meta", {})
+            if root_index:
+                meta = meta.setdefault(root_key, {})
+            _assign_nested(meta, rest, value)
+
+        return set_avaliacao_meta
 
     if root_key == "Resumo":
-        resumo = store.setdefault("resumo", {})
         remaining = path.split(".", 1)
         resumo_key = remaining[1] if len(remaining) == 2 else root_key
-        resumo[resumo_key] = value
-        return
 
-    _assign_nested(store.setdefault(root_key, {}), tokens[1:], value, root_index)
+        def set_resumo(store, value, warnings):
+            store.setdefault("resumo", {})[resumo_key] = value
+
+        return set_resumo
+
+    return lambda store, value, warnings: _assign_nested(store.setdefault(root_key, {}), rest, value, root_index)
 
 
-def _assign_nested(current: Dict[str, Any], tokens: List[Tuple[str, str | None]], value: Any, initial_index: str | None = None) -> None:
+def _assign_nested(current: Dict[str, Any], tokens: List[Token], value: Any, initial_index: str | None = None) -> None:
     if initial_index is not None:
         current = current.setdefault(initial_index, {})
 
@@ -94,53 +201,301 @@ def _assign_nested(current: Dict[str, Any], tokens: List[Tuple[str, str | None]]
             current = next_container
 
 
-def import_workbook(file_path: Path) -> Tuple[Dict[str, Any], List[str]]:
-    mapping = load_mapping()
-    workbook = load_workbook(filename=str(file_path), data_only=True)
-    warnings: List[str] = []
+class ImportedRow(NamedTuple):
+    """One evaluation read from a workbook.
 
-    payload: Dict[str, Any] = {"dominios": {}}
+    ``line`` is the spreadsheet row where the result first appears;
+    ``resultado_id``/``referencia`` come from the key columns (``chaves``);
+    ``source`` names the workbook when several are imported together.
+    """
 
-    for sheet_name, sheet_map in mapping.get("abas", {}).items():
-        if sheet_name not in workbook.sheetnames:
-            warnings.append(f"Aba '{sheet_name}' não encontrada no arquivo.")
-            continue
+    line: int
+    resultado_id: int | None
+    referencia: str | None
+    payload: Dict[str, Any]
+    warnings: List[str]
+    source: str | None = None
 
-        ws = workbook[sheet_name]
-        if ws.max_row < 2:
-            continue
 
-        header_index = {cell.value: idx for idx, cell in enumerate(ws[1], start=1) if cell.value}
-        sheet_row = None
-        row_data: Dict[str, Any] = {}
-        for row_idx in range(2, ws.max_row + 1):
-            has_data = False
-            current_row: Dict[str, Any] = {}
-            for header in sheet_map.get("colunas", {}):
-                col_idx = header_index.get(header)
-                if not col_idx:
+def import_workbook(source: Path | BinaryIO) -> Tuple[Dict[str, Any], List[str]]:
+    """Import the first evaluation of a workbook (single-result upload)."""
+    return import_evaluation(source, "xlsx")
+
+
+def import_evaluation(source: Path | BinaryIO, format: str = "xlsx") -> Tuple[Dict[str, Any], List[str]]:
+    """Import the first evaluation of an xlsx, csv or ndjson file."""
+    warnings: List[str] = []
+    rows = iter_evaluations(source, format, warnings)
+    try:
+        first = next(rows, None)
+    finally:
+        rows.close()
+    if first is None:
+        return _build_evaluation_payload({}), warnings
+    return first.payload, warnings + first.warnings
+
+
+def iter_workbook_evaluations(
+    source: Path | BinaryIO,
+    warnings: List[str] | None = None,
+    mapping: dict | None = None,
+) -> Iterator[ImportedRow]:
+    """Stream the evaluations of a workbook, one per data row.
+
+    The workbook is opened in read-only mode and every mapped sheet is read
+    with ``iter_rows(values_only=True)`` in lockstep. Rows of different sheets
+    belong to the same result when their key column (``ResultadoId``, then
+    ``Referencia``) matches; without key columns the n-th non-empty row of each
+    sheet is used. A result is yielded as soon as it has been seen in every
+    sheet, so aligned files (as written by `export_project_workbook`) are
+    processed with constant memory. Workbook-level problems (missing sheets or
+    columns) are appended to ``warnings``.
+    """
+    compiled = _resolve_mapping(mapping)
+    if warnings is None:
+        warnings = []
+    filename = str(source) if isinstance(source, (str, Path)) else source
+    workbook = load_workbook(filename=filename, read_only=True, data_only=True)
+    try:
+        readers = []
+        for sheet in compiled.sheets:
+            if sheet.name not in workbook.sheetnames:
+                warnings.append(f"Aba '{sheet.name}' não encontrada no arquivo.")
+                continue
+            rows = workbook[sheet.name].iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                continue
+            header_index = {value: idx for idx, value in enumerate(header) if value}
+            for column in sheet.columns:
+                if column.header not in header_index:
+                    warnings.append(f"Coluna '{column.header}' ausente na aba '{sheet.name}'.")
+            keys = [(column, header_index[column.header]) for column in compiled.keys if column.header in header_index]
+            present = [(column, header_index[column.header]) for column in sheet.columns if column.header in header_index]
+            readers.append((sheet.name, _iter_sheet_rows(rows, keys, present)))
+
+        pending: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        active = list(readers)
+        while active:
+            for reader in list(active):
+                sheet_name, rows = reader
+                item = next(rows, None)
+                if item is None:
+                    active.remove(reader)
+                    continue
+                line, key, cells = item
+                entry = pending.get(key)
+                if entry is None:
+                    entry = pending[key] = {"line": line, "store": {"dominios": {}}, "warnings": [], "sheets": set()}
+                if sheet_name in entry["sheets"]:
+                    warnings.append(f"Linha {line} da aba '{sheet_name}' repete o resultado {key[1]} e foi ignorada.")
                     continue
-                value = ws.cell(row=row_idx, column=col_idx).value
-                if value not in (None, ""):
-                    has_data = True
-                current_row[header] = value
-            if has_data:
-                sheet_row = row_idx
-                row_data = current_row
+                entry["sheets"].add(sheet_name)
+                for column, value in cells:
+                    column.setter(entry["store"], value, entry["warnings"])
+                if len(entry["sheets"]) == len(readers):
+                    del pending[key]
+                    yield _imported_row(entry)
+
+        for entry in pending.values():
+            yield _imported_row(entry)
+    finally:
+        workbook.close()
+
+
+def _iter_sheet_rows(
+    rows: Iterator[Tuple[Any, ...]],
+    keys: List[Tuple[ColumnSpec, int]],
+    present: List[Tuple[ColumnSpec, int]],
+) -> Iterator[Tuple[int, Tuple[str, Any], List[Tuple[ColumnSpec, Any]]]]:
+    """Yield ``(line, key, cells)`` for every non-empty row of a sheet.
+
+    ``cells`` holds the non-empty (column, value) pairs, key columns included;
+    rows carrying nothing but keys are skipped.
+    """
+    ordinal = 0
+    for line, row in enumerate(rows, start=2):
+        size = len(row)
+        cells = [(column, row[idx]) for column, idx in present if idx < size and row[idx] not in (None, "")]
+        if not cells:
+            continue
+        cells = [(column, row[idx]) for column, idx in keys if idx < size and row[idx] not in (None, "")] + cells
+        ordinal += 1
+        key: Tuple[str, Any] = ("#", ordinal)
+        for column, idx in keys:
+            if idx < size and row[idx] not in (None, ""):
+                key = (column.header, _key_value(row[idx]))
                 break
+        yield line, key, cells
 
-        if not row_data:
-            continue
 
-        for header, path in sheet_map.get("colunas", {}).items():
-            if header not in row_data:
-                warnings.append(f"Coluna '{header}' ausente na aba '{sheet_name}'.")
-                continue
-            value = row_data.get(header)
-            if value in (None, ""):
+def _key_value(value: Any) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _imported_row(entry: Dict[str, Any]) -> ImportedRow:
+    store = entry["store"]
+    row_warnings = entry["warnings"]
+    resultado_id = (store.get("resultado") or {}).pop("id", None)
+    referencia = (store.pop("Estudo", None) or {}).get("referencia")
+    if resultado_id is not None:
+        try:
+            resultado_id = int(_key_value(resultado_id))
+        except ValueError:
+            row_warnings.append(f"Linha {entry['line']}: identificador de resultado inválido '{resultado_id}'.")
+            resultado_id = None
+    return ImportedRow(
+        entry["line"],
+        resultado_id,
+        str(referencia).strip() if referencia is not None else None,
+        _build_evaluation_payload(store, row_warnings),
+        row_warnings,
+    )
+
+
+# --- Workbook archives ------------------------------------------------------
+
+# Workers used to parse the workbooks of a ZIP archive (default: CPU count)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "0")) or None
+# Largest uncompressed workbook accepted inside an archive
+ARCHIVE_MEMBER_MAX_BYTES = int(os.getenv("ARCHIVE_MEMBER_MAX_BYTES", str(25 * 1024 * 1024)))
+
+_RESULT_ID_IN_NAME = re.compile(r"resultado[_\- ]?(\d+)", re.IGNORECASE)
+
+# Damaged workbooks (bad ZIP, missing parts, malformed XML); anything else is a bug
+_WORKBOOK_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, InvalidFileException, KeyError, ParseError, XMLSyntaxError)
+# Members that cannot be extracted (corrupt, encrypted or unsupported compression)
+_ARCHIVE_MEMBER_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError)
+
+_IMPORT_POOL: Optional[ProcessPoolExecutor] = None
+_IMPORT_POOL_LOCK = threading.Lock()
+
+
+def _import_pool_size() -> int:
+    return IMPORT_WORKERS or os.cpu_count() or 1
+
+
+def start_import_pool() -> ProcessPoolExecutor:
+    """Return the process pool shared by all archive imports, creating it once.
+
+    Workers are spawned rather than forked: forking a server process whose
+    other threads may hold locks (logging, metrics, caches) can deadlock the
+    child. Started from the app lifespan; created lazily elsewhere.
+    """
+    global _IMPORT_POOL
+    with _IMPORT_POOL_LOCK:
+        if _IMPORT_POOL is None:
+            _IMPORT_POOL = ProcessPoolExecutor(
+                max_workers=_import_pool_size(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _IMPORT_POOL
+
+
+def shutdown_import_pool() -> None:
+    global _IMPORT_POOL
+    with _IMPORT_POOL_LOCK:
+        pool, _IMPORT_POOL = _IMPORT_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def is_workbook_archive(source: BinaryIO) -> bool:
+    """Tell a ZIP of workbooks apart from a single workbook (also a ZIP)."""
+    position = source.tell()
+    try:
+        if not zipfile.is_zipfile(source):
+            return False
+        source.seek(position)
+        with zipfile.ZipFile(source) as archive:
+            return "[Content_Types].xml" not in archive.namelist()
+    finally:
+        source.seek(position)
+
+
+def iter_archive_evaluations(
+    source: BinaryIO,
+    events: List[Dict[str, Any]],
+    max_workers: int | None = None,
+) -> Iterator[ImportedRow]:
+    """Parse every workbook of a ZIP archive in the shared process pool.
+
+    Members are read one at a time and at most ``2 * max_workers`` (default:
+    the pool size) workbooks are in flight, so memory is bounded by the pool
+    rather than by the archive. Rows are yielded as workbooks finish
+    parsing; one event per workbook (rows read, warnings or error) is
+    appended to ``events``.
+    """
+    pool = start_import_pool()
+    limit = 2 * (max_workers or _import_pool_size())
+    with zipfile.ZipFile(source) as archive:
+        pending = set()
+        members = iter(archive.infolist())
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < limit:
+                info = next(members, None)
+                if info is None:
+                    exhausted = True
+                    break
+                name = info.filename
+                if info.is_dir() or name.startswith("__MACOSX/") or Path(name).name.startswith(("~$", ".")):
+                    continue
+                if not name.lower().endswith(".xlsx"):
+                    events.append({"arquivo": name, "linhas": 0, "avisos": [], "erro": "Arquivo ignorado: não é uma planilha .xlsx."})
+                    continue
+                if info.file_size > ARCHIVE_MEMBER_MAX_BYTES:
+                    events.append({"arquivo": name, "linhas": 0, "avisos": [], "erro": f"Planilha excede o limite de {ARCHIVE_MEMBER_MAX_BYTES} bytes."})
+                    continue
+                try:
+                    data = archive.read(info)
+                except _ARCHIVE_MEMBER_ERRORS:
+                    events.append({"arquivo": name, "linhas": 0, "avisos": [], "erro": "Não foi possível extrair a planilha do arquivo ZIP."})
+                    continue
+                pending.add(pool.submit(parse_workbook_member, name, data))
+            if not pending:
                 continue
-            _assign_value(payload, path, value, warnings)
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows, event = future.result()
+                events.append(event)
+                yield from rows
+
 
+def parse_workbook_member(name: str, data: bytes) -> Tuple[List[ImportedRow], Dict[str, Any]]:
+    """Process-pool worker: parse one workbook of an archive.
+
+    Rows without key columns are matched through the file name
+    (``avaliacao_resultado_<id>.xlsx``, as produced by the single export).
+    """
+    warnings: List[str] = []
+    event: Dict[str, Any] = {"arquivo": name, "linhas": 0, "avisos": warnings, "erro": None}
+    match = _RESULT_ID_IN_NAME.search(Path(name).stem)
+    fallback_id = int(match.group(1)) if match else None
+    rows = []
+    try:
+        for row in iter_workbook_evaluations(BytesIO(data), warnings):
+            if row.resultado_id is None and row.referencia is None:
+                row = row._replace(resultado_id=fallback_id)
+            rows.append(row._replace(source=name))
+    except _WORKBOOK_ERRORS:
+        # Only this file fails; the other workbooks of the archive still import.
+        event["erro"] = "Arquivo não é uma planilha Excel válida."
+        return [], event
+    event["linhas"] = len(rows)
+    return rows, event
+
+
+def _build_evaluation_payload(payload: Dict[str, Any], warnings: List[str] | None = None) -> Dict[str, Any]:
+    """Shape a parsed row into an evaluation payload.
+
+    Answers are normalized against ``perguntas.json``; invalid questions or
+    codes are dropped and reported in ``warnings``.
+    """
+    if warnings is None:
+        warnings = []
     evaluation_payload = {
         "pre_consideracoes": payload.get("Pre_Consideracoes", {}).get("Observacoes")
         if isinstance(payload.get("Pre_Consideracoes"), dict)
@@ -150,7 +505,12 @@ def import_workbook(file_path: Path) -> Tuple[Dict[str, Any], List[str]]:
     }
 
     for domain_id, data in sorted(payload.get("dominios", {}).items(), key=lambda item: item[0]):
-        respostas = {k: v for k, v in (data.get("respostas") or {}).items() if v not in (None, "")}
+        respostas = data.get("respostas") or {}
+        if domain_id in answer_validation.load_validator():
+            respostas = answer_validation.normalize_answers(domain_id, respostas, warnings)
+        else:
+            warnings.append(f"Domínio {domain_id} desconhecido; respostas mantidas sem validação.")
+            respostas = {k: v for k, v in respostas.items() if v not in (None, "")}
         evaluation_payload["dominios"].append(
             {
                 "tipo": domain_id,
@@ -161,11 +521,12 @@ def import_workbook(file_path: Path) -> Tuple[Dict[str, Any], List[str]]:
             }
         )
 
-    return evaluation_payload, warnings
+    return evaluation_payload
 
 
+@tracing.traced("renderizacao")
 def export_workbook(result: models.Result, mapping: dict | None = None) -> Tuple[bytes, List[str]]:
-    mapping = mapping or load_mapping()
+    compiled = _resolve_mapping(mapping)
     workbook = Workbook()
     warnings: List[str] = []
 
@@ -173,21 +534,12 @@ def export_workbook(result: models.Result, mapping: dict | None = None) -> Tuple
     if workbook.sheetnames:
         workbook.remove(workbook.active)
 
-    avaliacao = result.avaliacao
-    dominios = {dom.tipo: dom for dom in (avaliacao.dominios if avaliacao else [])}
-
-    for sheet_name, sheet_map in mapping.get("abas", {}).items():
-        ws = workbook.create_sheet(title=sheet_name)
-        headers = list(sheet_map.get("colunas", {}).keys())
-        ws.append(headers)
-        row_values = []
-        for header in headers:
-            path = sheet_map["colunas"].get(header)
-            value = _resolve_value_for_path(result, dominios, avaliacao, path)
-            if isinstance(value, list):
-                value = ", ".join(str(item) for item in value if item is not None)
-            row_values.append(value)
-        ws.append(row_values)
+    record = result_record(result)
+
+    for sheet in compiled.sheets:
+        ws = workbook.create_sheet(title=sheet.name)
+        ws.append([column.header for column in sheet.columns])
+        ws.append([_cell_value(column.getter(record)) for column in sheet.columns])
 
     buffer = BytesIO()
     workbook.save(buffer)
@@ -195,116 +547,499 @@ def export_workbook(result: models.Result, mapping: dict | None = None) -> Tuple
     return buffer.getvalue(), warnings
 
 
-def _resolve_value_for_path(result: models.Result, dominios: Dict[int, models.Domain], avaliacao: models.Evaluation | None, path: str) -> Any:
-    tokens = _split_path(path)
-    if not tokens:
+@tracing.traced("renderizacao")
+def export_project_workbook(db, project_id: int, target: BinaryIO, mapping: dict | None = None) -> int:
+    """Write one row per result of a project to every mapped sheet.
+
+    Uses openpyxl's write-only mode (rows are flushed to per-sheet temporary
+    files) fed by a server-side cursor, so memory stays flat regardless of the
+    number of results. The key columns from the mapping (``chaves``) come first
+    in every sheet so the file can be imported back. Returns the number of
+    exported results.
+    """
+    compiled = _resolve_mapping(mapping)
+    workbook = Workbook(write_only=True)
+
+    sheets = []
+    for sheet in compiled.sheets:
+        sheet_headers = {column.header for column in sheet.columns}
+        columns = [column for column in compiled.keys if column.header not in sheet_headers] + list(sheet.columns)
+        ws = workbook.create_sheet(title=sheet.name)
+        ws.append([column.header for column in columns])
+        sheets.append((ws, [column.getter for column in columns]))
+
+    total = 0
+    for record in iter_project_records(db, project_id):
+        for ws, getters in sheets:
+            ws.append([_cell_value(getter(record)) for getter in getters])
+        total += 1
+
+    workbook.save(target)
+    return total
+
+
+# --- Flat formats (CSV / NDJSON) ----------------------------------------------
+#
+# CSV and NDJSON use the same mapping as the workbooks, flattened to one
+# column per mapped cell: the key columns keep their header and every other
+# column is named "Aba.Coluna" (e.g. "Dominio1.Q1_1"). One row/line per result.
+
+FLAT_FORMATS = ("csv", "ndjson")
+_TEXT_CHUNK_CHARS = 64 * 1024
+
+
+def flat_columns(mapping: dict | CompiledMapping | None = None) -> List[Tuple[str, ColumnSpec]]:
+    compiled = _resolve_mapping(mapping)
+    columns = [(column.header, column) for column in compiled.keys]
+    for sheet in compiled.sheets:
+        columns.extend((f"{sheet.name}.{column.header}", column) for column in sheet.columns)
+    return columns
+
+
+def iter_csv_export(records: Iterable[Dict[str, Any]], mapping: dict | None = None) -> Iterator[bytes]:
+    """Encode export records as CSV, yielding ~64 KiB UTF-8 chunks."""
+    columns = flat_columns(mapping)
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for record in records:
+        writer.writerow([_cell_value(column.getter(record)) for _, column in columns])
+        if buffer.tell() >= _TEXT_CHUNK_CHARS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson_export(records: Iterable[Dict[str, Any]], mapping: dict | None = None) -> Iterator[bytes]:
+    """Encode export records as NDJSON (one flat object per result)."""
+    columns = flat_columns(mapping)
+    chunk: List[str] = []
+    size = 0
+    for record in records:
+        line = json.dumps({name: column.getter(record) for name, column in columns}, ensure_ascii=False, default=str)
+        chunk.append(line)
+        size += len(line) + 1
+        if size >= _TEXT_CHUNK_CHARS:
+            yield ("\n".join(chunk) + "\n").encode("utf-8")
+            chunk, size = [], 0
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+
+def iter_csv_evaluations(
+    source: BinaryIO,
+    warnings: List[str] | None = None,
+    mapping: dict | None = None,
+) -> Iterator[ImportedRow]:
+    """Stream the evaluations of a CSV file (comma or semicolon separated)."""
+    if warnings is None:
+        warnings = []
+    compiled = _resolve_mapping(mapping)
+    columns = dict(flat_columns(compiled))
+    key_paths = {column.path for column in compiled.keys}
+    text = TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        first_line = text.readline()
+        delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+        reader = csv.reader(itertools.chain([first_line], text), delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            return
+        indexed = _flat_header(header, columns, warnings)
+        for row in reader:
+            size = len(row)
+            values = ((column, row[idx]) for column, idx in indexed if idx < size)
+            imported = _flat_imported_row(reader.line_num, values, key_paths)
+            if imported is not None:
+                yield imported
+    finally:
+        text.detach()
+
+
+def iter_ndjson_evaluations(
+    source: BinaryIO,
+    warnings: List[str] | None = None,
+    mapping: dict | None = None,
+) -> Iterator[ImportedRow]:
+    """Stream the evaluations of an NDJSON file; invalid lines are reported and skipped."""
+    if warnings is None:
+        warnings = []
+    compiled = _resolve_mapping(mapping)
+    columns = dict(flat_columns(compiled))
+    key_paths = {column.path for column in compiled.keys}
+    unknown: set = set()
+    for line_number, raw in enumerate(source, start=1):
+        if not raw.strip():
+            continue
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            warnings.append(f"Linha {line_number}: JSON inválido.")
+            continue
+        if not isinstance(obj, dict):
+            warnings.append(f"Linha {line_number}: esperado um objeto JSON.")
+            continue
+        for name in obj.keys() - columns.keys() - unknown:
+            unknown.add(name)
+            warnings.append(f"Coluna '{name}' não mapeada foi ignorada.")
+        values = ((columns[name], value) for name, value in obj.items() if name in columns)
+        imported = _flat_imported_row(line_number, values, key_paths)
+        if imported is not None:
+            yield imported
+
+
+def _flat_header(header: List[str], columns: Dict[str, ColumnSpec], warnings: List[str]) -> List[Tuple[ColumnSpec, int]]:
+    # Flat files may carry any subset of the mapped columns
+    positions = {name.strip(): idx for idx, name in enumerate(header) if name and name.strip()}
+    for name in positions:
+        if name not in columns:
+            warnings.append(f"Coluna '{name}' não mapeada foi ignorada.")
+    return [(columns[name], idx) for name, idx in positions.items() if name in columns]
+
+
+def _flat_imported_row(line: int, values: Iterable[Tuple[ColumnSpec, Any]], key_paths: set) -> ImportedRow | None:
+    entry = {"line": line, "store": {"dominios": {}}, "warnings": []}
+    has_data = False
+    for column, value in values:
+        if value in (None, ""):
+            continue
+        column.setter(entry["store"], value, entry["warnings"])
+        has_data = has_data or column.path not in key_paths
+    if not has_data:
         return None
+    return _imported_row(entry)
+
+
+def iter_evaluations(source: BinaryIO, format: str, warnings: List[str] | None = None) -> Iterator[ImportedRow]:
+    """Dispatch to the streaming reader of ``format`` (xlsx, csv or ndjson)."""
+    readers = {"xlsx": iter_workbook_evaluations, "csv": iter_csv_evaluations, "ndjson": iter_ndjson_evaluations}
+    return readers[format](source, warnings)
+
+
+# --- Export records ---------------------------------------------------------
+#
+# Exports resolve mapping paths against plain dictionaries instead of ORM
+# objects. A record has the shape
+#   {"resultado": {...}, "estudo": {...}, "avaliacao": {...} | None,
+#    "dominios": {tipo: {...}}}
+# and is built either from a loaded `models.Result` or straight from rows of
+# a streamed query.
+
+_EXPORT_CURSOR_BATCH = 500
+
+# camelCase names used in the spreadsheet -> `resultados` columns
+_RESULT_FIELD_ALIASES = {
+    "resultadoNumerico": "resultado_numerico",
+    "efeitoInteresse": "efeito_interesse",
+    "medidaEfeito": "medida_efeito",
+}
+# Spreadsheet fields stored inside `resultados.fontes`
+_RESULT_SOURCE_KEYS = ("intervencaoExperimental", "comparador")
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _domain_record(domain: models.Domain) -> Dict[str, Any]:
+    return {
+        "respostas": domain.respostas or {},
+        "comentarios": domain.comentarios,
+        "observacoes_itens": domain.observacoes_itens or {},
+        "julgamento": domain.julgamento,
+        "direcao": _enum_value(domain.direcao),
+    }
+
+
+def result_record(result: models.Result) -> Dict[str, Any]:
+    estudo = result.estudo
+    avaliacao = result.avaliacao
+    return {
+        "resultado": {
+            "id": result.id,
+            "desfecho": result.desfecho,
+            "medida_efeito": result.medida_efeito,
+            "efeito_interesse": result.efeito_interesse,
+            "resultado_numerico": result.resultado_numerico,
+            "fontes": result.fontes,
+        },
+        "estudo": {"referencia": estudo.referencia, "desenho": estudo.desenho} if estudo else {},
+        "avaliacao": {
+            "pre_consideracoes": avaliacao.pre_consideracoes,
+            "julgamento_global": avaliacao.julgamento_global,
+            "direcao_global": _enum_value(avaliacao.direcao_global),
+        }
+        if avaliacao
+        else None,
+        "dominios": {dom.tipo: _domain_record(dom) for dom in (avaliacao.dominios if avaliacao else [])},
+    }
+
+
+def iter_project_records(db, project_id: int) -> Iterator[Dict[str, Any]]:
+    """Stream export records for every result of a project.
+
+    A single outer-joined query ordered by result is read through a
+    server-side cursor (``yield_per``); consecutive rows of the same result
+    are folded into one record.
+    """
+    stmt = (
+        select(
+            models.Result.id,
+            models.Result.desfecho,
+            models.Result.medida_efeito,
+            models.Result.efeito_interesse,
+            models.Result.resultado_numerico,
+            models.Result.fontes,
+            models.Study.referencia,
+            models.Study.desenho,
+            models.Evaluation.id,
+            models.Evaluation.pre_consideracoes,
+            models.Evaluation.julgamento_global,
+            models.Evaluation.direcao_global,
+            models.Domain.tipo,
+            models.Domain.respostas,
+            models.Domain.comentarios,
+            models.Domain.observacoes_itens,
+            models.Domain.julgamento,
+            models.Domain.direcao,
+        )
+        .select_from(models.Result)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .outerjoin(
+            models.Evaluation,
+            and_(models.Evaluation.resultado_id == models.Result.id, models.Evaluation.revisor_id.is_(None)),
+        )
+        .outerjoin(models.Domain, models.Domain.avaliacao_id == models.Evaluation.id)
+        .where(models.Study.projeto_id == project_id)
+        .order_by(models.Study.id, models.Result.id, models.Domain.tipo)
+        .execution_options(yield_per=_EXPORT_CURSOR_BATCH)
+    )
+
+    record = None
+    for row in db.execute(stmt):
+        (
+            resultado_id, desfecho, medida_efeito, efeito_interesse, resultado_numerico, fontes,
+            referencia, desenho,
+            avaliacao_id, pre_consideracoes, julgamento_global, direcao_global,
+            tipo, respostas, comentarios, observacoes_itens, julgamento, direcao,
+        ) = row
+        if record is None or record["resultado"]["id"] != resultado_id:
+            if record is not None:
+                yield record
+            record = {
+                "resultado": {
+                    "id": resultado_id,
+                    "desfecho": desfecho,
+                    "medida_efeito": medida_efeito,
+                    "efeito_interesse": efeito_interesse,
+                    "resultado_numerico": resultado_numerico,
+                    "fontes": fontes,
+                },
+                "estudo": {"referencia": referencia, "desenho": desenho},
+                "avaliacao": {
+                    "pre_consideracoes": pre_consideracoes,
+                    "julgamento_global": julgamento_global,
+                    "direcao_global": _enum_value(direcao_global),
+                }
+                if avaliacao_id is not None
+                else None,
+                "dominios": {},
+            }
+        if tipo is not None:
+            record["dominios"][tipo] = {
+                "respostas": respostas or {},
+                "comentarios": comentarios,
+                "observacoes_itens": observacoes_itens or {},
+                "julgamento": julgamento,
+                "direcao": _enum_value(direcao),
+            }
+    if record is not None:
+        yield record
+
+
+def _cell_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value if item is not None)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+# --- Export getters ---------------------------------------------------------
+
+def _const(value: Any) -> Getter:
+    return lambda record: value
+
+
+def _compile_getter(tokens: List[Token]) -> Getter:
+    if not tokens:
+        return _const(None)
     root_key, root_index = tokens[0]
+    rest = tokens[1:]
 
     if root_key == "Resultado":
-        return _resolve_result_value(result, tokens[1:])
+        return _compile_result_getter(rest)
+
+    if root_key == "Estudo":
+        if not rest:
+            return _const(None)
+        field = rest[0][0]
+        return lambda record: record["estudo"].get(field)
 
     if root_key == "Dominio":
         if root_index is None:
-            return None
-        domain = dominios.get(int(root_index))
-        if not domain:
-            return None
-        return _resolve_domain_value(domain, tokens[1:])
+            return _const(None)
+        return _compile_domain_getter(int(root_index), rest)
 
-    if root_key == "AvaliacaoRob2" and avaliacao:
-        return _resolve_avaliacao_meta(avaliacao, tokens[1:])
+    if root_key == "AvaliacaoRob2":
+        return _compile_avaliacao_getter(rest)
 
-    if root_key == "Resumo" and avaliacao:
-        key = tokens[0][0]
-        if len(tokens) >= 2:
-            _, sub_key = tokens[1]
-            target_key = sub_key or tokens[1][0]
+    if root_key == "Resumo":
+        if rest:
+            target_key = rest[0][1] or rest[0][0]
         else:
             target_key = root_index or "valor"
-        if target_key == "JulgamentoGlobal":
-            return avaliacao.julgamento_global
-        if target_key == "DirecaoGlobal":
-            return avaliacao.direcao_global.value if avaliacao.direcao_global else None
-        return None
+        field = {"JulgamentoGlobal": "julgamento_global", "DirecaoGlobal": "direcao_global"}.get(target_key)
+        if field is None:
+            return _const(None)
+        return lambda record: record["avaliacao"][field] if record.get("avaliacao") else None
+
+    return _const(None)
+
+
+def _compile_result_getter(tokens: List[Token]) -> Getter:
+    if not tokens:
+        return _const(None)
+    key, index = tokens[0]
+    rest = tokens[1:]
+
+    if key == "desenho":
+        return lambda record: record["estudo"].get("desenho")
+
+    if key in _RESULT_SOURCE_KEYS:
+
+        def get_source(record):
+            fontes = record["resultado"].get("fontes")
+            return fontes.get(key) if isinstance(fontes, dict) else None
+
+        return get_source
+
+    if key == "fontes" and index is None:
 
-    return None
+        def get_fontes(record):
+            fontes = record["resultado"].get("fontes")
+            if isinstance(fontes, dict):
+                # `persist_imported_evaluation` keeps free-text sources under "descricao"
+                return fontes.get("descricao")
+            return _walk(fontes, rest)
 
+        return get_fontes
 
-def _resolve_result_value(result: models.Result, tokens: List[Tuple[str, str | None]]) -> Any:
-    current: Any = result
+    field = _RESULT_FIELD_ALIASES.get(key, key)
+    if index is None and not rest:
+        return lambda record: record["resultado"].get(field)
+
+    def get_nested(record):
+        current = record["resultado"].get(field)
+        if index is not None:
+            current = current.get(index) if isinstance(current, dict) else None
+        return _walk(current, rest)
+
+    return get_nested
+
+
+def _walk(current: Any, tokens: List[Token]) -> Any:
     for key, index in tokens:
-        if not current:
+        if not isinstance(current, dict):
             return None
-        if hasattr(current, key):
-            current = getattr(current, key)
-        elif isinstance(current, dict):
-            if index:
-                current = current.get(key, {}).get(index)
-            else:
-                current = current.get(key)
-        else:
-            current = None
+        current = current.get(key)
+        if index is not None:
+            current = current.get(index) if isinstance(current, dict) else None
     return current
 
 
-def _resolve_domain_value(domain: models.Domain, tokens: List[Tuple[str, str | None]]) -> Any:
-    current: Any = domain
+def _compile_domain_getter(domain_id: int, tokens: List[Token]) -> Getter:
     for key, index in tokens:
-        if key == "respostas" and index is not None:
-            return (domain.respostas or {}).get(index)
+        if key in ("respostas", "observacoes_itens") and index is not None:
+            field, item = key, index
+            break
         if key == "comentarios":
-            return domain.comentarios
-        if key == "observacoes_itens" and index is not None:
-            return (domain.observacoes_itens or {}).get(index)
+            field, item = key, None
+            break
         if key.lower().startswith("julgamento"):
-            return domain.julgamento
+            field, item = "julgamento", None
+            break
         if key.lower().startswith("direcao"):
-            return domain.direcao.value if domain.direcao else None
-    return None
+            field, item = "direcao", None
+            break
+    else:
+        return _const(None)
 
+    if item is None:
 
-def _resolve_avaliacao_meta(avaliacao: models.Evaluation, tokens: List[Tuple[str, str | None]]) -> Any:
+        def get_domain_field(record):
+            domain = record["dominios"].get(domain_id)
+            return domain[field] if domain else None
+
+        return get_domain_field
+
+    def get_domain_item(record):
+        domain = record["dominios"].get(domain_id)
+        return domain[field].get(item) if domain else None
+
+    return get_domain_item
+
+
+def _compile_avaliacao_getter(tokens: List[Token]) -> Getter:
     if not tokens:
-        return None
+        return _const(None)
     key, index = tokens[0]
+
     if key.lower().startswith("julgamento") and index is not None:
-        dom = next((d for d in avaliacao.dominios if str(d.tipo) == index), None)
-        return dom.julgamento if dom else None
+        if not index.isdigit():
+            return _const(None)
+        domain_id = int(index)
+
+        def get_domain_judgement(record):
+            if not record.get("avaliacao"):
+                return None
+            domain = record["dominios"].get(domain_id)
+            return domain["julgamento"] if domain else None
+
+        return get_domain_judgement
+
     if key == "julgamentoGlobal":
-        return avaliacao.julgamento_global
-    if key.lower().startswith("direcao"):
-        return avaliacao.direcao_global.value if avaliacao.direcao_global else None
-    return None
+        field = "julgamento_global"
+    elif key.lower().startswith("direcao"):
+        field = "direcao_global"
+    else:
+        return _const(None)
+    return lambda record: record["avaliacao"][field] if record.get("avaliacao") else None
 
 
-def persist_imported_evaluation(
-    db,
-    current_user: models.User,
-    result: models.Result,
-    evaluation_payload: Dict[str, Any]
-) -> models.Evaluation:
-    avaliacao = result.avaliacao
-    if not avaliacao:
-        avaliacao = models.Evaluation(resultado_id=result.id, criado_por_id=current_user.id)
-        db.add(avaliacao)
-        db.flush()
+# --- Persistence --------------------------------------------------------------
 
-    resultado_data = evaluation_payload.get("resultado", {}) or {}
+# Rows resolved, scored and written per round of set-based statements
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+
+def _result_changes(result_fontes: Any, resultado_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Map the imported ``Resultado.*`` fields to `resultados` column values."""
+    changes: Dict[str, Any] = {}
     if resultado_data.get("desfecho"):
-        result.desfecho = resultado_data["desfecho"]
-    if resultado_data.get("desenho"):
-        result.desenho = resultado_data["desenho"]
+        changes["desfecho"] = resultado_data["desfecho"]
     if resultado_data.get("resultadoNumerico"):
-        result.resultado_numerico = resultado_data["resultadoNumerico"]
+        changes["resultado_numerico"] = resultado_data["resultadoNumerico"]
     if resultado_data.get("efeitoInteresse"):
-        result.efeito_interesse = resultado_data["efeitoInteresse"]
+        changes["efeito_interesse"] = resultado_data["efeitoInteresse"]
     if resultado_data.get("medida_efeito"):
-        result.medida_efeito = resultado_data["medida_efeito"]
+        changes["medida_efeito"] = resultado_data["medida_efeito"]
 
     fontes_payload = resultado_data.get("fontes")
-    extra_fontes = result.fontes.copy() if isinstance(result.fontes, dict) else {}
-    for key in ("intervencaoExperimental", "comparador"):
+    extra_fontes = dict(result_fontes) if isinstance(result_fontes, dict) else {}
+    for key in _RESULT_SOURCE_KEYS:
         if resultado_data.get(key):
             extra_fontes[key] = resultado_data[key]
     if fontes_payload:
@@ -312,44 +1047,386 @@ def persist_imported_evaluation(
             extra_fontes.update(fontes_payload)
         else:
             extra_fontes["descricao"] = str(fontes_payload)
-    result.fontes = extra_fontes or None
-
-    avaliacao.pre_consideracoes = evaluation_payload.get("pre_consideracoes")
-
-    avaliacao.dominios.clear()
+    changes["fontes"] = extra_fontes or None
+    return changes
+
+
+def _score_domains(
+    dominios: List[Dict[str, Any]],
+    warnings: List[str] | None = None,
+    scored: List[Tuple[str, str]] | None = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Evaluate imported domains with the rule engine.
+
+    Returns the `dominios` column values (without ``avaliacao_id``) and the
+    global fields of the evaluation. ``scored`` takes judgements already
+    computed for the whole batch by `rule_engine.evaluate_domains`.
+    """
+    if scored is None:
+        scored = rule_engine.evaluate_domains((dominio["tipo"], dominio.get("respostas", {})) for dominio in dominios)
+    domain_values: List[Dict[str, Any]] = []
     julgamentos: List[str] = []
     justifications: List[str] = []
     directions: List[models.DirectionType] = []
 
-    for dominio in evaluation_payload.get("dominios", []):
-        julgamento, justificativa = rule_engine.evaluate_domain(dominio["tipo"], dominio.get("respostas", {}))
+    for dominio, (julgamento, justificativa) in zip(dominios, scored):
         direcao_str = dominio.get("direcao") or "NA"
         try:
             direcao_enum = models.DirectionType(direcao_str)
         except ValueError:
+            if warnings is not None:
+                warnings.append(f"Direção '{direcao_str}' inválida no domínio {dominio['tipo']}; usando NA.")
             direcao_enum = models.DirectionType.NA
 
-        novo_dominio = models.Domain(
-            avaliacao_id=avaliacao.id,
-            tipo=dominio["tipo"],
-            respostas=dominio.get("respostas", {}),
-            comentarios=dominio.get("comentarios"),
-            observacoes_itens=dominio.get("observacoes_itens", {}),
-            julgamento=julgamento,
-            justificativa=justificativa,
-            direcao=direcao_enum,
+        domain_values.append(
+            {
+                "tipo": dominio["tipo"],
+                "respostas": dominio.get("respostas", {}),
+                "comentarios": dominio.get("comentarios"),
+                "observacoes_itens": dominio.get("observacoes_itens") or {},
+                "julgamento": julgamento,
+                "justificativa": justificativa,
+                "direcao": direcao_enum,
+            }
         )
-        db.add(novo_dominio)
         julgamentos.append(julgamento)
         if justificativa:
             justifications.append(f"Domínio {dominio['tipo']}: {justificativa}")
         if direcao_enum != models.DirectionType.NA:
             directions.append(direcao_enum)
 
-    avaliacao.julgamento_global = rule_engine.evaluate_global(julgamentos)
-    avaliacao.direcao_global = directions[0] if directions else models.DirectionType.NA
-    avaliacao.justificativa_global = "\n".join(justifications) if justifications else None
+    evaluation_values = {
+        "julgamento_global": rule_engine.evaluate_global(julgamentos),
+        "direcao_global": directions[0] if directions else models.DirectionType.NA,
+        "justificativa_global": "\n".join(justifications) if justifications else None,
+    }
+    return domain_values, evaluation_values
+
+
+def persist_imported_evaluation(
+    db,
+    current_user: models.User,
+    result: models.Result,
+    evaluation_payload: Dict[str, Any]
+) -> models.Evaluation:
+    avaliacao = result.avaliacao
+    old_judgements = summary.evaluation_snapshot(avaliacao)
+    old_state = revisions.evaluation_state(avaliacao)
+    if not avaliacao:
+        avaliacao = models.Evaluation(resultado_id=result.id, criado_por_id=current_user.id)
+        db.add(avaliacao)
+        db.flush()
+    else:
+        avaliacao.versao = models.Evaluation.versao + 1
 
+    resultado_data = evaluation_payload.get("resultado", {}) or {}
+    if resultado_data.get("desenho"):
+        result.desenho = resultado_data["desenho"]
+    for field, value in _result_changes(result.fontes, resultado_data).items():
+        setattr(result, field, value)
+
+    avaliacao.pre_consideracoes = evaluation_payload.get("pre_consideracoes")
+
+    avaliacao.dominios.clear()
+    domain_values, evaluation_values = _score_domains(evaluation_payload.get("dominios", []))
+    for values in domain_values:
+        db.add(models.Domain(avaliacao_id=avaliacao.id, **values))
+    for field, value in evaluation_values.items():
+        setattr(avaliacao, field, value)
+
+    db.flush()
+    new_judgements = ({values["tipo"]: values["julgamento"] for values in domain_values}, evaluation_values["julgamento_global"])
+    summary.record_change(db, result.estudo.projeto_id, old_judgements, new_judgements)
+    new_state = revisions.state_from_values(
+        {**evaluation_values, "pre_consideracoes": avaliacao.pre_consideracoes}, domain_values
+    )
+    revisions.record_revision(db, avaliacao.id, current_user.id, old_state, new_state)
     db.commit()
+    audit.record(audit.IMPORTACAO, current_user.id, avaliacao.id)
+    metrics.inc("rob2_import_rows_total", status="importado")
     db.refresh(avaliacao)
     return avaliacao
+
+
+def persist_imported_evaluations(
+    db,
+    current_user: models.User,
+    project_id: int,
+    rows: Iterable[ImportedRow],
+    batch_size: int | None = None,
+    commit: bool = True,
+) -> Dict[str, Any]:
+    """Persist many imported evaluations of a project in one transaction.
+
+    Returns a per-row report; see `iter_persist_imported_evaluations`.
+    """
+    report: Dict[str, Any] = {"importados": 0, "falhas": 0, "linhas": []}
+    for entries in iter_persist_imported_evaluations(db, current_user, project_id, rows, batch_size, commit):
+        _count_entries(report, entries)
+        report["linhas"].extend(entries)
+    return report
+
+
+def iter_persist_imported_evaluations(
+    db,
+    current_user: models.User,
+    project_id: int,
+    rows: Iterable[ImportedRow],
+    batch_size: int | None = None,
+    commit: bool = True,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Persist imported evaluations batch by batch, yielding each batch report.
+
+    Rows are consumed in batches: each batch resolves its target results with
+    a single query, scores the domains of all its rows in one
+    `rule_engine.evaluate_domains` pass and is written with set-based statements (multi-row INSERT of
+    evaluations/domains, one DELETE of replaced domains, executemany UPDATEs)
+    inside a savepoint. If a batch fails, it is retried one result per
+    savepoint so that only the offending rows are reported as failures.
+    Everything is committed once, after the last batch, and only then are
+    the audit events enqueued. With ``commit=False`` the caller owns the
+    transaction (and the audit of the ``importado`` entries).
+    """
+    seen: Dict[int, str] = {}
+    imported: List[int] = []
+    for batch in _batched(rows, batch_size or IMPORT_BATCH_SIZE):
+        targets = _load_import_targets(db, project_id, batch)
+        entries = []
+        resolved = []
+        prepared = []
+        # Rows of this batch rejected as repeats of a row not yet written: result id -> entries
+        repeats: Dict[int, List[Dict[str, Any]]] = {}
+        claimed: Dict[int, str] = {}
+        for row in batch:
+            entry = {
+                "linha": row.line,
+                "resultado_id": row.resultado_id,
+                "referencia": row.referencia,
+                "status": "falha",
+                "avaliacao_id": None,
+                "julgamento_global": None,
+                "avisos": list(row.warnings),
+                "erro": None,
+            }
+            if row.source is not None:
+                entry["arquivo"] = row.source
+            entries.append(entry)
+            target, error = _resolve_import_target(row, targets)
+            if target is not None and target["id"] in seen:
+                target, error = None, f"Resultado {target['id']} já importado na linha {seen[target['id']]}."
+            elif target is not None and target["id"] in claimed:
+                repeats.setdefault(target["id"], []).append(entry)
+                target, error = None, f"Resultado {target['id']} já importado na linha {claimed[target['id']]}."
+            if target is None:
+                entry["erro"] = error
+                continue
+            claimed[target["id"]] = f"{row.line} de {row.source}" if row.source else str(row.line)
+            entry["resultado_id"] = target["id"]
+            resolved.append((row, entry, target))
+
+        scored = iter(
+            rule_engine.evaluate_domains(
+                (dominio["tipo"], dominio.get("respostas", {}))
+                for row, _, _ in resolved
+                for dominio in row.payload.get("dominios", [])
+            )
+        )
+        for row, entry, target in resolved:
+            dominios = row.payload.get("dominios", [])
+            domain_values, evaluation_values = _score_domains(
+                dominios, entry["avisos"], list(itertools.islice(scored, len(dominios)))
+            )
+            evaluation_values["pre_consideracoes"] = row.payload.get("pre_consideracoes")
+            prepared.append(
+                {
+                    "entry": entry,
+                    "target": target,
+                    "result": _result_changes(target["fontes"], row.payload.get("resultado") or {}),
+                    "evaluation": evaluation_values,
+                    "domains": domain_values,
+                }
+            )
+
+        if prepared:
+            try:
+                with db.begin_nested():
+                    _write_import_batch(db, current_user.id, project_id, prepared)
+            except SQLAlchemyError:
+                for item in prepared:
+                    try:
+                        with db.begin_nested():
+                            _write_import_batch(db, current_user.id, project_id, [item])
+                    except SQLAlchemyError as exc:
+                        item["entry"]["erro"] = f"Falha ao gravar avaliação: {exc.__class__.__name__}"
+                        item["entry"]["avaliacao_id"] = None
+
+            for item in prepared:
+                entry = item["entry"]
+                result_id = item["target"]["id"]
+                if entry["erro"] is None:
+                    entry["status"] = "importado"
+                    entry["julgamento_global"] = item["evaluation"]["julgamento_global"]
+                    imported.append(entry["avaliacao_id"])
+                    # Only written results block later rows; a failed row leaves the result open
+                    seen[result_id] = claimed[result_id]
+                else:
+                    for repeat in repeats.get(result_id, []):
+                        repeat["erro"] = f"Resultado {result_id} não importado: a gravação da linha {claimed[result_id]} falhou."
+        importados = sum(1 for entry in entries if entry["status"] == "importado")
+        metrics.inc("rob2_import_rows_total", importados, status="importado")
+        metrics.inc("rob2_import_rows_total", len(entries) - importados, status="falha")
+        yield entries
+
+    if commit:
+        db.commit()
+        audit.record_many(audit.IMPORTACAO, current_user.id, imported)
+
+
+def _count_entries(report: Dict[str, Any], entries: List[Dict[str, Any]]) -> None:
+    for entry in entries:
+        if entry["status"] == "importado":
+            report["importados"] += 1
+        else:
+            report["falhas"] += 1
+
+
+def _batched(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load_import_targets(db, project_id: int, rows: List[ImportedRow]) -> Dict[str, Dict[Any, Any]]:
+    """Load every result referenced by a batch of rows with one query."""
+    ids = {row.resultado_id for row in rows if row.resultado_id is not None}
+    refs = {row.referencia for row in rows if row.resultado_id is None and row.referencia}
+    targets: Dict[str, Dict[Any, Any]] = {"ids": {}, "refs": {}}
+    conditions = []
+    if ids:
+        conditions.append(models.Result.id.in_(ids))
+    if refs:
+        conditions.append(models.Study.referencia.in_(refs))
+    if not conditions:
+        return targets
+
+    stmt = (
+        select(
+            models.Result.id,
+            models.Result.desfecho,
+            models.Result.fontes,
+            models.Study.referencia,
+            models.Evaluation.id,
+            models.Evaluation.julgamento_global,
+            models.Domain.tipo,
+            models.Domain.julgamento,
+        )
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .outerjoin(
+            models.Evaluation,
+            and_(models.Evaluation.resultado_id == models.Result.id, models.Evaluation.revisor_id.is_(None)),
+        )
+        .outerjoin(models.Domain, models.Domain.avaliacao_id == models.Evaluation.id)
+        .where(models.Study.projeto_id == project_id, or_(*conditions))
+    )
+    for resultado_id, desfecho, fontes, referencia, avaliacao_id, julgamento_global, tipo, julgamento in db.execute(stmt):
+        target = targets["ids"].get(resultado_id)
+        if target is None:
+            target = {
+                "id": resultado_id,
+                "desfecho": desfecho,
+                "fontes": fontes,
+                "avaliacao_id": avaliacao_id,
+                # current judgements, used to update the project summary incrementally
+                "judgements": ({}, julgamento_global),
+            }
+            targets["ids"][resultado_id] = target
+            targets["refs"].setdefault(referencia, []).append(target)
+        if tipo is not None:
+            target["judgements"][0][tipo] = julgamento
+    return targets
+
+
+def _resolve_import_target(row: ImportedRow, targets: Dict[str, Dict[Any, Any]]) -> Tuple[Dict[str, Any] | None, str | None]:
+    if row.resultado_id is not None:
+        target = targets["ids"].get(row.resultado_id)
+        if target is None:
+            return None, f"Resultado {row.resultado_id} não encontrado no projeto."
+        return target, None
+    if not row.referencia:
+        return None, "Linha sem ResultadoId ou Referencia."
+    candidates = targets["refs"].get(row.referencia, [])
+    if len(candidates) > 1:
+        desfecho = (row.payload.get("resultado") or {}).get("desfecho")
+        candidates = [target for target in candidates if desfecho and target["desfecho"] == desfecho]
+    if len(candidates) == 1:
+        return candidates[0], None
+    if not candidates and not targets["refs"].get(row.referencia):
+        return None, f"Estudo '{row.referencia}' não encontrado no projeto."
+    return None, f"Referência '{row.referencia}' corresponde a vários resultados; informe ResultadoId."
+
+
+def _write_import_batch(db, user_id: int, project_id: int, prepared: List[Dict[str, Any]]) -> None:
+    existing = [item for item in prepared if item["target"]["avaliacao_id"] is not None]
+    new = [item for item in prepared if item["target"]["avaliacao_id"] is None]
+
+    if existing:
+        db.execute(
+            update(models.Evaluation),
+            [{"id": item["target"]["avaliacao_id"], **item["evaluation"]} for item in existing],
+        )
+        db.execute(
+            update(models.Evaluation)
+            .where(models.Evaluation.id.in_([item["target"]["avaliacao_id"] for item in existing]))
+            .values(versao=models.Evaluation.versao + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(models.Domain).where(
+                models.Domain.avaliacao_id.in_([item["target"]["avaliacao_id"] for item in existing])
+            )
+        )
+    evaluation_ids = {item["target"]["id"]: item["target"]["avaliacao_id"] for item in existing}
+    if new:
+        inserted = db.execute(
+            insert(models.Evaluation).returning(models.Evaluation.resultado_id, models.Evaluation.id),
+            [{"resultado_id": item["target"]["id"], "criado_por_id": user_id, **item["evaluation"]} for item in new],
+        )
+        evaluation_ids.update(dict(inserted.all()))
+
+    domain_rows = [
+        {"avaliacao_id": evaluation_ids[item["target"]["id"]], **values}
+        for item in prepared
+        for values in item["domains"]
+    ]
+    if domain_rows:
+        db.execute(insert(models.Domain), domain_rows)
+    db.execute(update(models.Result), [{"id": item["target"]["id"], **item["result"]} for item in prepared])
+    summary.apply_delta(
+        db,
+        project_id,
+        summary.snapshot_delta(
+            (
+                item["target"]["judgements"],
+                ({values["tipo"]: values["julgamento"] for values in item["domains"]}, item["evaluation"]["julgamento_global"]),
+            )
+            for item in prepared
+        ),
+    )
+
+    # The whole evaluation is replaced, so every import is stored as a checkpoint
+    revisions.record_checkpoints(
+        db,
+        user_id,
+        {
+            evaluation_ids[item["target"]["id"]]: revisions.state_from_values(item["evaluation"], item["domains"])
+            for item in prepared
+        },
+    )
+
+    for item in prepared:
+        item["entry"]["avaliacao_id"] = evaluation_ids[item["target"]["id"]]
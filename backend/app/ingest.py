@@ -0,0 +1,131 @@
+"""Ingestão em massa de estudos e resultados de um projeto.
+
+Recebe NDJSON com um estudo por linha e seus resultados aninhados::
+
+    {"referencia": "Silva 2020", "desenho": "Paralelo",
+     "resultados": [{"desfecho": "Dor", "medida_efeito": "RR", "fontes": {...}}]}
+
+As linhas são validadas enquanto o arquivo é lido; linhas inválidas são
+relatadas e ignoradas. Cada lote é gravado com dois INSERTs de várias linhas
+(estudos e resultados) com ``RETURNING``, na ordem das linhas, de modo que os
+ids gerados voltam no relatório na mesma ordem do arquivo.
+"""
+
+import json
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+
+from . import models, schemas, summary
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+# (linha, estudo validado ou None, erro)
+ParsedLine = Tuple[int, "schemas.StudyIngest | None", "str | None"]
+
+
+def iter_study_lines(source: BinaryIO) -> Iterator[ParsedLine]:
+    """Lê e valida o NDJSON linha a linha."""
+    for line_number, raw in enumerate(source, start=1):
+        if not raw.strip():
+            continue
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            yield line_number, None, "JSON inválido."
+            continue
+        try:
+            yield line_number, schemas.StudyIngest.parse_obj(obj), None
+        except ValidationError as exc:
+            erros = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            )
+            yield line_number, None, erros
+
+
+def ingest_studies(db, project_id: int, lines: Iterable[ParsedLine], batch_size: int | None = None) -> Dict[str, Any]:
+    """Grava os estudos válidos em lotes e commita uma única vez ao final."""
+    report: Dict[str, Any] = {"estudos": 0, "resultados": 0, "falhas": 0, "linhas": []}
+    batch: List[Tuple[int, schemas.StudyIngest]] = []
+    for line_number, study, error in lines:
+        if study is None:
+            report["falhas"] += 1
+            report["linhas"].append({"linha": line_number, "status": "falha", "estudo_id": None, "resultado_ids": [], "erro": error})
+            continue
+        batch.append((line_number, study))
+        if len(batch) >= (batch_size or INGEST_BATCH_SIZE):
+            _write_batch(db, project_id, batch, report)
+            batch = []
+    if batch:
+        _write_batch(db, project_id, batch, report)
+    if report["estudos"]:
+        # Novos resultados mudam as análises do projeto: invalida caches pela versão
+        summary.apply_delta(db, project_id, {})
+    db.commit()
+    report["linhas"].sort(key=lambda entry: entry["linha"])
+    return report
+
+
+def _write_batch(db, project_id: int, batch: List[Tuple[int, schemas.StudyIngest]], report: Dict[str, Any]) -> None:
+    study_ids = db.execute(
+        insert(models.Study).returning(models.Study.id, sort_by_parameter_order=True),
+        [{"projeto_id": project_id, "referencia": study.referencia, "desenho": study.desenho} for _, study in batch],
+    ).scalars().all()
+
+    result_rows = [
+        {"estudo_id": study_id, **resultado.dict()}
+        for study_id, (_, study) in zip(study_ids, batch)
+        for resultado in study.resultados
+    ]
+    result_ids: List[int] = []
+    if result_rows:
+        result_ids = db.execute(
+            insert(models.Result).returning(models.Result.id, sort_by_parameter_order=True), result_rows
+        ).scalars().all()
+
+    position = 0
+    for study_id, (line_number, study) in zip(study_ids, batch):
+        count = len(study.resultados)
+        report["linhas"].append(
+            {
+                "linha": line_number,
+                "status": "importado",
+                "estudo_id": study_id,
+                "resultado_ids": result_ids[position:position + count],
+                "erro": None,
+            }
+        )
+        position += count
+    report["estudos"] += len(study_ids)
+    report["resultados"] += len(result_ids)
+
+
+def list_studies(db, project_id: int, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+    """Estudos do projeto (por id) com seus resultados, em duas consultas."""
+    total = db.execute(select(func.count(models.Study.id)).where(models.Study.projeto_id == project_id)).scalar_one()
+    estudos = db.execute(
+        select(models.Study)
+        .where(models.Study.projeto_id == project_id)
+        .order_by(models.Study.id)
+        .limit(page_size)
+        .offset((page - 1) * page_size)
+    ).scalars().all()
+    resultados: Dict[int, List[models.Result]] = {estudo.id: [] for estudo in estudos}
+    if resultados:
+        for resultado in db.execute(
+            select(models.Result).where(models.Result.estudo_id.in_(list(resultados))).order_by(models.Result.id)
+        ).scalars():
+            resultados[resultado.estudo_id].append(resultado)
+    itens = [
+        schemas.StudyWithResults(
+            id=estudo.id,
+            projeto_id=estudo.projeto_id,
+            referencia=estudo.referencia,
+            desenho=estudo.desenho,
+            resultados=[schemas.Result.from_orm(resultado) for resultado in resultados[estudo.id]],
+        )
+        for estudo in estudos
+    ]
+    return {"total": total, "pagina": page, "tamanho": page_size, "itens": itens}
@@ -5,17 +5,24 @@ versionada implicitamente no prefixo `/api`. Para documentação automática,
 acessar `/docs` ou `/openapi.json` após iniciar o servidor.
 """
 
+import csv
 import json
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from zipfile import BadZipFile
 
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Response
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Response, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from openpyxl.utils.exceptions import InvalidFileException
 from . import (
     database,
     models,
@@ -24,6 +31,19 @@ from . import (
     rule_engine,
     docx_generator,
     import_export,
+    matrix,
+    summary,
+    answer_filters,
+    analytics,
+    audit,
+    revisions,
+    ingest,
+    cloning,
+    agreement,
+    metrics,
+    query_profiling,
+    answer_validation,
+    tracing,
 
 
 )
@@ -31,7 +51,122 @@ from . import (
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
 
-app = FastAPI(title="RoB2 API", openapi_url="/openapi.json", docs_url="/docs")
+# Exportações maiores que este limite são mantidas em disco até o envio
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _iter_spooled_file(file_obj):
+    """Envia um arquivo temporário em blocos e o fecha ao final."""
+    try:
+        while True:
+            chunk = file_obj.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file_obj.close()
+
+# Limite rígido do corpo das requisições (uploads de planilhas e lotes)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+IMPORT_ERRORS = (BadZipFile, InvalidFileException, UnicodeDecodeError, csv.Error)
+IMPORT_SUFFIXES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+FLAT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+RESULT_EXPORT_FORMATS = ("pdf", "docx", "xlsx") + import_export.FLAT_FORMATS
+
+
+class BodySizeLimitMiddleware:
+    """Interrompe com 413 requisições cujo corpo excede ``max_bytes``.
+
+    O tamanho é verificado pelo ``Content-Length`` declarado e, durante a
+    leitura, a cada bloco recebido, de modo que um upload grande é abortado
+    antes de ser gravado por completo.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        too_large = HTTPException(status_code=413, detail=f"Arquivo excede o limite de {self.max_bytes} bytes")
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+                raise too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise too_large
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _upload_source(file: UploadFile):
+    """Devolve o arquivo já recebido (em memória ou spool) pronto para leitura."""
+    file.file.seek(0, os.SEEK_END)
+    if not file.file.tell():
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+    file.file.seek(0)
+    return file.file
+
+
+def _import_format(format: Optional[str], filename: Optional[str]) -> str:
+    """Formato explícito ou deduzido da extensão do arquivo (padrão: xlsx)."""
+    if format:
+        fmt = format.lower()
+        if fmt not in ("xlsx",) + import_export.FLAT_FORMATS:
+            raise HTTPException(status_code=400, detail="Formato não suportado. Use 'xlsx', 'csv' ou 'ndjson'.")
+        return fmt
+    return IMPORT_SUFFIXES.get(Path(filename or "").suffix.lower(), "xlsx")
+
+
+def evaluation_etag(avaliacao_id: int, versao: int) -> str:
+    return f'"{avaliacao_id}-{versao}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Compara uma lista de ETags de If-Match/If-None-Match (ou ``*``)."""
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def _stream_project_records(project_id: int, encoder):
+    """Codifica os registros do projeto sob demanda, com sessão própria."""
+    db = database.SessionLocal.session_factory()
+    try:
+        yield from encoder(import_export.iter_project_records(db, project_id))
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    audit.start()
+    import_export.start_import_pool()
+    try:
+        yield
+    finally:
+        import_export.shutdown_import_pool()
+        # Grava os eventos de auditoria ainda na fila antes de encerrar
+        audit.stop()
+
+
+app = FastAPI(
+    title="RoB2 API",
+    lifespan=lifespan,
+    openapi_url="/openapi.json",
+    docs_url="/docs",
+    default_response_class=tracing.TracedJSONResponse,
+)
 
 allowed_origins_env = os.getenv("CORS_ORIGINS", "http://localhost:3000")
 allowed_origins = [origin.strip() for origin in allowed_origins_env.split(",") if origin.strip()] or ["http://localhost:3000"]
@@ -47,6 +182,10 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "Accept", "Accept-Language"],
 )
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(query_profiling.QueryProfilingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.post("/api/users/register", response_model=schemas.User, status_code=201, summary="Registra um novo usuário")
@@ -143,7 +282,13 @@ def create_project(proj: schemas.ProjectCreate, db: Session = Depends(database.g
 
 
 @app.post("/api/evaluations", response_model=schemas.Evaluation, summary="Cria ou atualiza avaliação de um resultado")
-def create_or_update_evaluation(eval_in: schemas.EvaluationCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_or_update_evaluation(
+    eval_in: schemas.EvaluationCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
     # Garantir que usuário tem permissão no projeto do resultado
     resultado = db.get(models.Result, eval_in.resultado_id)
     if not resultado:
@@ -153,16 +298,35 @@ def create_or_update_evaluation(eval_in: schemas.EvaluationCreate, db: Session =
 
     # Recuperar ou criar avaliação
     avaliacao = resultado.avaliacao
+    nova = avaliacao is None
+    if if_match is not None:
+        # Concorrência otimista: só grava sobre a versão que o cliente leu
+        if nova or not _etag_matches(if_match, evaluation_etag(avaliacao.id, avaliacao.versao)):
+            raise HTTPException(status_code=412, detail="A avaliação foi alterada por outra pessoa. Recarregue antes de salvar.")
+        bumped = db.execute(
+            update(models.Evaluation)
+            .where(models.Evaluation.id == avaliacao.id, models.Evaluation.versao == avaliacao.versao)
+            .values(versao=models.Evaluation.versao + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if bumped.rowcount == 0:
+            raise HTTPException(status_code=412, detail="A avaliação foi alterada por outra pessoa. Recarregue antes de salvar.")
+        db.expire(avaliacao, ["versao"])
+    elif not nova:
+        avaliacao.versao = models.Evaluation.versao + 1
     if not avaliacao:
         avaliacao = models.Evaluation(resultado_id=resultado.id, criado_por_id=current_user.id)
         db.add(avaliacao)
         db.flush()
+    julgamentos_anteriores = summary.evaluation_snapshot(avaliacao)
+    estado_anterior = revisions.evaluation_state(avaliacao)
     # Atualizar pré‑considerações
     avaliacao.pre_consideracoes = eval_in.pre_consideracoes
 
     # Limpar domínios existentes
     avaliacao.dominios.clear()
     judgments = []
+    novos_dominios = []
     domain_justifications = []
     domain_directions = []
     # Para cada domínio recebido, calcular julgamento e persistir
@@ -184,6 +348,7 @@ def create_or_update_evaluation(eval_in: schemas.EvaluationCreate, db: Session =
             direcao=direcao_enum,
         )
         db.add(domain)
+        novos_dominios.append(domain)
         judgments.append(julgamento)
         if justificativa:
             domain_justifications.append(f"Domínio {dominio_in.tipo}: {justificativa}")
@@ -193,27 +358,227 @@ def create_or_update_evaluation(eval_in: schemas.EvaluationCreate, db: Session =
     global_judgment = rule_engine.evaluate_global(judgments)
     avaliacao.julgamento_global = global_judgment
     avaliacao.direcao_global = domain_directions[0] if domain_directions else models.DirectionType.NA
-    avaliacao.justificativa_global = "
-".join(domain_justifications) if domain_justifications else None
+    avaliacao.justificativa_global = "\n".join(domain_justifications) if domain_justifications else None
+
+    db.flush()
+    novos_julgamentos = ({dom.tipo: judgment for dom, judgment in zip(eval_in.dominios, judgments)}, global_judgment)
+    summary.record_change(db, projeto_id, julgamentos_anteriores, novos_julgamentos)
+    revisions.record_revision(
+        db, avaliacao.id, current_user.id, estado_anterior, revisions.evaluation_state(avaliacao, novos_dominios)
+    )
+    db.commit()
+    audit.record(audit.CRIACAO if nova else audit.ATUALIZACAO, current_user.id, avaliacao.id)
+    db.refresh(avaliacao)
+    response.headers["ETag"] = evaluation_etag(avaliacao.id, avaliacao.versao)
+    return avaliacao
+
+
+@app.post("/api/evaluations/batch", summary="Cria ou atualiza várias avaliações em uma única transação")
+def create_or_update_evaluations_batch(
+    lote: schemas.EvaluationBatch,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Grava um lote de avaliações com o mesmo caminho das importações em massa.
+
+    A permissão é verificada uma vez por projeto, os domínios de todo o lote
+    passam pelo motor de regras de uma vez e tudo é gravado em uma única
+    transação. Respostas inválidas reprovam só o item em que aparecem.
+    Devolve o status de cada item, na ordem recebida.
+    """
+    itens = lote.avaliacoes
+    projetos = dict(
+        db.execute(
+            select(models.Result.id, models.Study.projeto_id)
+            .join(models.Study, models.Study.id == models.Result.estudo_id)
+            .where(models.Result.id.in_({item.resultado_id for item in itens}))
+        ).all()
+    )
+    permitidos = {}
+    for projeto_id in set(projetos.values()):
+        try:
+            auth.check_project_role(db, current_user, projeto_id, [models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+            permitidos[projeto_id] = True
+        except HTTPException:
+            permitidos[projeto_id] = False
+
+    status_itens: List[dict] = [None] * len(itens)
+    linhas_por_projeto = {}
+    primeiro_item = {}
+    for indice, item in enumerate(itens):
+        projeto_id = projetos.get(item.resultado_id)
+        erro = None
+        if projeto_id is None:
+            erro = "Resultado não encontrado"
+        elif not permitidos[projeto_id]:
+            erro = "Sem permissão para acessar este recurso"
+        else:
+            try:
+                dominios = [
+                    {**dominio.dict(), "respostas": answer_validation.normalize_answers(dominio.tipo, dominio.respostas)}
+                    for dominio in item.dominios
+                ]
+            except ValueError as exc:
+                erro = str(exc)
+        if not erro and item.resultado_id in primeiro_item:
+            erro = f"Resultado {item.resultado_id} repetido no lote (já enviado no item {primeiro_item[item.resultado_id]})."
+        if erro:
+            status_itens[indice] = {"indice": indice, "resultado_id": item.resultado_id, "status": "falha", "avaliacao_id": None, "julgamento_global": None, "avisos": [], "erro": erro}
+            continue
+        primeiro_item[item.resultado_id] = indice
+        payload = {"resultado": {}, "pre_consideracoes": item.pre_consideracoes, "dominios": dominios}
+        linhas_por_projeto.setdefault(projeto_id, []).append(import_export.ImportedRow(indice, item.resultado_id, None, payload, []))
+
+    gravadas = []
+    for projeto_id, linhas in linhas_por_projeto.items():
+        relatorio = import_export.persist_imported_evaluations(db, current_user, projeto_id, linhas, commit=False)
+        for entry in relatorio["linhas"]:
+            indice = entry.pop("linha")
+            entry.pop("referencia", None)
+            if entry["status"] == "importado":
+                entry["status"] = "gravado"
+                gravadas.append(entry["avaliacao_id"])
+            status_itens[indice] = {"indice": indice, **entry}
+    db.commit()
+    audit.record_many(audit.LOTE, current_user.id, gravadas)
+    return {"gravadas": len(gravadas), "falhas": len(itens) - len(gravadas), "itens": status_itens}
+
+
+@app.post("/api/results/{result_id}/clone-domains", summary="Copia domínios da avaliação para os demais resultados do estudo")
+def clone_evaluation_domains(
+    result_id: int,
+    pedido: schemas.DomainClone,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    resultado = db.get(models.Result, result_id)
+    if not resultado:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado")
+    auth.check_project_role(db, current_user, resultado.estudo.projeto_id, [models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    tipos = sorted(set(pedido.dominios))
+    if any(tipo not in matrix.PROJECT_DOMAINS for tipo in tipos):
+        raise HTTPException(status_code=400, detail="Domínio inválido. Use valores de 1 a 5.")
+    try:
+        alterados = cloning.clone_domains(db, current_user.id, resultado, tipos, pedido.resultados)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    db.commit()
+    audit.record_many(audit.CLONAGEM, current_user.id, [item["avaliacao_id"] for item in alterados])
+    return {"resultado_id": resultado.id, "dominios": tipos, "resultados": alterados}
 
+
+@app.post("/api/results/{result_id}/reviews", response_model=schemas.Evaluation, summary="Grava a avaliação independente do revisor atual")
+def save_result_review(
+    result_id: int,
+    revisao: schemas.ReviewCreate,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    resultado = db.get(models.Result, result_id)
+    if not resultado:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado")
+    projeto_id = resultado.estudo.projeto_id
+    auth.check_project_role(db, current_user, projeto_id, [models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    avaliacao, nova = agreement.save_review(
+        db, current_user, resultado, [dominio.dict() for dominio in revisao.dominios], revisao.pre_consideracoes
+    )
     db.commit()
+    audit.record(audit.REVISAO, current_user.id, avaliacao.id)
     db.refresh(avaliacao)
+    agreement.apply_saved_review(projeto_id, avaliacao, nova)
     return avaliacao
 
 
+@app.get("/api/results/{result_id}/reviews", response_model=List[schemas.Evaluation], summary="Lista as avaliações independentes de um resultado")
+def list_result_reviews(result_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    resultado = db.get(models.Result, result_id)
+    if not resultado:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado")
+    auth.check_project_role(db, current_user, resultado.estudo.projeto_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    return agreement.list_reviews(db, result_id)
+
+
 @app.get("/api/results/{result_id}/evaluation", response_model=schemas.Evaluation, summary="Obtém avaliação de um resultado")
-def get_evaluation(result_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+def get_evaluation(
+    result_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    # Só id/versão/projeto: uma ETag válida dispensa carregar os domínios
+    atual = db.execute(
+        select(models.Evaluation.id, models.Evaluation.versao, models.Study.projeto_id)
+        .join(models.Result, models.Result.id == models.Evaluation.resultado_id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .where(models.Evaluation.resultado_id == result_id, models.Evaluation.revisor_id.is_(None))
+    ).first()
+    if atual is None:
+        raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+    avaliacao_id, versao, projeto_id = atual
+    auth.check_project_role(db, current_user, projeto_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    etag = evaluation_etag(avaliacao_id, versao)
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return db.get(models.Evaluation, avaliacao_id, options=[selectinload(models.Evaluation.dominios)])
+
+
+def _readable_evaluation(db: Session, current_user: models.User, result_id: int) -> models.Evaluation:
     resultado = db.get(models.Result, result_id)
     if not resultado or not resultado.avaliacao:
         raise HTTPException(status_code=404, detail="Avaliação não encontrada")
-    projeto_id = resultado.estudo.projeto_id
-    auth.check_project_role(db, current_user, projeto_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    auth.check_project_role(db, current_user, resultado.estudo.projeto_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
     return resultado.avaliacao
 
 
-@app.post("/api/import", summary="Importa avaliações a partir de arquivo Excel")
+@app.get("/api/results/{result_id}/evaluation/revisions", summary="Lista as revisões da avaliação de um resultado")
+def list_evaluation_revisions(result_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+    avaliacao = _readable_evaluation(db, current_user, result_id)
+    return revisions.list_revisions(db, avaliacao.id)
+
+
+@app.get("/api/results/{result_id}/evaluation/revisions/{numero}", summary="Reconstrói uma revisão da avaliação")
+def get_evaluation_revision(
+    result_id: int,
+    numero: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    avaliacao = _readable_evaluation(db, current_user, result_id)
+    estados = revisions.reconstruct(db, avaliacao.id, numero)
+    if numero not in estados:
+        raise HTTPException(status_code=404, detail="Revisão não encontrada")
+    return {"numero": numero, **estados[numero]}
+
+
+@app.get("/api/results/{result_id}/evaluation/diff", summary="Diferenças entre duas revisões da avaliação")
+def diff_evaluation_revisions(
+    result_id: int,
+    de: Optional[int] = None,
+    para: Optional[int] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    avaliacao = _readable_evaluation(db, current_user, result_id)
+    # Padrão: última revisão comparada com a anterior
+    if para is None:
+        para = revisions.latest_revision(db, avaliacao.id)
+    if de is None:
+        de = para - 1
+    if de == 0:
+        estados = {0: revisions.EMPTY_STATE, **revisions.reconstruct(db, avaliacao.id, para)}
+    else:
+        estados = revisions.reconstruct(db, avaliacao.id, de, para)
+    if de not in estados or para not in estados:
+        raise HTTPException(status_code=404, detail="Revisão não encontrada")
+    return {"de": de, "para": para, "diferencas": revisions.diff_states(estados[de], estados[para])}
+
+
+@app.post("/api/import", summary="Importa avaliação a partir de arquivo Excel, CSV ou NDJSON")
 async def import_excel(
     result_id: int,
+    format: Optional[str] = None,
     file: UploadFile = File(...),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user),
@@ -225,22 +590,13 @@ async def import_excel(
     projeto_id = resultado.estudo.projeto_id
     auth.check_project_role(db, current_user, projeto_id, [models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
 
-    from tempfile import NamedTemporaryFile
-
-    uploaded_bytes = await file.read()
-    if not uploaded_bytes:
-        raise HTTPException(status_code=400, detail="Arquivo vazio")
-
-    suffix = Path(file.filename or "avaliacao.xlsx").suffix or ".xlsx"
-    with NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-        temp_file.write(uploaded_bytes)
-        temp_path = Path(temp_file.name)
-
+    fmt = _import_format(format, file.filename)
+    source = _upload_source(file)
     try:
-        evaluation_payload, warnings = import_export.import_workbook(temp_path)
-        avaliacao = import_export.persist_imported_evaluation(db, current_user, resultado, evaluation_payload)
-    finally:
-        temp_path.unlink(missing_ok=True)
+        evaluation_payload, warnings = await run_in_threadpool(import_export.import_evaluation, source, fmt)
+    except IMPORT_ERRORS:
+        raise HTTPException(status_code=400, detail=f"Arquivo inválido para o formato '{fmt}'")
+    avaliacao = import_export.persist_imported_evaluation(db, current_user, resultado, evaluation_payload)
 
     return {
         "resultado_id": resultado.id,
@@ -250,7 +606,7 @@ async def import_excel(
     }
 
 
-@app.get("/api/results/{result_id}/export", summary="Exporta avaliação para PDF ou DOCX")
+@app.get("/api/results/{result_id}/export", summary="Exporta avaliação para PDF, DOCX, XLSX, CSV ou NDJSON")
 async def export_evaluation(result_id: int, format: str = "pdf", db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
     resultado = db.get(models.Result, result_id)
     if not resultado or not resultado.avaliacao:
@@ -259,13 +615,17 @@ async def export_evaluation(result_id: int, format: str = "pdf", db: Session = D
     auth.check_project_role(db, current_user, projeto_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
 
     avaliacao = resultado.avaliacao
+    if format.lower() in RESULT_EXPORT_FORMATS:
+        audit.record(f"{audit.EXPORTACAO}:{format.lower()}", current_user.id, avaliacao.id)
     if format.lower() == "pdf":
-        pdf_bytes = docx_generator.generate_pdf_report(avaliacao)
+        with metrics.timer("rob2_export_duration_seconds", escopo="resultado", formato="pdf"):
+            pdf_bytes = docx_generator.generate_pdf_report(avaliacao)
         filename = f"avaliacao_resultado_{resultado.id}.pdf"
         headers = {"Content-Disposition": f"attachment; filename={filename}"}
         return StreamingResponse(iter([pdf_bytes]), media_type="application/pdf", headers=headers)
     elif format.lower() == "docx":
-        docx_bytes = docx_generator.generate_docx_report(avaliacao)
+        with metrics.timer("rob2_export_duration_seconds", escopo="resultado", formato="docx"):
+            docx_bytes = docx_generator.generate_docx_report(avaliacao)
         filename = f"avaliacao_resultado_{resultado.id}.docx"
         headers = {"Content-Disposition": f"attachment; filename={filename}"}
         return StreamingResponse(
@@ -274,17 +634,400 @@ async def export_evaluation(result_id: int, format: str = "pdf", db: Session = D
             headers=headers,
         )
     elif format.lower() == "xlsx":
-        workbook_bytes, warnings = import_export.export_workbook(resultado)
+        with metrics.timer("rob2_export_duration_seconds", escopo="resultado", formato="xlsx"):
+            workbook_bytes, warnings = import_export.export_workbook(resultado)
         headers = {"Content-Disposition": f"attachment; filename=avaliacao_resultado_{resultado.id}.xlsx"}
         if warnings:
-            headers["X-RoB2-Warnings"] = \"; \".join(warnings)
+            headers["X-RoB2-Warnings"] = "; ".join(warnings)
         return StreamingResponse(
             iter([workbook_bytes]),
             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             headers=headers,
         )
+    elif format.lower() == "csv":
+        headers = {"Content-Disposition": f"attachment; filename=avaliacao_resultado_{resultado.id}.csv"}
+        chunks = metrics.timed_iter(
+            import_export.iter_csv_export([import_export.result_record(resultado)]),
+            "rob2_export_duration_seconds", escopo="resultado", formato="csv",
+        )
+        return StreamingResponse(chunks, media_type=FLAT_MEDIA_TYPES["csv"], headers=headers)
+    elif format.lower() == "ndjson":
+        headers = {"Content-Disposition": f"attachment; filename=avaliacao_resultado_{resultado.id}.ndjson"}
+        chunks = metrics.timed_iter(
+            import_export.iter_ndjson_export([import_export.result_record(resultado)]),
+            "rob2_export_duration_seconds", escopo="resultado", formato="ndjson",
+        )
+        return StreamingResponse(chunks, media_type=FLAT_MEDIA_TYPES["ndjson"], headers=headers)
     else:
-        raise HTTPException(status_code=400, detail="Formato não suportado. Use 'pdf', 'docx' ou 'xlsx'.")
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use 'pdf', 'docx', 'xlsx', 'csv' ou 'ndjson'.")
+
+
+@app.get("/api/projects/{project_id}/summary", summary="Resumo dos julgamentos do projeto por domínio e global")
+def get_project_summary(
+    project_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    return summary.serialize_summary(summary.ensure_summary(db, project_id))
+
+
+@app.get("/api/projects/{project_id}/matrix", summary="Matriz colunar de julgamentos (resultado × domínio) do projeto")
+def get_project_matrix(
+    project_id: int,
+    format: str = "json",
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+
+    if format.lower() not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use 'json' ou 'binary'.")
+    dados = matrix.load_project_matrix(db, project_id)
+    if format.lower() == "binary":
+        return Response(
+            content=matrix.matrix_to_binary(dados),
+            media_type="application/octet-stream",
+            headers={"X-RoB2-Columns": ",".join(matrix.MATRIX_COLUMNS)},
+        )
+    # JSONResponse evita o jsonable_encoder, caro para listas grandes
+    return JSONResponse(matrix.matrix_to_json(project_id, dados))
+
+
+@app.post("/api/projects/{project_id}/studies/bulk", summary="Cadastra estudos e resultados em massa a partir de NDJSON")
+async def ingest_project_studies(
+    project_id: int,
+    request: Request,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+
+    # O corpo é recebido em blocos (limitado por BodySizeLimitMiddleware) e lido linha a linha
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        if not spool.tell():
+            raise HTTPException(status_code=400, detail="Corpo vazio")
+        spool.seek(0)
+        return await run_in_threadpool(ingest.ingest_studies, db, project_id, ingest.iter_study_lines(spool))
+    finally:
+        spool.close()
+
+
+@app.get("/api/projects/{project_id}/studies", summary="Lista os estudos do projeto com seus resultados")
+def list_project_studies(
+    project_id: int,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    return ingest.list_studies(db, project_id, page=page, page_size=page_size)
+
+
+@app.get("/api/projects/{project_id}/results/filter", summary="Filtra resultados pelas respostas às perguntas sinalizadoras")
+def filter_project_results(
+    project_id: int,
+    q: List[str] = Query(..., description="Predicados no formato pergunta:códigos, ex.: 1.2:N,PN"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=answer_filters.MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    try:
+        predicados = answer_filters.parse_predicates(q)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return answer_filters.filter_results(db, project_id, predicados, page=page, page_size=page_size)
+
+
+def _project_snapshot(db: Session, current_user: models.User, project_id: int) -> analytics.AnalyticsSnapshot:
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    return analytics.get_snapshot(db, project_id)
+
+
+@app.get("/api/projects/{project_id}/analytics/answers", summary="Distribuição das respostas por pergunta sinalizadora")
+def get_answer_distribution(
+    project_id: int,
+    pergunta: Optional[List[str]] = Query(None),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    snapshot = _project_snapshot(db, current_user, project_id)
+    try:
+        return analytics.answer_distribution(snapshot, pergunta)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/projects/{project_id}/analytics/crosstab", summary="Tabela cruzada entre julgamentos e/ou respostas")
+def get_judgement_crosstab(
+    project_id: int,
+    linha: str = "Global",
+    coluna: str = "D1",
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    snapshot = _project_snapshot(db, current_user, project_id)
+    try:
+        return analytics.crosstab(snapshot, linha, coluna)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.post("/api/projects/{project_id}/analytics/what-if", summary="Reavalia o projeto sob uma variante das regras")
+def post_what_if(
+    project_id: int,
+    variante: schemas.RuleVariant,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    snapshot = _project_snapshot(db, current_user, project_id)
+    try:
+        return analytics.what_if(snapshot, variante.regras, variante.regra_global)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/projects/{project_id}/agreement", summary="Kappa de Cohen e concordância entre dois revisores")
+def get_reviewer_agreement(
+    project_id: int,
+    revisor_a: Optional[int] = None,
+    revisor_b: Optional[int] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    try:
+        return agreement.agreement_report(db, project_id, revisor_a, revisor_b)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/projects/{project_id}/disagreements", summary="Resultados em que os revisores divergem")
+def list_reviewer_disagreements(
+    project_id: int,
+    revisor_a: Optional[int] = None,
+    revisor_b: Optional[int] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=answer_filters.MAX_PAGE_SIZE),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    try:
+        return agreement.disagreements(db, project_id, revisor_a, revisor_b, page=page, page_size=page_size)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/api/projects/{project_id}/export", summary="Exporta todas as avaliações do projeto (xlsx, csv ou ndjson)")
+def export_project(
+    project_id: int,
+    format: str = "xlsx",
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+    fmt = format.lower()
+    if fmt in ("xlsx",) + import_export.FLAT_FORMATS:
+        audit.record_project(f"{audit.EXPORTACAO}:{fmt}", current_user.id, project_id)
+    if fmt in import_export.FLAT_FORMATS:
+        encoder = import_export.iter_csv_export if fmt == "csv" else import_export.iter_ndjson_export
+        headers = {"Content-Disposition": f"attachment; filename=avaliacoes_projeto_{project_id}.{fmt}"}
+        chunks = metrics.timed_iter(
+            _stream_project_records(project_id, encoder), "rob2_export_duration_seconds", escopo="projeto", formato=fmt
+        )
+        return StreamingResponse(chunks, media_type=FLAT_MEDIA_TYPES[fmt], headers=headers)
+    if fmt != "xlsx":
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use 'xlsx', 'csv' ou 'ndjson'.")
+
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    with metrics.timer("rob2_export_duration_seconds", escopo="projeto", formato="xlsx"):
+        total = import_export.export_project_workbook(db, project_id, spool)
+    spool.seek(0)
+    headers = {
+        "Content-Disposition": f"attachment; filename=avaliacoes_projeto_{project_id}.xlsx",
+        "X-RoB2-Results": str(total),
+    }
+    return StreamingResponse(
+        _iter_spooled_file(spool),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers=headers,
+    )
+
+
+def _ndjson_line(payload: dict) -> bytes:
+    return (json.dumps(payload, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def _stream_archive_import(archive, user_id: int, project_id: int):
+    """Importa um ZIP de planilhas emitindo o progresso em NDJSON.
+
+    Roda depois que a rota retorna, então usa sessão própria e é dona do
+    arquivo recebido, que fecha ao final.
+    """
+    db = database.SessionLocal.session_factory()
+    events: List[dict] = []
+    totals = {"arquivos": 0, "importados": 0, "falhas": 0}
+
+    def drain_events():
+        while events:
+            event = events.pop(0)
+            totals["arquivos"] += 1
+            yield _ndjson_line({"evento": "arquivo", **event})
+
+    try:
+        user = db.get(models.User, user_id)
+        rows = import_export.iter_archive_evaluations(archive, events)
+        for entries in import_export.iter_persist_imported_evaluations(db, user, project_id, rows):
+            yield from drain_events()
+            importados = sum(1 for entry in entries if entry["status"] == "importado")
+            totals["importados"] += importados
+            totals["falhas"] += len(entries) - importados
+            yield _ndjson_line({"evento": "lote", "importados": totals["importados"], "falhas": totals["falhas"], "linhas": entries})
+        yield from drain_events()
+        yield _ndjson_line({"evento": "fim", **totals})
+    except Exception as exc:
+        db.rollback()
+        yield _ndjson_line({"evento": "erro", "detalhe": f"Importação interrompida: {exc.__class__.__name__}"})
+    finally:
+        db.close()
+        archive.close()
+
+
+@app.post("/api/projects/{project_id}/import", summary="Importa avaliações do projeto a partir de uma planilha ou de um ZIP de planilhas")
+async def import_project_workbook(
+    project_id: int,
+    format: Optional[str] = None,
+    file: UploadFile = File(...),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+
+    fmt = _import_format(format, file.filename)
+    source = _upload_source(file)
+    if fmt == "xlsx" and import_export.is_workbook_archive(source):
+        # O UploadFile é fechado antes do envio da resposta; o stream assume o arquivo original
+        file.file = SpooledTemporaryFile()
+        return StreamingResponse(
+            _stream_archive_import(source, current_user.id, project_id),
+            media_type="application/x-ndjson",
+        )
+
+    warnings: List[str] = []
+    rows = import_export.iter_evaluations(source, fmt, warnings)
+    try:
+        # A leitura do arquivo é preguiçosa e intercalada com a gravação
+        report = await run_in_threadpool(import_export.persist_imported_evaluations, db, current_user, project_id, rows)
+    except IMPORT_ERRORS:
+        raise HTTPException(status_code=400, detail=f"Arquivo inválido para o formato '{fmt}'")
+    report["avisos"] = warnings
+    return report
+
+
+def _parse_result_weights(value: Optional[str], result_ids: set) -> Optional[dict]:
+    """Lê ``resultado_id:peso,...``; os resultados precisam ser do projeto."""
+    if not value:
+        return None
+    pesos = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        try:
+            resultado, peso = item.split(":")
+            resultado_id, peso_valor = int(resultado), float(peso)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Peso inválido: '{item.strip()}'. Use 'resultado_id:peso'.")
+        if resultado_id not in result_ids:
+            raise HTTPException(status_code=400, detail=f"Resultado {resultado_id} não pertence ao projeto.")
+        if not 0 <= peso_valor < float("inf"):
+            raise HTTPException(status_code=400, detail=f"Peso do resultado {resultado_id} deve ser um número não negativo.")
+        pesos[resultado_id] = peso_valor
+    return pesos
+
+
+@app.get("/api/projects/{project_id}/report", summary="Gera o resumo RoB 2 (semáforo e gráfico de barras) do projeto")
+def export_project_report(
+    project_id: int,
+    format: str = "pdf",
+    page: int = 1,
+    weights: Optional[str] = Query(
+        None, description="Pesos por resultado no gráfico de barras, como 'resultado_id:peso,...'; os omitidos valem 1."
+    ),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    projeto = db.get(models.Project, project_id)
+    if not projeto:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    auth.check_project_role(db, current_user, project_id, [models.RoleType.LEITOR.value, models.RoleType.EDITOR.value, models.RoleType.ADMIN.value])
+
+    rows = matrix.load_project_judgements(db, project_id)
+    pesos = _parse_result_weights(weights, {row["resultado_id"] for row in rows})
+    filename = f"resumo_projeto_{project_id}"
+    if format.lower() == "pdf":
+        with metrics.timer("rob2_export_duration_seconds", escopo="resumo", formato="pdf"):
+            pdf_bytes = docx_generator.generate_project_pdf_report(projeto.nome, rows, weights=pesos)
+        headers = {"Content-Disposition": f"attachment; filename={filename}.pdf"}
+        return StreamingResponse(iter([pdf_bytes]), media_type="application/pdf", headers=headers)
+    elif format.lower() == "docx":
+        with metrics.timer("rob2_export_duration_seconds", escopo="resumo", formato="docx"):
+            docx_bytes = docx_generator.generate_project_docx_report(projeto.nome, rows, weights=pesos)
+        headers = {"Content-Disposition": f"attachment; filename={filename}.docx"}
+        return StreamingResponse(
+            iter([docx_bytes]),
+            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            headers=headers,
+        )
+    elif format.lower() == "png":
+        total_pages = docx_generator.project_png_page_count(rows)
+        if page < 1 or page > total_pages:
+            raise HTTPException(status_code=400, detail=f"Página inválida. Use um valor entre 1 e {total_pages}.")
+        with metrics.timer("rob2_export_duration_seconds", escopo="resumo", formato="png"):
+            png_bytes = docx_generator.generate_project_png_report(projeto.nome, rows, page=page, weights=pesos)
+        headers = {
+            "Content-Disposition": f"inline; filename={filename}_p{page}.png",
+            "X-RoB2-Pages": str(total_pages),
+        }
+        return StreamingResponse(iter([png_bytes]), media_type="image/png", headers=headers)
+    else:
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use 'pdf', 'docx' ou 'png'.")
 
 
 # Rotas para gerenciar artigos armazenados na base relacional
@@ -367,4 +1110,10 @@ def delete_article(
 
 @app.get("/health", summary="Health check")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/metrics", summary="Métricas no formato texto do Prometheus", include_in_schema=False)
+def get_metrics():
+    metrics.record_pool_stats(database.engine)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
\ No newline at end of file
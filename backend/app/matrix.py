@@ -0,0 +1,148 @@
+"""Matriz de julgamentos RoB 2 de um projeto em formato colunar.
+
+Todos os resultados de um projeto são carregados com uma única consulta Core
+sobre estudos/resultados/avaliações/domínios e reduzidos a códigos inteiros
+pequenos (0 = sem informação, 1 = baixo, 2 = algumas preocupações, 3 = alto).
+A matriz é guardada em arrays paralelos (``array``/``bytearray``), o que a
+torna barata de serializar em JSON ou como typed arrays binários.
+"""
+
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, select
+
+from . import models
+
+PROJECT_DOMAINS = (1, 2, 3, 4, 5)
+MATRIX_COLUMNS = tuple(f"D{tipo}" for tipo in PROJECT_DOMAINS) + ("Global",)
+
+NO_INFO_CODE = 0
+CODE_LABELS = ("Sem informação", "Baixo", "Algumas preocupações", "Alto")
+_CODE_PREFIXES = ("baixo", "algumas", "alto")
+
+# Cabeçalho do formato binário: magic, versão, nº de colunas, reservado, nº de linhas
+BINARY_MAGIC = b"RB2M"
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<4sBBHI")
+
+
+def judgement_code(julgamento: Optional[str]) -> int:
+    """Map a stored judgement to its small integer code."""
+    normalized = (julgamento or "").strip().lower()
+    for code, prefix in enumerate(_CODE_PREFIXES, start=1):
+        if normalized.startswith(prefix):
+            return code
+    return NO_INFO_CODE
+
+
+def load_project_matrix(db, project_id: int) -> Dict[str, Any]:
+    """Carrega a matriz resultado × domínio do projeto.
+
+    Devolve arrays paralelos, uma posição por resultado (ordenados por
+    referência do estudo): ``resultado_ids`` e ``estudo_ids`` (``array('i')``),
+    ``desfechos``, ``referencias`` (por estudo) e ``codes``, um ``bytearray``
+    por coluna de `MATRIX_COLUMNS`. Resultados sem avaliação ficam com todos
+    os códigos em "sem informação".
+    """
+    stmt = (
+        select(
+            models.Study.id,
+            models.Study.referencia,
+            models.Result.id,
+            models.Result.desfecho,
+            models.Evaluation.julgamento_global,
+            models.Domain.tipo,
+            models.Domain.julgamento,
+        )
+        .select_from(models.Study)
+        .join(models.Result, models.Result.estudo_id == models.Study.id)
+        .outerjoin(
+            models.Evaluation,
+            and_(models.Evaluation.resultado_id == models.Result.id, models.Evaluation.revisor_id.is_(None)),
+        )
+        .outerjoin(models.Domain, models.Domain.avaliacao_id == models.Evaluation.id)
+        .where(models.Study.projeto_id == project_id)
+        .order_by(models.Study.referencia, models.Study.id, models.Result.id, models.Domain.tipo)
+    )
+
+    resultado_ids = array("i")
+    estudo_ids = array("i")
+    desfechos: List[str] = []
+    referencias: Dict[int, str] = {}
+    codes = [bytearray() for _ in MATRIX_COLUMNS]
+    global_codes = codes[-1]
+    domain_columns = {tipo: codes[idx] for idx, tipo in enumerate(PROJECT_DOMAINS)}
+
+    last_id = None
+    for estudo_id, referencia, resultado_id, desfecho, julgamento_global, tipo, julgamento in db.execute(stmt):
+        if resultado_id != last_id:
+            last_id = resultado_id
+            resultado_ids.append(resultado_id)
+            estudo_ids.append(estudo_id)
+            desfechos.append(desfecho)
+            referencias[estudo_id] = referencia
+            for column in codes:
+                column.append(NO_INFO_CODE)
+            global_codes[-1] = judgement_code(julgamento_global)
+        column = domain_columns.get(tipo)
+        if column is not None:
+            column[-1] = judgement_code(julgamento)
+
+    return {
+        "resultado_ids": resultado_ids,
+        "estudo_ids": estudo_ids,
+        "desfechos": desfechos,
+        "referencias": referencias,
+        "codes": codes,
+    }
+
+
+def load_project_judgements(db, project_id: int) -> List[Dict[str, Any]]:
+    """Visão por linha da matriz, usada pelos relatórios de projeto."""
+    matrix = load_project_matrix(db, project_id)
+    rows = []
+    for idx, resultado_id in enumerate(matrix["resultado_ids"]):
+        rows.append(
+            {
+                "resultado_id": resultado_id,
+                "referencia": matrix["referencias"][matrix["estudo_ids"][idx]],
+                "desfecho": matrix["desfechos"][idx],
+                "codes": [column[idx] for column in matrix["codes"]],
+            }
+        )
+    return rows
+
+
+def matrix_to_json(project_id: int, matrix: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "projeto_id": project_id,
+        "linhas": len(matrix["resultado_ids"]),
+        "colunas": list(MATRIX_COLUMNS),
+        "codigos": list(CODE_LABELS),
+        "resultado_ids": matrix["resultado_ids"].tolist(),
+        "estudo_ids": matrix["estudo_ids"].tolist(),
+        "desfechos": matrix["desfechos"],
+        "estudos": {str(estudo_id): referencia for estudo_id, referencia in matrix["referencias"].items()},
+        "julgamentos": [list(column) for column in matrix["codes"]],
+    }
+
+
+def matrix_to_binary(matrix: Dict[str, Any]) -> bytes:
+    """Serializa ids e códigos como typed arrays little-endian.
+
+    Layout: cabeçalho de 12 bytes (``RB2M``, versão u8, colunas u8, reservado
+    u16, linhas u32), ``Int32Array`` de resultado_ids, ``Int32Array`` de
+    estudo_ids e um ``Uint8Array`` por coluna (na ordem de `MATRIX_COLUMNS`).
+    Os offsets dos ``Int32Array`` ficam alinhados a 4 bytes.
+    """
+    resultado_ids = matrix["resultado_ids"]
+    estudo_ids = matrix["estudo_ids"]
+    if sys.byteorder != "little":
+        resultado_ids, estudo_ids = array("i", resultado_ids), array("i", estudo_ids)
+        resultado_ids.byteswap()
+        estudo_ids.byteswap()
+    header = _BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(MATRIX_COLUMNS), 0, len(resultado_ids))
+    return b"".join([header, resultado_ids.tobytes(), estudo_ids.tobytes(), *map(bytes, matrix["codes"])])
@@ -0,0 +1,183 @@
+"""Métricas da API no formato texto do Prometheus.
+
+Registro em memória, por processo, de contadores, medidores e histogramas
+com rótulos. `MetricsMiddleware` mede cada requisição HTTP (latência por
+rota, status e requisições em andamento); os módulos de domínio somam seus
+próprios contadores (avaliações do motor de regras, duração das
+exportações, linhas importadas). `render` produz o texto servido em
+``/metrics``, incluindo o estado do pool de conexões do banco.
+
+Os rótulos de rota usam o modelo do caminho (``/api/results/{result_id}``),
+não o caminho concreto, para manter a cardinalidade limitada.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = tuple(
+    float(value)
+    for value in os.getenv("METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10").split(",")
+    if value.strip()
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED_ROUTE = "<sem rota>"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_LOCK = threading.Lock()
+# nome -> (tipo, descrição)
+_METADATA: Dict[str, Tuple[str, str]] = {}
+_VALUES: Dict[str, Dict[Labels, float]] = {}
+# nome -> rótulos -> [contagens por bucket..., soma, total]
+_HISTOGRAMS: Dict[str, Dict[Labels, List[float]]] = {}
+
+
+def describe(name: str, kind: str, help_text: str) -> None:
+    _METADATA[name] = (kind, help_text)
+
+
+describe("rob2_http_requests_total", "counter", "Requisições HTTP por método, rota e status.")
+describe("rob2_http_request_duration_seconds", "histogram", "Latência das requisições HTTP por método e rota.")
+describe("rob2_http_requests_in_progress", "gauge", "Requisições HTTP em andamento.")
+describe("rob2_rule_evaluations_total", "counter", "Domínios avaliados pelo motor de regras.")
+describe("rob2_global_evaluations_total", "counter", "Julgamentos globais calculados pelo motor de regras.")
+describe("rob2_export_duration_seconds", "histogram", "Duração das exportações por formato.")
+describe("rob2_import_rows_total", "counter", "Linhas importadas por status.")
+describe("rob2_db_pool_connections", "gauge", "Conexões do pool do banco por estado.")
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    key = _labels(labels)
+    with _LOCK:
+        series = _VALUES.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    with _LOCK:
+        _VALUES.setdefault(name, {})[_labels(labels)] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    key = _labels(labels)
+    with _LOCK:
+        series = _HISTOGRAMS.setdefault(name, {})
+        buckets = series.get(key)
+        if buckets is None:
+            buckets = series[key] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                buckets[idx] += 1
+        buckets[-2] += value
+        buckets[-1] += 1
+
+
+@contextmanager
+def timer(name: str, **labels) -> Iterator[None]:
+    """Observa no histograma ``name`` a duração do bloco."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed_iter(chunks, name: str, **labels):
+    """Repassa os blocos de uma resposta em streaming, medindo até o último."""
+    with timer(name, **labels):
+        yield from chunks
+
+
+def reset() -> None:
+    with _LOCK:
+        _VALUES.clear()
+        _HISTOGRAMS.clear()
+
+
+def record_pool_stats(engine) -> None:
+    """Copia para os medidores o estado do pool (QueuePool; outros pools são ignorados)."""
+    pool = engine.pool
+    if not all(hasattr(pool, attr) for attr in ("size", "checkedin", "checkedout", "overflow")):
+        return
+    set_gauge("rob2_db_pool_connections", pool.size(), estado="tamanho")
+    set_gauge("rob2_db_pool_connections", pool.checkedin(), estado="livres")
+    set_gauge("rob2_db_pool_connections", pool.checkedout(), estado="em_uso")
+    set_gauge("rob2_db_pool_connections", pool.overflow(), estado="excedente")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = labels + ((extra,) if extra else ())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    """Todas as métricas no formato de exposição texto do Prometheus."""
+    lines: List[str] = []
+    with _LOCK:
+        for name in sorted(set(_VALUES) | set(_HISTOGRAMS)):
+            kind, help_text = _METADATA.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(_VALUES.get(name, {}).items()):
+                lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+            for labels, buckets in sorted(_HISTOGRAMS.get(name, {}).items()):
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', _number(bound)))} {_number(count)}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {_number(buckets[-1])}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_number(buckets[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_number(buckets[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Mede latência, status e concorrência de cada requisição HTTP.
+
+    A latência vai até o envio do último bloco do corpo, de modo que
+    respostas em streaming (exportações, importações em NDJSON) contam o
+    tempo todo de geração.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+        inc("rob2_http_requests_in_progress", 1)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            inc("rob2_http_requests_in_progress", -1)
+            inc("rob2_http_requests_total", metodo=method, rota=path, status=status)
+            observe("rob2_http_request_duration_seconds", time.perf_counter() - start, metodo=method, rota=path)
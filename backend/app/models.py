@@ -2,6 +2,8 @@
 
 import enum
 from sqlalchemy import (
+    Boolean,
+    CheckConstraint,
     Column,
     Integer,
     String,
@@ -10,10 +12,13 @@ from sqlalchemy import (
     ForeignKey,
     Enum,
     JSON,
+    Index,
+    LargeBinary,
     UniqueConstraint,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 
 Base = declarative_base()
@@ -99,11 +104,30 @@ class Result(Base):
     fontes = Column(JSON)
 
     estudo = relationship("Study", back_populates="resultados")
-    avaliacao = relationship("Evaluation", back_populates="resultado", uselist=False, cascade="all, delete-orphan")
+    # Todas as avaliações do resultado: a de consenso e as independentes de cada revisor
+    avaliacoes = relationship("Evaluation", back_populates="resultado", cascade="all, delete-orphan", passive_deletes=True)
+    # Só leitura: a avaliação de consenso (revisor_id NULL). Grava-se pelo lado Evaluation.resultado,
+    # de modo que anexar uma avaliação de revisor nunca substitui (e remove) a de consenso.
+    avaliacao = relationship(
+        "Evaluation",
+        primaryjoin="and_(Result.id == Evaluation.resultado_id, Evaluation.revisor_id.is_(None))",
+        uselist=False,
+        viewonly=True,
+    )
 
 
 class Evaluation(Base):
     __tablename__ = "avaliacoes"
+    __table_args__ = (
+        UniqueConstraint("resultado_id", "revisor_id", name="uq_avaliacoes_resultado_revisor"),
+        Index(
+            "uq_avaliacoes_resultado_consenso",
+            "resultado_id",
+            unique=True,
+            postgresql_where=text("revisor_id IS NULL"),
+            sqlite_where=text("revisor_id IS NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     resultado_id = Column(Integer, ForeignKey("resultados.id", ondelete="CASCADE"), nullable=False)
@@ -113,20 +137,33 @@ class Evaluation(Base):
     justificativa_global = Column(Text)
     criado_por_id = Column(Integer, ForeignKey("usuarios.id"))
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    # Incrementada a cada gravação; exposta como ETag
+    versao = Column(Integer, nullable=False, default=1, server_default="1")
+    # NULL na avaliação de consenso; preenchido nas avaliações independentes de cada revisor
+    revisor_id = Column(Integer, ForeignKey("usuarios.id"))
 
-    resultado = relationship("Result", back_populates="avaliacao")
+    resultado = relationship("Result", back_populates="avaliacoes")
     dominios = relationship("Domain", back_populates="avaliacao", cascade="all, delete-orphan")
     auditorias = relationship("Audit", back_populates="avaliacao")
-    criado_por = relationship("User")
+    criado_por = relationship("User", foreign_keys=[criado_por_id])
+    revisor = relationship("User", foreign_keys=[revisor_id])
 
 
 class Domain(Base):
     __tablename__ = "dominios"
+    __table_args__ = (
+        Index(
+            "idx_dominios_respostas_gin",
+            "respostas",
+            postgresql_using="gin",
+            postgresql_ops={"respostas": "jsonb_path_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     avaliacao_id = Column(Integer, ForeignKey("avaliacoes.id", ondelete="CASCADE"), nullable=False)
     tipo = Column(Integer, nullable=False)
-    respostas = Column(JSON, nullable=False)
+    respostas = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
     comentarios = Column(Text)
     observacoes_itens = Column(JSON)
     julgamento = Column(String(50))
@@ -161,12 +198,61 @@ class Article(Base):
 
 class Audit(Base):
     __tablename__ = "auditorias"
+    __table_args__ = (
+        CheckConstraint("avaliacao_id IS NOT NULL OR projeto_id IS NOT NULL", name="ck_auditorias_alvo"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    avaliacao_id = Column(Integer, ForeignKey("avaliacoes.id", ondelete="CASCADE"), nullable=False)
+    # Eventos sobre uma avaliação têm avaliacao_id; eventos sobre o projeto inteiro
+    # (exportações completas) são uma única linha com projeto_id
+    avaliacao_id = Column(Integer, ForeignKey("avaliacoes.id", ondelete="CASCADE"))
+    projeto_id = Column(Integer, ForeignKey("projetos.id", ondelete="CASCADE"), index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     acao = Column(String(255), nullable=False)
     data_hora = Column(DateTime(timezone=True), server_default=func.now())
 
     avaliacao = relationship("Evaluation", back_populates="auditorias")
     usuario = relationship("User", back_populates="auditorias")
+
+
+class EvaluationRevision(Base):
+    """Revisão de uma avaliação: delta em relação à anterior ou checkpoint completo (JSON + zlib)."""
+
+    __tablename__ = "revisoes_avaliacao"
+    __table_args__ = (UniqueConstraint("avaliacao_id", "numero", name="uq_revisoes_avaliacao_numero"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    avaliacao_id = Column(Integer, ForeignKey("avaliacoes.id", ondelete="CASCADE"), nullable=False)
+    numero = Column(Integer, nullable=False)
+    checkpoint = Column(Boolean, nullable=False, default=False)
+    dados = Column(LargeBinary, nullable=False)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"))
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ProjectSummary(Base):
+    """Contagens de julgamentos por domínio e global, mantidas a cada gravação."""
+
+    __tablename__ = "resumos_projeto"
+
+    projeto_id = Column(Integer, ForeignKey("projetos.id", ondelete="CASCADE"), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    d1_baixo = Column(Integer, nullable=False, default=0)
+    d1_algumas = Column(Integer, nullable=False, default=0)
+    d1_alto = Column(Integer, nullable=False, default=0)
+    d2_baixo = Column(Integer, nullable=False, default=0)
+    d2_algumas = Column(Integer, nullable=False, default=0)
+    d2_alto = Column(Integer, nullable=False, default=0)
+    d3_baixo = Column(Integer, nullable=False, default=0)
+    d3_algumas = Column(Integer, nullable=False, default=0)
+    d3_alto = Column(Integer, nullable=False, default=0)
+    d4_baixo = Column(Integer, nullable=False, default=0)
+    d4_algumas = Column(Integer, nullable=False, default=0)
+    d4_alto = Column(Integer, nullable=False, default=0)
+    d5_baixo = Column(Integer, nullable=False, default=0)
+    d5_algumas = Column(Integer, nullable=False, default=0)
+    d5_alto = Column(Integer, nullable=False, default=0)
+    global_baixo = Column(Integer, nullable=False, default=0)
+    global_algumas = Column(Integer, nullable=False, default=0)
+    global_alto = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
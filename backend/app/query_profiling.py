@@ -0,0 +1,128 @@
+"""Contagem e tempo das consultas SQL por requisição.
+
+Ouvintes de eventos do SQLAlchemy registrados em `Engine` (valem para
+qualquer motor, inclusive os de teste) somam a quantidade de consultas e o
+tempo acumulado no banco na `QueryStats` da requisição corrente, guardada
+em uma ``ContextVar``. As rotas síncronas do FastAPI rodam em threads com
+cópia do contexto, então enxergam o mesmo objeto.
+
+`QueryProfilingMiddleware` abre as estatísticas de cada requisição e
+acrescenta à resposta os cabeçalhos ``X-DB-Queries`` e ``Server-Timing``
+(``db;dur=...``). Em respostas em streaming os cabeçalhos saem antes do
+corpo e contam só as consultas feitas até ali.
+
+Consultas mais lentas que ``SLOW_QUERY_MS`` são registradas em log com os
+parâmetros; a mesma instrução repetida ``N_PLUS_ONE_THRESHOLD`` vezes ou
+mais em uma requisição gera um aviso de possível N+1.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+_MAX_LOGGED_PARAMS = 500
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def repeated(self, threshold: Optional[int] = None):
+        """Instruções executadas ``threshold`` (padrão: N_PLUS_ONE_THRESHOLD) vezes ou mais."""
+        threshold = N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+        return [(statement, total) for statement, total in self.statements.most_common() if total >= threshold]
+
+
+_CURRENT: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _CURRENT.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[statement] += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "Consulta lenta (%.1f ms): %s | parâmetros: %s",
+            elapsed * 1000,
+            statement,
+            repr(parameters)[:_MAX_LOGGED_PARAMS],
+        )
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Conta as consultas feitas no bloco (no contexto corrente)."""
+    stats = QueryStats()
+    token = _CURRENT.set(stats)
+    try:
+        yield stats
+    finally:
+        _CURRENT.reset(token)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _CURRENT.get()
+
+
+def server_timing(stats: QueryStats) -> str:
+    return f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} consultas"'
+
+
+class QueryProfilingMiddleware:
+    """Abre as estatísticas de consultas da requisição e as publica nos cabeçalhos."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.count).encode("latin-1")))
+                headers.append((b"server-timing", server_timing(stats).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with count_queries() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                for statement, total in stats.repeated():
+                    logger.warning(
+                        "Possível N+1 em %s %s: instrução executada %d vezes: %s",
+                        scope["method"],
+                        scope["path"],
+                        total,
+                        statement,
+                    )
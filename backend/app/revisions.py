@@ -0,0 +1,359 @@
+"""Histórico compacto das avaliações.
+
+Cada gravação de uma avaliação gera uma revisão em ``revisoes_avaliacao``
+contendo apenas o que mudou em relação à revisão anterior: campos da
+avaliação e, por domínio, as respostas/observações alteradas ou removidas.
+A cada ``REVISION_CHECKPOINT_INTERVAL`` revisões (e na primeira) o estado
+completo é gravado como checkpoint, de modo que reconstruir qualquer versão
+exige no máximo um checkpoint e os deltas seguintes, lidos em uma consulta.
+Os dados ficam em JSON compactado com zlib. Gravações sem nenhuma mudança
+não geram revisão.
+
+Estado de uma avaliação::
+
+    {"avaliacao": {"pre_consideracoes", "julgamento_global", "direcao_global"},
+     "dominios": {"1": {"respostas", "comentarios", "observacoes_itens",
+                        "julgamento", "direcao"}}}
+"""
+
+import copy
+import enum
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+from . import models
+
+REVISION_CHECKPOINT_INTERVAL = int(os.getenv("REVISION_CHECKPOINT_INTERVAL", "20"))
+
+EVALUATION_FIELDS = ("pre_consideracoes", "julgamento_global", "direcao_global")
+DOMAIN_FIELDS = ("respostas", "comentarios", "observacoes_itens", "julgamento", "direcao")
+# Campos dicionário: o delta guarda apenas as chaves alteradas/removidas
+_MAP_FIELDS = ("respostas", "observacoes_itens")
+
+State = Dict[str, Dict[str, Any]]
+EMPTY_STATE: State = {"avaliacao": {}, "dominios": {}}
+
+
+def _plain(value: Any) -> Any:
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def state_from_values(evaluation_values: Dict[str, Any], domain_values: Iterable[Dict[str, Any]]) -> State:
+    """Estado a partir dos valores de colunas usados nas gravações."""
+    return {
+        "avaliacao": {field: _plain(evaluation_values.get(field)) for field in EVALUATION_FIELDS},
+        "dominios": {
+            str(values["tipo"]): {
+                field: (values.get(field) or {}) if field in _MAP_FIELDS else _plain(values.get(field))
+                for field in DOMAIN_FIELDS
+            }
+            for values in domain_values
+        },
+    }
+
+
+def evaluation_state(
+    avaliacao: Optional[models.Evaluation], dominios: Optional[Iterable[models.Domain]] = None
+) -> State:
+    """Estado de uma avaliação carregada pelo ORM.
+
+    ``dominios`` substitui ``avaliacao.dominios`` quando os domínios novos
+    foram adicionados à sessão sem passar pelo relacionamento.
+    """
+    if avaliacao is None:
+        return EMPTY_STATE
+    return state_from_values(
+        {field: getattr(avaliacao, field) for field in EVALUATION_FIELDS},
+        (
+            {"tipo": dom.tipo, **{field: getattr(dom, field) for field in DOMAIN_FIELDS}}
+            for dom in (avaliacao.dominios if dominios is None else dominios)
+        ),
+    )
+
+
+# --- Deltas -----------------------------------------------------------------
+
+
+def _empty_domain() -> Dict[str, Any]:
+    return {field: {} if field in _MAP_FIELDS else None for field in DOMAIN_FIELDS}
+
+
+def state_delta(old: State, new: State) -> Dict[str, Any]:
+    """Diferença mínima que transforma ``old`` em ``new`` (vazia se iguais)."""
+    delta: Dict[str, Any] = {}
+    changed = {field: value for field, value in new["avaliacao"].items() if old["avaliacao"].get(field) != value}
+    if changed:
+        delta["avaliacao"] = changed
+
+    dominios: Dict[str, Any] = {}
+    for tipo in old["dominios"].keys() - new["dominios"].keys():
+        dominios[tipo] = None
+    for tipo, domain in new["dominios"].items():
+        previous = old["dominios"].get(tipo)
+        domain_delta = _domain_delta(previous or _empty_domain(), domain)
+        if previous is None:
+            domain_delta["novo"] = True
+        if domain_delta:
+            dominios[tipo] = domain_delta
+    if dominios:
+        delta["dominios"] = dominios
+    return delta
+
+
+def _domain_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    delta: Dict[str, Any] = {}
+    for field in DOMAIN_FIELDS:
+        if field in _MAP_FIELDS:
+            before, after = old.get(field) or {}, new.get(field) or {}
+            alterados = {key: value for key, value in after.items() if key not in before or before[key] != value}
+            removidos = [key for key in before if key not in after]
+            if alterados or removidos:
+                delta[field] = {"alterados": alterados, "removidos": removidos}
+        elif old.get(field) != new.get(field):
+            delta[field] = new.get(field)
+    return delta
+
+
+def apply_delta(state: State, delta: Dict[str, Any]) -> State:
+    """Aplica um delta sobre uma cópia do estado."""
+    state = copy.deepcopy(state)
+    state["avaliacao"].update(delta.get("avaliacao", {}))
+    for tipo, domain_delta in delta.get("dominios", {}).items():
+        if domain_delta is None:
+            state["dominios"].pop(tipo, None)
+            continue
+        if domain_delta.get("novo") or tipo not in state["dominios"]:
+            state["dominios"][tipo] = _empty_domain()
+        domain = state["dominios"][tipo]
+        for field, value in domain_delta.items():
+            if field == "novo":
+                continue
+            if field in _MAP_FIELDS:
+                domain[field].update(value["alterados"])
+                for key in value["removidos"]:
+                    domain[field].pop(key, None)
+            else:
+                domain[field] = value
+    return state
+
+
+def _encode(payload: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+# --- Gravação ---------------------------------------------------------------
+
+
+def _is_checkpoint(numero: int) -> bool:
+    return (numero - 1) % REVISION_CHECKPOINT_INTERVAL == 0
+
+
+def record_revision(db, avaliacao_id: int, usuario_id: Optional[int], old: State, new: State) -> Optional[int]:
+    """Grava a revisão seguinte da avaliação; devolve seu número.
+
+    ``old`` deve ser o estado gravado antes da alteração (o da última
+    revisão). Sem mudanças, nada é gravado e devolve ``None``.
+    """
+    delta = state_delta(old, new)
+    if not delta:
+        return None
+    table = models.EvaluationRevision.__table__
+    numero = latest_revision(db, avaliacao_id) + 1
+    checkpoint = _is_checkpoint(numero)
+    db.execute(
+        insert(table).values(
+            avaliacao_id=avaliacao_id,
+            numero=numero,
+            checkpoint=checkpoint,
+            dados=_encode(new if checkpoint else delta),
+            usuario_id=usuario_id,
+        )
+    )
+    return numero
+
+
+def record_revisions(db, usuario_id: Optional[int], changes: Dict[int, Tuple[State, State]]) -> None:
+    """`record_revision` para várias avaliações, com uma consulta e um INSERT
+    de várias linhas. ``changes`` mapeia avaliação -> (estado anterior, novo)."""
+    last = _latest_revisions(db, list(changes))
+    rows = []
+    for avaliacao_id, (old, new) in changes.items():
+        delta = state_delta(old, new)
+        if not delta:
+            continue
+        numero = last.get(avaliacao_id, 0) + 1
+        checkpoint = _is_checkpoint(numero)
+        rows.append(
+            {
+                "avaliacao_id": avaliacao_id,
+                "numero": numero,
+                "checkpoint": checkpoint,
+                "dados": _encode(new if checkpoint else delta),
+                "usuario_id": usuario_id,
+            }
+        )
+    if rows:
+        db.execute(insert(models.EvaluationRevision.__table__), rows)
+
+
+def _latest_revisions(db, avaliacao_ids: List[int]) -> Dict[int, int]:
+    if not avaliacao_ids:
+        return {}
+    table = models.EvaluationRevision.__table__
+    return dict(
+        db.execute(
+            select(table.c.avaliacao_id, func.max(table.c.numero))
+            .where(table.c.avaliacao_id.in_(avaliacao_ids))
+            .group_by(table.c.avaliacao_id)
+        ).all()
+    )
+
+
+def record_checkpoints(db, usuario_id: Optional[int], states: Dict[int, State]) -> None:
+    """Grava um checkpoint por avaliação (importações em lote, que substituem
+    a avaliação inteira), com uma consulta e um INSERT de várias linhas."""
+    if not states:
+        return
+    table = models.EvaluationRevision.__table__
+    last = _latest_revisions(db, list(states))
+    db.execute(
+        insert(table),
+        [
+            {
+                "avaliacao_id": avaliacao_id,
+                "numero": last.get(avaliacao_id, 0) + 1,
+                "checkpoint": True,
+                "dados": _encode(state),
+                "usuario_id": usuario_id,
+            }
+            for avaliacao_id, state in states.items()
+        ],
+    )
+
+
+# --- Leitura ----------------------------------------------------------------
+
+
+def load_states(db, avaliacao_ids: List[int]) -> Dict[int, State]:
+    """Estados atuais de várias avaliações com uma consulta (sem o ORM)."""
+    if not avaliacao_ids:
+        return {}
+    stmt = (
+        select(
+            models.Evaluation.id,
+            *(getattr(models.Evaluation, field) for field in EVALUATION_FIELDS),
+            models.Domain.tipo,
+            *(getattr(models.Domain, field) for field in DOMAIN_FIELDS),
+        )
+        .outerjoin(models.Domain, models.Domain.avaliacao_id == models.Evaluation.id)
+        .where(models.Evaluation.id.in_(avaliacao_ids))
+    )
+    evaluations: Dict[int, Dict[str, Any]] = {}
+    domains: Dict[int, List[Dict[str, Any]]] = {avaliacao_id: [] for avaliacao_id in avaliacao_ids}
+    size = len(EVALUATION_FIELDS)
+    for row in db.execute(stmt):
+        avaliacao_id = row[0]
+        evaluations[avaliacao_id] = dict(zip(EVALUATION_FIELDS, row[1:1 + size]))
+        tipo = row[1 + size]
+        if tipo is not None:
+            domains[avaliacao_id].append({"tipo": tipo, **dict(zip(DOMAIN_FIELDS, row[2 + size:]))})
+    return {avaliacao_id: state_from_values(values, domains[avaliacao_id]) for avaliacao_id, values in evaluations.items()}
+
+
+def list_revisions(db, avaliacao_id: int) -> List[Dict[str, Any]]:
+    table = models.EvaluationRevision.__table__
+    rows = db.execute(
+        select(table.c.numero, table.c.checkpoint, table.c.usuario_id, table.c.criado_em, func.length(table.c.dados))
+        .where(table.c.avaliacao_id == avaliacao_id)
+        .order_by(table.c.numero)
+    )
+    return [
+        {"numero": numero, "checkpoint": checkpoint, "usuario_id": usuario_id, "criado_em": criado_em, "bytes": tamanho}
+        for numero, checkpoint, usuario_id, criado_em, tamanho in rows
+    ]
+
+
+def reconstruct(db, avaliacao_id: int, *numeros: int) -> Dict[int, State]:
+    """Reconstrói os estados das revisões pedidas.
+
+    Lê, em uma consulta, o último checkpoint anterior à menor revisão pedida
+    e todas as revisões até a maior, aplicando os deltas em sequência.
+    Revisões inexistentes ficam fora do resultado.
+    """
+    if not numeros:
+        return {}
+    table = models.EvaluationRevision.__table__
+    start = (
+        select(func.max(table.c.numero))
+        .where(table.c.avaliacao_id == avaliacao_id, table.c.checkpoint.is_(True), table.c.numero <= min(numeros))
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(table.c.numero, table.c.checkpoint, table.c.dados)
+        .where(table.c.avaliacao_id == avaliacao_id, table.c.numero >= start, table.c.numero <= max(numeros))
+        .order_by(table.c.numero)
+    )
+    wanted = set(numeros)
+    states: Dict[int, State] = {}
+    state = EMPTY_STATE
+    for numero, checkpoint, dados in rows:
+        payload = _decode(dados)
+        state = payload if checkpoint else apply_delta(state, payload)
+        if numero in wanted:
+            states[numero] = state
+    return states
+
+
+def diff_states(old: State, new: State) -> Dict[str, Any]:
+    """Diferença legível entre dois estados: ``{campo: {"de", "para"}}``."""
+    diff: Dict[str, Any] = {}
+    avaliacao = {
+        field: {"de": old["avaliacao"].get(field), "para": new["avaliacao"].get(field)}
+        for field in EVALUATION_FIELDS
+        if old["avaliacao"].get(field) != new["avaliacao"].get(field)
+    }
+    if avaliacao:
+        diff["avaliacao"] = avaliacao
+
+    dominios: Dict[str, Any] = {}
+    for tipo in sorted(old["dominios"].keys() | new["dominios"].keys(), key=int):
+        before, after = old["dominios"].get(tipo), new["dominios"].get(tipo)
+        changes = _domain_diff(before or _empty_domain(), after or _empty_domain())
+        if before is None:
+            changes["status"] = "adicionado"
+        elif after is None:
+            changes["status"] = "removido"
+        if changes:
+            dominios[tipo] = changes
+    if dominios:
+        diff["dominios"] = dominios
+    return diff
+
+
+def _domain_diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    changes: Dict[str, Any] = {}
+    for field in DOMAIN_FIELDS:
+        if field in _MAP_FIELDS:
+            before, after = old.get(field) or {}, new.get(field) or {}
+            keys = sorted(before.keys() | after.keys())
+            field_changes = {key: {"de": before.get(key), "para": after.get(key)} for key in keys if before.get(key) != after.get(key)}
+            if field_changes:
+                changes[field] = field_changes
+        elif old.get(field) != new.get(field):
+            changes[field] = {"de": old.get(field), "para": new.get(field)}
+    return changes
+
+
+def latest_revision(db, avaliacao_id: int) -> int:
+    table = models.EvaluationRevision.__table__
+    return db.execute(
+        select(func.coalesce(func.max(table.c.numero), 0)).where(table.c.avaliacao_id == avaliacao_id)
+    ).scalar_one()
@@ -2,7 +2,9 @@
 
 import json
 from pathlib import Path
-from typing import Dict, Tuple, List
+from typing import Dict, Iterable, Optional, Tuple, List
+
+from . import answer_validation, metrics, tracing
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
 REGRAS_PATH = ROOT_DIR / "domain" / "regras.json"
@@ -68,10 +70,26 @@ def _rule_matches(rule: Dict[str, Dict[str, List[str]]], respostas: Dict[str, st
     return True
 
 
-def evaluate_domain(domain_type: int, respostas: Dict[str, str]) -> Tuple[str, str]:
-    """Return the judgement and rationale for a specific domain."""
-    regras = _load_rules()
-    domain_rules = regras.get(domain_type, [])
+@tracing.traced("regras")
+def evaluate_domain(
+    domain_type: int, respostas: Dict[str, str], rules: Optional[Dict[int, List[dict]]] = None
+) -> Tuple[str, str]:
+    """Return the judgement and rationale for a specific domain.
+
+    ``rules`` optionally replaces the rule list of some domains (a "what-if"
+    variant); domains missing from it use the rules from ``regras.json``.
+
+    Dependent questions that do not apply (see `answer_validation`) are
+    read as "NA", so rules that need a real answer to them are skipped.
+    """
+    metrics.inc("rob2_rule_evaluations_total", dominio=domain_type)
+    skipped = answer_validation.not_applicable(domain_type, respostas)
+    if skipped:
+        respostas = {**respostas, **dict.fromkeys(skipped, answer_validation.NOT_APPLICABLE)}
+    if rules and domain_type in rules:
+        domain_rules = rules[domain_type]
+    else:
+        domain_rules = _load_rules().get(domain_type, [])
     default_rule = None
 
     for rule in domain_rules:
@@ -88,13 +106,35 @@ def evaluate_domain(domain_type: int, respostas: Dict[str, str]) -> Tuple[str, s
     return "Algumas preocupações", "Nenhuma regra foi aplicada para este domínio."
 
 
-def evaluate_global(julgamentos: List[str]) -> str:
-    """Determine the overall judgement from domain level results."""
+def evaluate_domains(items: Iterable[Tuple[int, Dict[str, str]]]) -> List[Tuple[str, str]]:
+    """Evaluate many (domain type, answers) pairs at once.
+
+    Identical answer sets are evaluated only once, which pays off on bulk
+    imports where most rows share a handful of answer patterns.
+    """
+    seen: Dict[Tuple[int, frozenset], Tuple[str, str]] = {}
+    results = []
+    for domain_type, respostas in items:
+        key = (domain_type, frozenset((respostas or {}).items()))
+        outcome = seen.get(key)
+        if outcome is None:
+            outcome = seen[key] = evaluate_domain(domain_type, respostas or {})
+        results.append(outcome)
+    return results
+
+
+@tracing.traced("regras")
+def evaluate_global(julgamentos: List[str], rules: Optional[dict] = None) -> str:
+    """Determine the overall judgement from domain level results.
+
+    ``rules`` optionally replaces the global rule from ``regra_global.json``.
+    """
+    metrics.inc("rob2_global_evaluations_total")
     filtered = [j for j in julgamentos if j and j.upper() != "NA"]
     if not filtered:
         return "Algumas preocupações"
 
-    rules = _load_global_rules()
+    rules = rules if rules is not None else _load_global_rules()
 
     for cond in rules.get("altoSe", []):
         target = cond.get("qualquerDominio")
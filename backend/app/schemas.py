@@ -4,8 +4,10 @@ Os modelos são alinhados com a especificação OpenAPI declarada em docs/api_sp
 """
 
 from datetime import datetime
-from typing import List, Dict, Optional
-from pydantic import BaseModel, EmailStr, Field
+from typing import Any, List, Dict, Optional
+from pydantic import BaseModel, EmailStr, Field, root_validator
+
+from . import answer_validation
 
 
 class UserBase(BaseModel):
@@ -57,6 +59,33 @@ class Study(StudyBase):
         orm_mode = True
 
 
+# Ingestão em massa (NDJSON): um estudo por linha, com seus resultados
+class ResultIngest(BaseModel):
+    desfecho: str = Field(..., min_length=1, max_length=255)
+    medida_efeito: Optional[str] = Field(None, max_length=255)
+    efeito_interesse: Optional[str] = Field(None, max_length=50)
+    resultado_numerico: Optional[str] = Field(None, max_length=255)
+    fontes: Optional[Dict[str, Any]] = None
+
+
+class StudyIngest(BaseModel):
+    referencia: str = Field(..., min_length=1, max_length=255)
+    desenho: Optional[str] = Field(None, max_length=255)
+    resultados: List[ResultIngest] = Field(default_factory=list)
+
+
+class Result(ResultIngest):
+    id: int
+    estudo_id: int
+
+    class Config:
+        orm_mode = True
+
+
+class StudyWithResults(Study):
+    resultados: List[Result] = Field(default_factory=list)
+
+
 class DomainBase(BaseModel):
     tipo: int
     respostas: Dict[str, str]
@@ -67,7 +96,11 @@ class DomainBase(BaseModel):
 
 
 class DomainCreate(DomainBase):
-    pass
+    @root_validator(skip_on_failure=True)
+    def validar_respostas(cls, values):
+        # Perguntas e códigos conferidos contra domain/perguntas.json
+        values["respostas"] = answer_validation.normalize_answers(values["tipo"], values["respostas"])
+        return values
 
 
 class Domain(DomainBase):
@@ -89,6 +122,27 @@ class EvaluationCreate(EvaluationBase):
     pass
 
 
+class ReviewCreate(BaseModel):
+    pre_consideracoes: Optional[str] = None
+    dominios: List[DomainCreate]
+
+
+class EvaluationBatchItem(BaseModel):
+    # Respostas validadas pela rota, item a item: uma resposta inválida reprova só o seu item
+    resultado_id: int
+    pre_consideracoes: Optional[str] = None
+    dominios: List[DomainBase]
+
+
+class EvaluationBatch(BaseModel):
+    avaliacoes: List[EvaluationBatchItem] = Field(..., min_items=1, max_items=5000)
+
+
+class DomainClone(BaseModel):
+    dominios: List[int] = Field(..., min_items=1)
+    resultados: Optional[List[int]] = None
+
+
 class Evaluation(EvaluationBase):
     id: int
     julgamento_global: Optional[str] = None
@@ -97,6 +151,8 @@ class Evaluation(EvaluationBase):
     dominios: List[Domain]  # override for Domain with id
     criado_por_id: Optional[int] = None
     criado_em: Optional[datetime] = None
+    versao: Optional[int] = None
+    revisor_id: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -149,3 +205,9 @@ class Article(ArticleBase):
 class UserPasswordChange(BaseModel):
     senha_atual: str = Field(..., min_length=6)
     nova_senha: str = Field(..., min_length=6)
+
+
+# Variante de regras para análises "e se" (mesmo formato de regras.json/regra_global.json)
+class RuleVariant(BaseModel):
+    regras: Dict[int, List[dict]] = Field(default_factory=dict)
+    regra_global: Optional[dict] = None
@@ -0,0 +1,144 @@
+"""Resumo de julgamentos RoB 2 por projeto.
+
+Mantém a tabela ``resumos_projeto`` (uma linha por projeto com as contagens
+de Baixo/Algumas preocupações/Alto por domínio e global) atualizada de forma
+incremental: cada gravação de avaliação aplica apenas a diferença entre os
+julgamentos anteriores e os novos. ``versao`` é incrementada a cada mudança e
+serve para invalidar caches derivados do projeto.
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .matrix import PROJECT_DOMAINS, judgement_code
+
+# Julgamentos de uma avaliação: ({tipo do domínio: julgamento}, julgamento global)
+Snapshot = Tuple[Dict[int, Optional[str]], Optional[str]]
+
+_CATEGORY_COLUMNS = {1: "baixo", 2: "algumas", 3: "alto"}
+_CATEGORY_NAMES = {1: "Baixo", 2: "Algumas preocupações", 3: "Alto"}
+_SCOPES = {tipo: f"d{tipo}" for tipo in PROJECT_DOMAINS}
+_GLOBAL_SCOPE = "global"
+EMPTY_SNAPSHOT: Snapshot = ({}, None)
+
+
+def _column(scope: str, code: int) -> str:
+    return f"{scope}_{_CATEGORY_COLUMNS[code]}"
+
+
+def evaluation_snapshot(avaliacao: Optional[models.Evaluation]) -> Snapshot:
+    """Julgamentos atualmente gravados em uma avaliação carregada pelo ORM."""
+    if avaliacao is None:
+        return EMPTY_SNAPSHOT
+    return {dom.tipo: dom.julgamento for dom in avaliacao.dominios}, avaliacao.julgamento_global
+
+
+def snapshot_counts(snapshot: Snapshot) -> Counter:
+    domains, julgamento_global = snapshot
+    counts: Counter = Counter()
+    for tipo, julgamento in domains.items():
+        code = judgement_code(julgamento)
+        if tipo in _SCOPES and code in _CATEGORY_COLUMNS:
+            counts[_column(_SCOPES[tipo], code)] += 1
+    code = judgement_code(julgamento_global)
+    if code in _CATEGORY_COLUMNS:
+        counts[_column(_GLOBAL_SCOPE, code)] += 1
+    return counts
+
+
+def snapshot_delta(changes: Iterable[Tuple[Snapshot, Snapshot]]) -> Dict[str, int]:
+    """Soma as diferenças (novo - anterior) de várias avaliações."""
+    delta: Counter = Counter()
+    for old, new in changes:
+        delta.update(snapshot_counts(new))
+        delta.subtract(snapshot_counts(old))
+    return {column: value for column, value in delta.items() if value}
+
+
+def apply_delta(db, project_id: int, delta: Dict[str, int]) -> None:
+    """Aplica as diferenças com um único UPDATE ``coluna = coluna + n``.
+
+    Deve ser chamada depois que as avaliações foram gravadas (flush) na mesma
+    transação: se o projeto ainda não tem linha de resumo, ela é recalculada a
+    partir do estado atual, que já inclui a mudança. ``versao`` é incrementada
+    mesmo sem diferença nas contagens, pois as respostas podem ter mudado.
+    """
+    table = models.ProjectSummary.__table__
+    values = {column: table.c[column] + value for column, value in delta.items()}
+    values["versao"] = table.c.versao + 1
+    values["atualizado_em"] = func.now()
+    result = db.execute(update(table).where(table.c.projeto_id == project_id).values(**values))
+    if result.rowcount == 0:
+        ensure_summary(db, project_id)
+
+
+def record_change(db, project_id: int, old: Snapshot, new: Snapshot) -> None:
+    apply_delta(db, project_id, snapshot_delta([(old, new)]))
+
+
+def ensure_summary(db, project_id: int) -> models.ProjectSummary:
+    """Devolve a linha de resumo do projeto, recalculando-a se não existir."""
+    summary = db.get(models.ProjectSummary, project_id)
+    if summary is not None:
+        return summary
+    try:
+        with db.begin_nested():
+            summary = models.ProjectSummary(projeto_id=project_id, versao=1, **_count_project(db, project_id))
+            db.add(summary)
+    except IntegrityError:
+        # Outra requisição criou a linha ao mesmo tempo
+        summary = db.get(models.ProjectSummary, project_id, populate_existing=True)
+    return summary
+
+
+def _count_project(db, project_id: int) -> Dict[str, int]:
+    """Recalcula as contagens do projeto com duas consultas agregadas."""
+    scope = (
+        select(models.Evaluation.id)
+        .join(models.Result, models.Result.id == models.Evaluation.resultado_id)
+        .join(models.Study, models.Study.id == models.Result.estudo_id)
+        .where(models.Study.projeto_id == project_id, models.Evaluation.revisor_id.is_(None))
+        .scalar_subquery()
+    )
+    counts: Counter = Counter()
+    domain_stmt = (
+        select(models.Domain.tipo, models.Domain.julgamento, func.count())
+        .where(models.Domain.avaliacao_id.in_(scope))
+        .group_by(models.Domain.tipo, models.Domain.julgamento)
+    )
+    for tipo, julgamento, total in db.execute(domain_stmt):
+        code = judgement_code(julgamento)
+        if tipo in _SCOPES and code in _CATEGORY_COLUMNS:
+            counts[_column(_SCOPES[tipo], code)] += total
+    global_stmt = (
+        select(models.Evaluation.julgamento_global, func.count())
+        .where(models.Evaluation.id.in_(scope))
+        .group_by(models.Evaluation.julgamento_global)
+    )
+    for julgamento, total in db.execute(global_stmt):
+        code = judgement_code(julgamento)
+        if code in _CATEGORY_COLUMNS:
+            counts[_column(_GLOBAL_SCOPE, code)] += total
+    return {
+        _column(scope_name, code): counts[_column(scope_name, code)]
+        for scope_name in list(_SCOPES.values()) + [_GLOBAL_SCOPE]
+        for code in _CATEGORY_COLUMNS
+    }
+
+
+def serialize_summary(summary: models.ProjectSummary) -> Dict[str, Any]:
+    def counts(scope: str) -> Dict[str, int]:
+        return {name: getattr(summary, _column(scope, code)) for code, name in _CATEGORY_NAMES.items()}
+
+    global_counts = counts(_GLOBAL_SCOPE)
+    return {
+        "projeto_id": summary.projeto_id,
+        "versao": summary.versao,
+        "avaliacoes": sum(global_counts.values()),
+        "dominios": {str(tipo): counts(scope) for tipo, scope in _SCOPES.items()},
+        "global": global_counts,
+    }
@@ -0,0 +1,204 @@
+"""Rastreamento por etapas das requisições (spans) para o Server-Timing.
+
+Quando uma exportação ou gravação demora, os spans dizem para onde foi o
+tempo: ``auth`` (`auth.get_current_user`), ``regras`` (motor de regras),
+``renderizacao`` (reportlab, python-docx, Pillow e openpyxl) e
+``serializacao`` (JSON da resposta). O tempo no banco vem de
+`query_profiling` e já sai no cabeçalho como ``db``.
+
+`TracingMiddleware` sorteia as requisições rastreadas com probabilidade
+``TRACE_SAMPLE_RATE`` (padrão 0: desligado). Nas sorteadas, acrescenta um
+``Server-Timing`` com a soma por etapa e, se ``TRACE_FILE`` estiver
+definido, grava uma linha JSON por requisição com cada span. Fora da
+amostra, `span` e `traced` custam uma leitura de ``ContextVar``.
+
+Spans com o mesmo nome aninhados (uma exportação que chama outra) contam só
+o externo. Em respostas em streaming o cabeçalho sai antes do corpo; as
+etapas feitas durante o streaming aparecem apenas no arquivo de trace.
+"""
+
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+from . import query_profiling
+
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE") or None
+# Spans guardados individualmente por requisição (a soma por etapa não tem limite)
+MAX_TRACE_SPANS = 500
+
+_NOOP = nullcontext()
+_FILE_LOCK = threading.Lock()
+
+
+class Trace:
+    __slots__ = ("start", "spans", "totals", "counts", "active")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[tuple] = []  # (nome, início relativo, duração), em segundos
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.active: Dict[str, int] = {}
+
+    def add(self, name: str, start: float, elapsed: float) -> None:
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if len(self.spans) < MAX_TRACE_SPANS:
+            self.spans.append((name, start - self.start, elapsed))
+
+
+_CURRENT: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start", "outer")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        active = self.trace.active
+        self.outer = not active.get(self.name)
+        active[self.name] = active.get(self.name, 0) + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.trace.active[self.name] -= 1
+        if self.outer:
+            self.trace.add(self.name, self.start, elapsed)
+        return False
+
+
+def span(name: str):
+    """Mede o bloco como a etapa ``name`` da requisição rastreada, se houver."""
+    trace = _CURRENT.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name)
+
+
+def traced(name: str) -> Callable:
+    """Decorador: cada chamada da função é um span ``name``."""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                trace = _CURRENT.get()
+                if trace is None:
+                    return await func(*args, **kwargs)
+                with _Span(trace, name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _CURRENT.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with _Span(trace, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+def server_timing(trace: Trace) -> str:
+    entries = [
+        f'{name};dur={seconds * 1000:.1f};desc="{trace.counts[name]} chamadas"'
+        for name, seconds in trace.totals.items()
+    ]
+    entries.append(f"total;dur={(time.perf_counter() - trace.start) * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _record(trace: Trace, scope, status: int, started_at: datetime) -> dict:
+    route = scope.get("route")
+    stats = query_profiling.current_stats()
+    return {
+        "inicio": started_at.isoformat(),
+        "metodo": scope["method"],
+        "rota": getattr(route, "path", None),
+        "caminho": scope["path"],
+        "status": status,
+        "duracao_ms": round((time.perf_counter() - trace.start) * 1000, 3),
+        "etapas": {
+            name: {"duracao_ms": round(seconds * 1000, 3), "chamadas": trace.counts[name]}
+            for name, seconds in trace.totals.items()
+        },
+        "db": {"consultas": stats.count, "duracao_ms": round(stats.seconds * 1000, 3)} if stats else None,
+        "spans": [
+            {"nome": name, "inicio_ms": round(start * 1000, 3), "duracao_ms": round(elapsed * 1000, 3)}
+            for name, start, elapsed in trace.spans
+        ],
+    }
+
+
+def write_record(record: dict, path: Optional[str] = None) -> None:
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _FILE_LOCK:
+        with open(path or TRACE_FILE, "a", encoding="utf-8") as file_obj:
+            file_obj.write(line)
+
+
+class TracedJSONResponse(JSONResponse):
+    """JSONResponse cuja serialização conta como a etapa ``serializacao``."""
+
+    def render(self, content) -> bytes:
+        with span("serializacao"):
+            return super().render(content)
+
+
+class TracingMiddleware:
+    """Sorteia as requisições rastreadas e publica as etapas medidas."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        started_at = datetime.now(timezone.utc)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(trace).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _CURRENT.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _CURRENT.reset(token)
+            if TRACE_FILE:
+                write_record(_record(trace, scope, status, started_at))
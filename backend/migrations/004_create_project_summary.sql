@@ -0,0 +1,27 @@
+-- Resumo desnormalizado dos julgamentos por projeto (contagens por domínio e global).
+-- Mantido incrementalmente pela API a cada gravação de avaliação; projetos sem
+-- linha são recalculados na primeira leitura ou escrita.
+
+CREATE TABLE IF NOT EXISTS resumos_projeto (
+    projeto_id INTEGER PRIMARY KEY REFERENCES projetos(id) ON DELETE CASCADE,
+    versao INTEGER NOT NULL DEFAULT 0,
+    d1_baixo INTEGER NOT NULL DEFAULT 0,
+    d1_algumas INTEGER NOT NULL DEFAULT 0,
+    d1_alto INTEGER NOT NULL DEFAULT 0,
+    d2_baixo INTEGER NOT NULL DEFAULT 0,
+    d2_algumas INTEGER NOT NULL DEFAULT 0,
+    d2_alto INTEGER NOT NULL DEFAULT 0,
+    d3_baixo INTEGER NOT NULL DEFAULT 0,
+    d3_algumas INTEGER NOT NULL DEFAULT 0,
+    d3_alto INTEGER NOT NULL DEFAULT 0,
+    d4_baixo INTEGER NOT NULL DEFAULT 0,
+    d4_algumas INTEGER NOT NULL DEFAULT 0,
+    d4_alto INTEGER NOT NULL DEFAULT 0,
+    d5_baixo INTEGER NOT NULL DEFAULT 0,
+    d5_algumas INTEGER NOT NULL DEFAULT 0,
+    d5_alto INTEGER NOT NULL DEFAULT 0,
+    global_baixo INTEGER NOT NULL DEFAULT 0,
+    global_algumas INTEGER NOT NULL DEFAULT 0,
+    global_alto INTEGER NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,5 @@
+-- Índice GIN para consultas de contenção sobre as respostas dos domínios
+-- (ex.: respostas @> '{"1.2": "N"}'), usadas pelo filtro de resultados.
+
+CREATE INDEX IF NOT EXISTS idx_dominios_respostas_gin
+    ON dominios USING GIN (respostas jsonb_path_ops);
@@ -0,0 +1,14 @@
+-- Histórico de revisões das avaliações. Cada linha guarda, em JSON compactado
+-- com zlib, o delta em relação à revisão anterior ou, quando checkpoint = TRUE,
+-- o estado completo da avaliação.
+
+CREATE TABLE IF NOT EXISTS revisoes_avaliacao (
+    id SERIAL PRIMARY KEY,
+    avaliacao_id INTEGER NOT NULL REFERENCES avaliacoes(id) ON DELETE CASCADE,
+    numero INTEGER NOT NULL,
+    checkpoint BOOLEAN NOT NULL DEFAULT FALSE,
+    dados BYTEA NOT NULL,
+    usuario_id INTEGER REFERENCES usuarios(id),
+    criado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_revisoes_avaliacao_numero UNIQUE (avaliacao_id, numero)
+);
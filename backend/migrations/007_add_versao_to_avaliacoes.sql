@@ -0,0 +1,4 @@
+-- Contador de versão das avaliações, exposto como ETag pela API
+-- (If-None-Match nas leituras, If-Match nas gravações).
+
+ALTER TABLE avaliacoes ADD COLUMN IF NOT EXISTS versao INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,11 @@
+-- Avaliações independentes por revisor. A avaliação de consenso continua com
+-- revisor_id NULL (uma por resultado); cada revisor tem no máximo uma
+-- avaliação própria por resultado.
+
+ALTER TABLE avaliacoes ADD COLUMN IF NOT EXISTS revisor_id INTEGER REFERENCES usuarios(id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_avaliacoes_resultado_consenso
+    ON avaliacoes (resultado_id) WHERE revisor_id IS NULL;
+
+ALTER TABLE avaliacoes DROP CONSTRAINT IF EXISTS uq_avaliacoes_resultado_revisor;
+ALTER TABLE avaliacoes ADD CONSTRAINT uq_avaliacoes_resultado_revisor UNIQUE (resultado_id, revisor_id);
@@ -0,0 +1,9 @@
+-- Eventos de auditoria sobre o projeto inteiro (exportações completas) passam
+-- a ser uma única linha com projeto_id, em vez de uma linha por avaliação.
+
+ALTER TABLE auditorias ALTER COLUMN avaliacao_id DROP NOT NULL;
+ALTER TABLE auditorias ADD COLUMN IF NOT EXISTS projeto_id INTEGER REFERENCES projetos(id) ON DELETE CASCADE;
+CREATE INDEX IF NOT EXISTS ix_auditorias_projeto_id ON auditorias (projeto_id);
+
+ALTER TABLE auditorias DROP CONSTRAINT IF EXISTS ck_auditorias_alvo;
+ALTER TABLE auditorias ADD CONSTRAINT ck_auditorias_alvo CHECK (avaliacao_id IS NOT NULL OR projeto_id IS NOT NULL);
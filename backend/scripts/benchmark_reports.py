@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Benchmark da geração de relatórios DOCX.
+
+Compara o gerador atual (XML emitido diretamente sobre um template pré-montado)
+com a implementação anterior baseada em ``add_row().cells`` do python-docx.
+Antes de medir, verifica que ambos produzem o mesmo ``word/document.xml``.
+
+Uso:
+    python scripts/benchmark_reports.py --itens 40 --repeticoes 20
+"""
+
+import argparse
+import sys
+import time
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import RGBColor
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app import docx_generator, models  # noqa: E402
+
+
+def _legacy_apply_cell_fill(cell, fill_hex: str, font_hex: str) -> None:
+    tc_pr = cell._tc.get_or_add_tcPr()
+    shd = OxmlElement("w:shd")
+    shd.set(qn("w:val"), "clear")
+    shd.set(qn("w:color"), "auto")
+    shd.set(qn("w:fill"), fill_hex.lstrip("#").upper())
+    tc_pr.append(shd)
+
+    rgb = RGBColor.from_string(font_hex.lstrip("#"))
+    for paragraph in cell.paragraphs:
+        for run in paragraph.runs:
+            run.font.color.rgb = rgb
+
+
+def _legacy_header_style(cell) -> None:
+    fill_hex, font_hex = docx_generator._HEADER_SCHEME
+    _legacy_apply_cell_fill(cell, fill_hex, font_hex)
+    for paragraph in cell.paragraphs:
+        for run in paragraph.runs:
+            run.font.bold = True
+
+
+def legacy_generate_docx_report(avaliacao: models.Evaluation) -> bytes:
+    """Implementação anterior, mantida apenas como referência de desempenho."""
+    buffer = BytesIO()
+    document = Document()
+
+    estudo = avaliacao.resultado.estudo
+    resultado = avaliacao.resultado
+
+    document.add_heading("Relatorio de Avaliacao RoB 2", level=1)
+    document.add_paragraph(f"Artigo/Referencia: {estudo.referencia}")
+    document.add_paragraph(f"Dominio do estudo: {estudo.desenho or '-'}")
+    document.add_paragraph(f"Desfecho avaliado: {resultado.desfecho}")
+
+    document.add_heading("Resumo visual do risco de vies", level=2)
+    dashboard_table = document.add_table(rows=1, cols=2)
+    header_cells = dashboard_table.rows[0].cells
+    header_cells[0].text = "Escopo"
+    header_cells[1].text = "Julgamento"
+    for cell in header_cells:
+        _legacy_header_style(cell)
+
+    global_judgement = avaliacao.julgamento_global or "Nao calculado"
+    row = dashboard_table.add_row().cells
+    row[0].text = "Global"
+    row[1].text = global_judgement
+    fill_hex, font_hex = docx_generator._resolve_hex_colors(global_judgement)
+    _legacy_apply_cell_fill(row[1], fill_hex, font_hex)
+
+    for dom in sorted(avaliacao.dominios, key=lambda item: item.tipo):
+        row = dashboard_table.add_row().cells
+        row[0].text = f"Dominio {dom.tipo}"
+        row[1].text = dom.julgamento or "Nao avaliado"
+        fill_hex, font_hex = docx_generator._resolve_hex_colors(dom.julgamento or "")
+        _legacy_apply_cell_fill(row[1], fill_hex, font_hex)
+
+    legend_paragraph = document.add_paragraph()
+    legend_run = legend_paragraph.add_run("Legenda: Baixo (verde), Algumas preocupacoes (laranja), Alto (vermelho).")
+    legend_run.italic = True
+
+    if avaliacao.pre_consideracoes:
+        document.add_heading("Pre-consideracoes", level=2)
+        document.add_paragraph(avaliacao.pre_consideracoes)
+
+    ans_map = docx_generator._answer_map()
+    for dom in sorted(avaliacao.dominios, key=lambda item: item.tipo):
+        document.add_heading(f"Dominio {dom.tipo}", level=2)
+        table = document.add_table(rows=1, cols=3)
+        hdr_cells = table.rows[0].cells
+        hdr_cells[0].text = "Item"
+        hdr_cells[1].text = "Resposta"
+        hdr_cells[2].text = "Observacao"
+        for cell in hdr_cells:
+            _legacy_header_style(cell)
+        obs_map = dom.observacoes_itens or {}
+        for pergunta_id, resposta in (dom.respostas or {}).items():
+            row_cells = table.add_row().cells
+            row_cells[0].text = str(pergunta_id)
+            row_cells[1].text = ans_map.get(resposta, resposta or "-")
+            row_cells[2].text = str(obs_map.get(pergunta_id) or "-")
+        document.add_paragraph(f"Julgamento do dominio: {dom.julgamento or '-'}")
+        if dom.justificativa:
+            document.add_paragraph(dom.justificativa)
+        document.add_paragraph("")
+
+    document.add_heading("Julgamento global", level=2)
+    document.add_paragraph(global_judgement)
+    if avaliacao.justificativa_global:
+        document.add_paragraph(avaliacao.justificativa_global)
+    if avaliacao.direcao_global:
+        document.add_paragraph(f"Direcao do vies: {avaliacao.direcao_global.value}")
+
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def build_sample_evaluation(itens_por_dominio: int) -> models.Evaluation:
+    """Monta uma avaliação em memória com muitos itens e comentários."""
+    respostas_ciclo = ["Y", "PY", "PN", "N", "NI", "NA"]
+    julgamentos = ["Baixo", "Algumas preocupações", "Alto"]
+    estudo = models.Study(projeto_id=1, referencia="Estudo de referência 2024", desenho="Paralelo")
+    resultado = models.Result(estudo=estudo, desfecho="Dor em 12 semanas")
+    avaliacao = models.Evaluation(
+        resultado=resultado,
+        pre_consideracoes="Pré-considerações\tcom tabulação e\nquebra de linha.",
+        julgamento_global="Alto",
+        justificativa_global="Domínio 1: justificativa\nDomínio 2: outra justificativa",
+        direcao_global=models.DirectionType.IMPREVISIVEL,
+    )
+    dominios = []
+    for tipo in range(1, 6):
+        respostas = {f"{tipo}.{idx}": respostas_ciclo[idx % len(respostas_ciclo)] for idx in range(1, itens_por_dominio + 1)}
+        observacoes = {key: f" Comentário longo sobre o item {key} " * 3 for key in list(respostas)[::2]}
+        dominios.append(
+            models.Domain(
+                tipo=tipo,
+                respostas=respostas,
+                observacoes_itens=observacoes,
+                julgamento=julgamentos[tipo % len(julgamentos)],
+                justificativa=f"Justificativa do domínio {tipo}",
+            )
+        )
+    avaliacao.dominios = dominios
+    resultado.avaliacao = avaliacao
+    return avaliacao
+
+
+def _document_xml(docx_bytes: bytes) -> bytes:
+    with zipfile.ZipFile(BytesIO(docx_bytes)) as package:
+        return package.read("word/document.xml")
+
+
+def _measure(func, avaliacao, repeticoes: int) -> float:
+    func(avaliacao)  # aquecimento (templates, caches de estilo)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        func(avaliacao)
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--itens", type=int, default=40, help="Itens por domínio")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    avaliacao = build_sample_evaluation(args.itens)
+    if _document_xml(legacy_generate_docx_report(avaliacao)) != _document_xml(docx_generator.generate_docx_report(avaliacao)):
+        print("❌ word/document.xml difere entre as implementações")
+        sys.exit(1)
+
+    legado = _measure(legacy_generate_docx_report, avaliacao, args.repeticoes)
+    atual = _measure(docx_generator.generate_docx_report, avaliacao, args.repeticoes)
+    print(f"Itens por domínio: {args.itens} | repetições: {args.repeticoes}")
+    print(f"python-docx (legado): {legado * 1000:8.2f} ms/relatório")
+    print(f"XML direto (atual):   {atual * 1000:8.2f} ms/relatório")
+    print(f"Aceleração: {legado / atual:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
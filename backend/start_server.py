@@ -50,8 +50,7 @@ def start_server() -> None:
             check=False,
         )
     except KeyboardInterrupt:  # pragma: no cover - feedback interativo
-        print("
-👋 Servidor interrompido pelo usuário")
+        print("\n👋 Servidor interrompido pelo usuário")
 
 
 def main() -> None:
@@ -0,0 +1,113 @@
+"""Fixtures compartilhadas pelos testes do backend.
+
+As fixtures que dependem de parâmetros devolvem fábricas; cada chamada cria
+um banco SQLite novo, então um mesmo teste pode montar cenários distintos.
+"""
+
+from typing import NamedTuple
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.app import auth, database, import_export, main, models
+
+
+class ClienteApi(NamedTuple):
+    client: TestClient
+    db: Session
+    usuario: models.User
+    projeto: models.Project
+    Session: sessionmaker
+
+
+def _fabrica_de_sessoes(url="sqlite://", **kwargs) -> sessionmaker:
+    engine = create_engine(url, **kwargs)
+    models.Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def sessao_sqlite():
+    """Sessão sobre um banco SQLite em memória, com o esquema criado."""
+    db = _fabrica_de_sessoes()()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def criar_projeto():
+    """Fábrica ``criar_projeto(total_resultados)``: usuário e projeto com um estudo.
+
+    Devolve ``(db, usuario, projeto, resultados)``; o usuário não é membro do projeto.
+    """
+
+    def fabrica(total_resultados):
+        db = _fabrica_de_sessoes()()
+        usuario = models.User(nome="Ana", email="ana@example.com", senha_hash="x")
+        projeto = models.Project(nome="Projeto")
+        estudo = models.Study(projeto=projeto, referencia="Estudo A")
+        estudo.resultados = [models.Result(desfecho=f"Desfecho {idx}") for idx in range(total_resultados)]
+        db.add_all([usuario, projeto])
+        db.commit()
+        return db, usuario, projeto, estudo.resultados
+
+    return fabrica
+
+
+@pytest.fixture
+def linha():
+    """Fábrica ``linha(resultado, respostas_d1)`` de linhas importadas (domínios 1 e 2)."""
+
+    def fabrica(resultado, respostas_d1):
+        payload = {"resultado": {}, "dominios": [{"tipo": 1, "respostas": respostas_d1}, {"tipo": 2, "respostas": {}}]}
+        return import_export.ImportedRow(2, resultado.id, None, payload, [])
+
+    return fabrica
+
+
+@pytest.fixture
+def cliente_api():
+    """Fábrica ``cliente_api(total_estudos=1, papel=ADMIN, arquivo=None)`` de clientes da API.
+
+    O projeto tem ``total_estudos`` estudos com os resultados "Dor" e "Óbito"
+    e o usuário é membro com ``papel``. Com ``arquivo`` o banco fica em disco
+    e cada sessão usa a própria conexão, como em produção; sem ele, em
+    memória. As dependências de banco e de usuário do app são substituídas
+    e restauradas ao fim do teste.
+    """
+
+    def fabrica(total_estudos=1, papel=models.RoleType.ADMIN, arquivo=None):
+        if arquivo is None:
+            Session = _fabrica_de_sessoes(connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        else:
+            Session = _fabrica_de_sessoes(f"sqlite:///{arquivo}", connect_args={"check_same_thread": False})
+        db = Session()
+        usuario = models.User(nome="Ana", email="ana@example.com", senha_hash="x")
+        projeto = models.Project(nome="Projeto")
+        projeto.estudos = [
+            models.Study(referencia=f"Estudo {idx}", resultados=[models.Result(desfecho="Dor"), models.Result(desfecho="Óbito")])
+            for idx in range(total_estudos)
+        ]
+        db.add_all([usuario, projeto])
+        db.flush()
+        db.add(models.ProjectMember(usuario_id=usuario.id, projeto_id=projeto.id, papel=papel))
+        db.commit()
+        db.refresh(usuario)
+
+        def get_db():
+            session = Session()
+            try:
+                yield session
+                session.commit()
+            finally:
+                session.close()
+
+        main.app.dependency_overrides[database.get_db] = get_db
+        main.app.dependency_overrides[auth.get_current_user] = lambda: usuario
+        return ClienteApi(TestClient(main.app), db, usuario, projeto, Session)
+
+    yield fabrica
+    main.app.dependency_overrides.clear()
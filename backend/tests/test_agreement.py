@@ -0,0 +1,71 @@
+import numpy as np
+
+from backend.app import agreement, models, summary
+
+BAIXO = {"1.1": "Y", "1.2": "Y", "1.3": "N"}
+ALTO = {"1.1": "N", "1.2": "N", "1.3": "Y"}
+
+
+def revisar(db, revisor, resultado, respostas, projeto_id):
+    avaliacao, nova = agreement.save_review(db, revisor, resultado, [{"tipo": 1, "respostas": respostas}])
+    db.commit()
+    agreement.apply_saved_review(projeto_id, avaliacao, nova)
+    return avaliacao
+
+
+def test_concordancia_deve_ser_atualizada_incrementalmente(criar_projeto):
+    db, ana, projeto, resultados = criar_projeto(4)
+    bia = models.User(nome="Bia", email="bia@example.com", senha_hash="x")
+    db.add(bia)
+    db.commit()
+    agreement._MATRIX_CACHE.clear()
+    agreement._PAIR_CACHE.clear()
+    for idx, resultado in enumerate(resultados):
+        revisar(db, ana, resultado, BAIXO, projeto.id)
+        revisar(db, bia, resultado, ALTO if idx == 0 else BAIXO, projeto.id)
+
+    antes = agreement.agreement_report(db, projeto.id)
+    assert (antes["revisor_a"], antes["revisor_b"]) == (ana.id, bia.id)
+    assert antes["perguntas"]["1.1"] == {"kappa": 0.0, "concordancia": 0.75, "pares": 4}
+    assert antes["dominios"]["D1"]["confusao"] == [[3, 0, 1], [0, 0, 0], [0, 0, 0]]
+    assert agreement.disagreements(db, projeto.id)["itens"][0]["perguntas"]["1.1"] == ["Y", "N"]
+
+    revisar(db, bia, resultados[0], BAIXO, projeto.id)
+    incremental = agreement._PAIR_CACHE[(projeto.id, ana.id, bia.id)]
+    agreement._MATRIX_CACHE.clear()
+    agreement._PAIR_CACHE.clear()
+    depois = agreement.agreement_report(db, projeto.id)
+    assert np.array_equal(incremental.perguntas, agreement._PAIR_CACHE[(projeto.id, ana.id, bia.id)].perguntas)
+    assert depois["dominios"]["D1"]["concordancia"] == 1.0
+    assert agreement.disagreements(db, projeto.id)["total"] == 0
+    # Revisões independentes não entram no resumo nem ocupam a avaliação de consenso
+    assert resultados[0].avaliacao is None
+    assert summary._count_project(db, projeto.id)["global_baixo"] == 0
+
+
+def test_kappa_deve_ignorar_respostas_ausentes():
+    confusao = np.zeros((1, 7, 7), dtype=np.int64)
+    confusao[0, 1, 1] = 4
+    confusao[0, 4, 4] = 4
+    confusao[0, 1, 4] = 2
+    confusao[0, 0, 1] = 5
+
+    kappa, concordancia, pares = agreement.kappa_statistics(confusao)
+
+    assert pares.tolist() == [10]
+    assert concordancia[0] == 0.8
+    assert round(float(kappa[0]), 4) == round((0.8 - 0.48) / 0.52, 4)
+
+
+def test_avaliacao_de_revisor_nao_deve_substituir_a_de_consenso(criar_projeto):
+    db, ana, projeto, resultados = criar_projeto(1)
+    resultado = resultados[0]
+    consenso = models.Evaluation(resultado=resultado, julgamento_global="Baixo")
+    db.add(consenso)
+    revisao = models.Evaluation(resultado=resultado, revisor_id=ana.id, julgamento_global="Alto")
+    db.add(revisao)
+    db.commit()
+    db.expire_all()
+
+    assert sorted((a.id, a.revisor_id) for a in resultado.avaliacoes) == [(consenso.id, None), (revisao.id, ana.id)]
+    assert resultado.avaliacao.id == consenso.id
@@ -0,0 +1,39 @@
+from backend.app import analytics, import_export
+
+
+def registrar(db, usuario, projeto, pares):
+    linhas = [
+        import_export.ImportedRow(2, resultado.id, None, {"resultado": {}, "dominios": [{"tipo": 1, "respostas": respostas}]}, [])
+        for resultado, respostas in pares
+    ]
+    import_export.persist_imported_evaluations(db, usuario, projeto.id, linhas)
+
+
+def test_snapshot_deve_ser_invalidado_pela_versao_do_resumo(criar_projeto):
+    db, usuario, projeto, resultados = criar_projeto(3)
+    registrar(db, usuario, projeto, [(resultados[0], {"1.1": "Y", "1.2": "N"}), (resultados[1], {"1.1": "Y", "1.2": "Y"})])
+
+    primeiro = analytics.get_snapshot(db, projeto.id)
+    assert analytics.get_snapshot(db, projeto.id) is primeiro
+    distribuicao = analytics.answer_distribution(primeiro, ["1.2"])
+    assert distribuicao["perguntas"]["1.2"] == {"Sem resposta": 1, "Y": 1, "PY": 0, "PN": 0, "N": 1, "NI": 0, "NA": 0}
+
+    registrar(db, usuario, projeto, [(resultados[1], {"1.1": "Y", "1.2": "PN"})])
+    segundo = analytics.get_snapshot(db, projeto.id)
+    assert segundo is not primeiro and segundo.versao > primeiro.versao
+    tabela = analytics.crosstab(segundo, "Global", "1.2")
+    assert tabela["contagens"][3][analytics.ANSWER_LABELS.index("PN")] == 1
+
+
+def test_what_if_deve_reavaliar_apenas_com_a_variante(criar_projeto):
+    db, usuario, projeto, resultados = criar_projeto(3)
+    registrar(db, usuario, projeto, [(resultado, {"1.1": "Y", "1.2": "Y", "1.3": "N"}) for resultado in resultados[:2]])
+    snapshot = analytics.get_snapshot(db, projeto.id)
+
+    assert analytics.what_if(snapshot)["resultados_alterados"] == []
+    variante = {1: [{"quando": {"1.3": {"in": ["N"]}}, "resultado": "Alto"}]}
+    relatorio = analytics.what_if(snapshot, variante)
+
+    assert relatorio["resultados_alterados"] == [resultado.id for resultado in resultados[:2]]
+    assert relatorio["colunas"]["Global"]["depois"]["Alto"] == 2
+    assert relatorio["colunas"]["Global"]["antes"]["Sem informação"] == 1
@@ -0,0 +1,39 @@
+import pytest
+
+from backend.app import answer_filters, import_export
+
+
+def registrar(db, usuario, projeto, resultados, respostas):
+    linhas = [
+        import_export.ImportedRow(2, resultado.id, None, {"resultado": {}, "dominios": [{"tipo": 1, "respostas": r}]}, [])
+        for resultado, r in zip(resultados, respostas)
+    ]
+    import_export.persist_imported_evaluations(db, usuario, projeto.id, linhas)
+
+
+def test_parse_predicates_deve_agrupar_por_dominio():
+    predicados = answer_filters.parse_predicates(["1.2:N,pn", "1.3=Y/PY", "2.1:NI"])
+
+    assert predicados == {1: [("1.2", ["N", "PN"]), ("1.3", ["Y", "PY"])], 2: [("2.1", ["NI"])]}
+    with pytest.raises(ValueError):
+        answer_filters.parse_predicates(["1.2:talvez"])
+    with pytest.raises(ValueError):
+        answer_filters.parse_predicates(["dominio1:N"])
+
+
+def test_filter_results_deve_combinar_predicados_e_paginar(criar_projeto):
+    db, usuario, projeto, resultados = criar_projeto(4)
+    registrar(db, usuario, projeto, resultados, [
+        {"1.1": "Y", "1.2": "N"},
+        {"1.1": "N", "1.2": "PN"},
+        {"1.1": "Y", "1.2": "PN"},
+        {"1.1": "Y", "1.2": "Y"},
+    ])
+
+    filtro = answer_filters.parse_predicates(["1.2:N,PN", "1.1:Y"])
+    pagina = answer_filters.filter_results(db, projeto.id, filtro, page=1, page_size=1)
+    seguinte = answer_filters.filter_results(db, projeto.id, filtro, page=2, page_size=1)
+
+    assert pagina["total"] == seguinte["total"] == 2
+    assert [item["resultado_id"] for item in pagina["itens"] + seguinte["itens"]] == [resultados[0].id, resultados[2].id]
+    assert seguinte["itens"][0]["respostas"] == {"1.2": "PN", "1.1": "Y"}
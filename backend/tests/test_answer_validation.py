@@ -0,0 +1,40 @@
+import pytest
+from pydantic import ValidationError
+
+from backend.app import answer_validation, import_export, rule_engine, schemas
+
+
+def test_normalize_answers_deve_converter_codigos_e_dependencias():
+    avisos = []
+
+    respostas = answer_validation.normalize_answers(
+        1, {"1.1": " y ", "1.2": "Provavelmente sim", "1.3": "N", "1.4": "Y", "1.9": "Y", "1.5": ""}, avisos
+    )
+
+    assert respostas == {"1.1": "Y", "1.2": "PY", "1.3": "N", "1.4": "NA"}
+    assert len(avisos) == 2
+    valido = {"1.1": "Y", "1.2": "Y", "1.3": "N"}
+    assert answer_validation.normalize_answers(1, valido) is valido
+
+
+def test_respostas_invalidas_devem_ser_rejeitadas_na_api():
+    with pytest.raises(ValidationError):
+        schemas.DomainCreate(tipo=2, respostas={"2.1": "talvez"})
+    with pytest.raises(ValidationError):
+        schemas.DomainCreate(tipo=2, respostas={"1.1": "Y"})
+    dominio = schemas.DomainCreate(tipo=5, respostas={"5.1": "n", "5.2": "Y"})
+    assert dominio.respostas == {"5.1": "N", "5.2": "NA"}
+
+
+def test_motor_deve_pular_regras_de_perguntas_nao_aplicaveis():
+    # 5.2 só se aplica com 5.1 = Y/PY: a regra "5.2 in Y/PY -> Alto" não vale aqui
+    assert rule_engine.evaluate_domain(5, {"5.1": "NI", "5.2": "Y"})[0] == "Algumas preocupações"
+    assert rule_engine.evaluate_domain(5, {"5.1": "Y", "5.2": "Y"})[0] == "Alto"
+
+
+def test_importacao_deve_descartar_respostas_invalidas_com_aviso():
+    avisos = []
+    payload = import_export._build_evaluation_payload({"dominios": {3: {"respostas": {"3.1": "X", "3.2": "pn"}}}}, avisos)
+
+    assert payload["dominios"][0]["respostas"] == {"3.2": "PN"}
+    assert avisos and "3.1" in avisos[0]
@@ -0,0 +1,59 @@
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import audit, import_export, main, models
+
+
+def test_importacao_deve_enfileirar_e_gravar_em_lote(monkeypatch, criar_projeto, linha):
+    monkeypatch.setattr(audit, "_QUEUE", audit.queue.Queue())
+    db, usuario, projeto, resultados = criar_projeto(3)
+    fabrica = sessionmaker(bind=db.get_bind())
+
+    import_export.persist_imported_evaluations(db, usuario, projeto.id, [linha(r, {"1.1": "Y"}) for r in resultados])
+    assert db.query(models.Audit).count() == 0
+    audit.record_project(audit.EXPORTACAO + ":xlsx", usuario.id, projeto.id)
+
+    assert audit.flush(fabrica) == 4
+    acoes = sorted((a.acao, a.avaliacao_id or 0, a.projeto_id) for a in db.query(models.Audit))
+    avaliacoes = sorted(r.avaliacao.id for r in resultados)
+    assert acoes == [("exportacao:xlsx", 0, projeto.id)] + [("importacao", i, None) for i in avaliacoes]
+
+
+def test_fila_cheia_deve_descartar_sem_bloquear(monkeypatch):
+    fila = audit.queue.Queue(maxsize=1)
+    monkeypatch.setattr(audit, "_QUEUE", fila)
+    antes = audit.dropped_events()
+
+    audit.record_many(audit.IMPORTACAO, 1, [1, 2, 3])
+
+    assert fila.qsize() == 1
+    assert audit.dropped_events() == antes + 2
+
+
+def test_descartes_concorrentes_devem_ser_contados_sem_perdas(monkeypatch):
+    monkeypatch.setattr(audit, "_QUEUE", audit.queue.Queue(maxsize=1))
+    audit.record(audit.IMPORTACAO, 1, 1)
+    antes = audit.dropped_events()
+
+    threads = [threading.Thread(target=audit.record_many, args=(audit.IMPORTACAO, 1, range(2000))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert audit.dropped_events() == antes + 16000
+
+
+def test_ciclo_de_vida_da_api_deve_iniciar_e_parar_o_gravador(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(audit, "start", lambda: chamadas.append("start"))
+    monkeypatch.setattr(audit, "stop", lambda: chamadas.append("stop"))
+    monkeypatch.setattr(import_export, "start_import_pool", lambda: chamadas.append("pool"))
+    monkeypatch.setattr(import_export, "shutdown_import_pool", lambda: chamadas.append("fim do pool"))
+
+    with TestClient(main.app):
+        assert chamadas == ["start", "pool"]
+
+    assert chamadas == ["start", "pool", "fim do pool", "stop"]
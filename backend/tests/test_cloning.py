@@ -0,0 +1,26 @@
+from backend.app import cloning, import_export, models, revisions, summary
+
+
+def test_clone_domains_deve_copiar_respostas_e_recalcular_globais(criar_projeto, linha):
+    db, usuario, projeto, resultados = criar_projeto(3)
+    import_export.persist_imported_evaluations(
+        db,
+        usuario,
+        projeto.id,
+        [linha(resultados[0], {"1.1": "N"}), linha(resultados[1], {"1.1": "Y", "1.2": "Y", "1.3": "N"})],
+    )
+    db.expire_all()
+
+    alterados = cloning.clone_domains(db, usuario.id, resultados[0], [1])
+    db.commit()
+    db.expire_all()
+
+    assert [item["resultado_id"] for item in alterados] == [resultados[1].id, resultados[2].id]
+    assert all(item["julgamento_global"] == "Alto" for item in alterados)
+    copiado = {dom.tipo: dom for dom in resultados[2].avaliacao.dominios}[1]
+    assert copiado.respostas == {"1.1": "N"} and copiado.julgamento == "Alto"
+    recalculado = summary._count_project(db, projeto.id)
+    resumo = summary.ensure_summary(db, projeto.id)
+    assert all(getattr(resumo, coluna) == valor for coluna, valor in recalculado.items())
+    assert revisions.latest_revision(db, resultados[1].avaliacao.id) == 2
+    assert db.query(models.Evaluation).count() == 3
@@ -0,0 +1,118 @@
+from io import BytesIO
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from backend.app import docx_generator, models
+
+
+def criar_avaliacao_exemplo():
+    estudo = models.Study(projeto_id=1, referencia="Estudo X", desenho="Paralelo")
+    resultado = models.Result(estudo=estudo, desfecho="Dor")
+    avaliacao = models.Evaluation(
+        resultado=resultado,
+        pre_consideracoes="Observações",
+        julgamento_global="Alto",
+        justificativa_global="Domínio 1: ok\nDomínio 2: desvios",
+        direcao_global=models.DirectionType.NA,
+    )
+    avaliacao.dominios = [
+        models.Domain(tipo=2, respostas={"2.1": "Y"}, julgamento="Alto", justificativa="Desvios"),
+        models.Domain(tipo=1, respostas={"1.1": "Y", "1.2": "PN"}, observacoes_itens={"1.1": "Obs 1"}, julgamento="Baixo"),
+    ]
+    resultado.avaliacao = avaliacao
+    return avaliacao
+
+
+def test_generate_docx_report_deve_gerar_tabelas_coloridas():
+    docx_bytes = docx_generator.generate_docx_report(criar_avaliacao_exemplo())
+
+    document = Document(BytesIO(docx_bytes))
+    dashboard, dominio1, dominio2 = document.tables
+    assert [cell.text for cell in dashboard.rows[1].cells] == ["Global", "Alto"]
+    assert [cell.text for cell in dashboard.rows[2].cells] == ["Dominio 1", "Baixo"]
+    shd = dashboard.rows[1].cells[1]._tc.tcPr.find(qn("w:shd"))
+    assert shd.get(qn("w:fill")) == "DC2626"
+    assert dominio1.rows[0].cells[0].paragraphs[0].runs[0].bold
+    assert [cell.text for cell in dominio1.rows[1].cells] == ["1.1", "Sim", "Obs 1"]
+    assert [cell.text for cell in dominio2.rows[1].cells] == ["2.1", "Sim", "-"]
+
+
+def test_generate_docx_report_deve_preservar_quebras_de_linha():
+    docx_bytes = docx_generator.generate_docx_report(criar_avaliacao_exemplo())
+
+    document = Document(BytesIO(docx_bytes))
+    textos = [paragraph.text for paragraph in document.paragraphs]
+    assert textos[0] == "Relatorio de Avaliacao RoB 2"
+    assert document.paragraphs[0].style.name == "Heading 1"
+    assert "Domínio 1: ok\nDomínio 2: desvios" in textos
+
+
+def test_generate_pdf_report_deve_reconstruir_apenas_dominio_alterado():
+    docx_generator._PDF_FRAGMENT_CACHE.clear()
+    avaliacao = criar_avaliacao_exemplo()
+    avaliacao.dominios[1].respostas = {f"1.{idx}": "Y" for idx in range(1, 80)}
+
+    primeiro = docx_generator.generate_pdf_report(avaliacao)
+    chaves_iniciais = set(docx_generator._PDF_FRAGMENT_CACHE)
+    avaliacao.dominios[0].julgamento = "Baixo"
+    segundo = docx_generator.generate_pdf_report(avaliacao)
+
+    assert primeiro.startswith(b"%PDF") and segundo.startswith(b"%PDF")
+    assert len(chaves_iniciais) == 2
+    assert len(set(docx_generator._PDF_FRAGMENT_CACHE) - chaves_iniciais) == 1
+
+
+def criar_linhas_projeto(total):
+    return [
+        {"resultado_id": idx, "referencia": f"Estudo {idx}", "desfecho": "Dor", "codes": [idx % 4] * 6}
+        for idx in range(1, total + 1)
+    ]
+
+
+def test_summarize_judgements_deve_ponderar_por_resultado():
+    linhas = [
+        {"resultado_id": 1, "referencia": "A", "desfecho": "Dor", "codes": [1, 1, 1, 1, 1, 1]},
+        {"resultado_id": 2, "referencia": "B", "desfecho": "Dor", "codes": [3, 3, 3, 3, 3, 0]},
+    ]
+
+    proporcoes = docx_generator.summarize_judgements(linhas, weights={2: 3})
+
+    assert proporcoes[0] == [0.0, 0.25, 0.0, 0.75]
+    assert proporcoes[-1] == [0.75, 0.25, 0.0, 0.0]
+
+
+def test_rota_de_resumo_deve_repassar_pesos_por_resultado(monkeypatch, cliente_api):
+    recebidos = []
+
+    def gerar_pdf(nome, linhas, weights=None):
+        recebidos.append(weights)
+        return b"%PDF"
+
+    monkeypatch.setattr(docx_generator, "generate_project_pdf_report", gerar_pdf)
+    client, _, _, projeto, _ = cliente_api()
+    dor, obito = (resultado.id for resultado in projeto.estudos[0].resultados)
+    url = f"/api/projects/{projeto.id}/report"
+    ponderado = client.get(url, params={"weights": f"{dor}:2.5, {obito}:0"})
+    simples = client.get(url)
+    invalido = client.get(url, params={"weights": f"{dor}:-1"})
+    alheio = client.get(url, params={"weights": "999:1"})
+
+    assert ponderado.status_code == simples.status_code == 200
+    assert recebidos == [{dor: 2.5, obito: 0.0}, None]
+    assert invalido.status_code == alheio.status_code == 400
+    assert alheio.json()["detail"] == "Resultado 999 não pertence ao projeto."
+
+
+def test_relatorio_de_projeto_deve_paginar_semaforo():
+    linhas = criar_linhas_projeto(100)
+
+    docx_bytes = docx_generator.generate_project_docx_report("Projeto", linhas)
+    document = Document(BytesIO(docx_bytes))
+    assert len(document.tables) == 1 + 3
+    assert document.tables[1].rows[1].cells[2].text == "+"
+
+    assert docx_generator.project_png_page_count(linhas) == 4
+    png_bytes = docx_generator.generate_project_png_report("Projeto", linhas, page=4)
+    assert png_bytes.startswith(b"\x89PNG")
+    assert docx_generator.generate_project_pdf_report("Projeto", linhas).startswith(b"%PDF")
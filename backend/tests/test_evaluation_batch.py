@@ -0,0 +1,62 @@
+from backend.app import models
+
+
+def preparar(cliente_api):
+    """Projeto próprio (resultados Dor e Óbito) e um resultado de projeto sem permissão."""
+    client, db, _, projeto, _ = cliente_api(papel=models.RoleType.EDITOR)
+    alheio = models.Project(nome="Outro", estudos=[models.Study(referencia="Estudo B", resultados=[models.Result(desfecho="Dor")])])
+    db.add(alheio)
+    db.commit()
+    ids = [resultado.id for resultado in projeto.estudos[0].resultados] + [alheio.estudos[0].resultados[0].id]
+    return client, db, ids
+
+
+def avaliacao(resultado_id, resposta="Y", **dominio):
+    return {"resultado_id": resultado_id, "dominios": [{"tipo": 1, "respostas": {"1.1": resposta, "1.2": "Y", "1.3": "N"}, **dominio}]}
+
+
+def test_lote_deve_devolver_status_por_item_na_ordem_recebida(cliente_api):
+    client, db, (dor, obito, alheio) = preparar(cliente_api)
+    response = client.post(
+        "/api/evaluations/batch",
+        json={"avaliacoes": [avaliacao(obito), avaliacao(999), avaliacao(alheio), avaliacao(dor, observacoes_itens={"1.1": "Obs"}), avaliacao(obito, "N")]},
+    )
+
+    assert response.status_code == 200
+    corpo = response.json()
+    assert (corpo["gravadas"], corpo["falhas"]) == (2, 3)
+    itens = corpo["itens"]
+    assert [(item["indice"], item["resultado_id"], item["status"]) for item in itens] == [
+        (0, obito, "gravado"),
+        (1, 999, "falha"),
+        (2, alheio, "falha"),
+        (3, dor, "gravado"),
+        (4, obito, "falha"),
+    ]
+    assert itens[1]["erro"] == "Resultado não encontrado"
+    assert itens[2]["erro"] == "Sem permissão para acessar este recurso"
+    assert itens[4]["erro"] == f"Resultado {obito} repetido no lote (já enviado no item 0)."
+    assert all(item["julgamento_global"] for item in itens if item["status"] == "gravado")
+
+
+def test_lote_deve_gravar_observacoes_ausentes_como_dicionario_vazio(cliente_api):
+    client, db, (dor, obito, _) = preparar(cliente_api)
+    client.post("/api/evaluations/batch", json={"avaliacoes": [avaliacao(dor), avaliacao(obito, observacoes_itens={"1.1": "Obs"})]})
+
+    observacoes = {dominio.avaliacao.resultado_id: dominio.observacoes_itens for dominio in db.query(models.Domain)}
+    assert observacoes == {dor: {}, obito: {"1.1": "Obs"}}
+
+
+def test_resposta_invalida_deve_reprovar_apenas_o_seu_item(cliente_api):
+    client, db, (dor, obito, _) = preparar(cliente_api)
+    response = client.post(
+        "/api/evaluations/batch",
+        json={"avaliacoes": [avaliacao(dor, "Talvez"), avaliacao(obito, "provavelmente sim"), avaliacao(dor)]},
+    )
+
+    assert response.status_code == 200
+    itens = response.json()["itens"]
+    assert [item["status"] for item in itens] == ["falha", "gravado", "gravado"]
+    assert itens[0]["erro"].startswith("Resposta 'Talvez' inválida para a pergunta 1.1.")
+    respostas = {dominio.avaliacao.resultado_id: dominio.respostas for dominio in db.query(models.Domain)}
+    assert respostas[obito]["1.1"] == "PY"
@@ -0,0 +1,73 @@
+from sqlalchemy import update
+
+from backend.app import main, models
+
+
+def preparar(cliente_api, tmp_path):
+    """Cliente sobre banco em disco (conexões separadas) e o corpo de uma avaliação."""
+    cliente = cliente_api(papel=models.RoleType.EDITOR, arquivo=tmp_path / "rob2.db")
+    resultado_id = cliente.projeto.estudos[0].resultados[0].id
+    avaliacao = {"resultado_id": resultado_id, "dominios": [{"tipo": 1, "respostas": {"1.1": "Y", "1.2": "Y", "1.3": "N"}}]}
+    return cliente.client, cliente.Session, avaliacao
+
+
+def test_gravacao_e_leitura_devem_devolver_etag_da_versao(cliente_api, tmp_path):
+    client, _, avaliacao = preparar(cliente_api, tmp_path)
+    criada = client.post("/api/evaluations", json=avaliacao)
+    lida = client.get(f"/api/results/{avaliacao['resultado_id']}/evaluation")
+    atualizada = client.post("/api/evaluations", json=avaliacao, headers={"If-Match": criada.headers["etag"]})
+
+    avaliacao_id = criada.json()["id"]
+    assert criada.headers["etag"] == f'"{avaliacao_id}-1"'
+    assert lida.headers["etag"] == criada.headers["etag"]
+    assert atualizada.status_code == 200
+    assert atualizada.headers["etag"] == f'"{avaliacao_id}-2"'
+    assert atualizada.json()["versao"] == 2
+
+
+def test_if_none_match_com_etag_atual_deve_responder_304(cliente_api, tmp_path):
+    client, _, avaliacao = preparar(cliente_api, tmp_path)
+    etag = client.post("/api/evaluations", json=avaliacao).headers["etag"]
+    url = f"/api/results/{avaliacao['resultado_id']}/evaluation"
+    inalterada = client.get(url, headers={"If-None-Match": etag})
+    client.post("/api/evaluations", json=avaliacao)
+    alterada = client.get(url, headers={"If-None-Match": etag})
+
+    assert inalterada.status_code == 304
+    assert inalterada.content == b""
+    assert inalterada.headers["etag"] == etag
+    assert alterada.status_code == 200
+    assert alterada.headers["etag"] != etag
+
+
+def test_if_match_com_etag_antiga_deve_responder_412(cliente_api, tmp_path):
+    client, _, avaliacao = preparar(cliente_api, tmp_path)
+    antiga = client.post("/api/evaluations", json=avaliacao).headers["etag"]
+    client.post("/api/evaluations", json=avaliacao)
+    conflito = client.post("/api/evaluations", json=avaliacao, headers={"If-Match": antiga})
+    versao = client.get(f"/api/results/{avaliacao['resultado_id']}/evaluation").json()["versao"]
+
+    assert conflito.status_code == 412
+    assert versao == 2
+
+
+def test_gravacao_concorrente_apos_validar_if_match_deve_responder_412(cliente_api, tmp_path, monkeypatch):
+    client, Session, avaliacao = preparar(cliente_api, tmp_path)
+    etag = client.post("/api/evaluations", json=avaliacao).headers["etag"]
+    original = main._etag_matches
+
+    def etag_matches_com_corrida(header, atual):
+        # Outra gravação confirma entre a checagem da ETag e o UPDATE condicional
+        confere = original(header, atual)
+        with Session() as outra:
+            outra.execute(update(models.Evaluation).values(versao=models.Evaluation.versao + 1))
+            outra.commit()
+        return confere
+
+    monkeypatch.setattr(main, "_etag_matches", etag_matches_com_corrida)
+    conflito = client.post("/api/evaluations", json=avaliacao, headers={"If-Match": etag})
+    monkeypatch.setattr(main, "_etag_matches", original)
+    versao = client.get(f"/api/results/{avaliacao['resultado_id']}/evaluation").json()["versao"]
+
+    assert conflito.status_code == 412
+    assert versao == 2
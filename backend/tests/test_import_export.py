@@ -13,7 +13,11 @@ def test_Export_excel_deve_emitir_colunas_template():
     assert 'JulgamentoGlobal' in resumo
     assert resumo['JulgamentoGlobal'] == "AvaliacaoRob2.julgamentoGlobal"
 
+import os
+import zipfile
 from io import BytesIO
+
+import pytest
 from openpyxl import Workbook, load_workbook
 
 from backend.app import import_export, models
@@ -32,11 +36,11 @@ def criar_planilha_exemplo(caminho):
 
     ws_dom2 = wb.create_sheet("Dominio2")
     ws_dom2.append(["Q2_1", "Q2_2", "Q2_3", "Comentarios", "Julgamento"])
-    ws_dom2.append(["N", "Y", "Y", "Comentário 2", "Baixo"])
+    ws_dom2.append(["N", "Y", "NA", "Comentário 2", "Baixo"])
 
     ws_dom3 = wb.create_sheet("Dominio3")
     ws_dom3.append(["Q3_1", "Q3_2", "Q3_3", "Comentarios", "Julgamento"])
-    ws_dom3.append(["N", "N", "Y", "Comentário 3", "Baixo"])
+    ws_dom3.append(["N", "N", "NA", "Comentário 3", "Baixo"])
 
     ws_dom4 = wb.create_sheet("Dominio4")
     ws_dom4.append(["Q4_1", "Q4_2", "Q4_3", "Comentarios", "Julgamento"])
@@ -84,3 +88,263 @@ def test_export_workbook_deve_gerar_planilha_compativel():
     desfecho_idx = headers.index("Desfecho")
     assert ws_pre[2][desfecho_idx].value == "Dor"
 
+
+def test_export_workbook_deve_exportar_julgamentos_por_dominio():
+    estudo = models.Study(projeto_id=1, referencia="Estudo X", desenho="Paralelo")
+    resultado = models.Result(estudo=estudo, desfecho="Dor", resultado_numerico="10%", fontes={"comparador": "Placebo"})
+    avaliacao = models.Evaluation(resultado=resultado, julgamento_global="Alto", direcao_global=models.DirectionType.NA)
+    avaliacao.dominios = [models.Domain(tipo=1, respostas={"1.1": "Y"}, julgamento="Baixo")]
+    resultado.avaliacao = avaliacao
+
+    workbook_bytes, _ = import_export.export_workbook(resultado)
+
+    wb = load_workbook(filename=BytesIO(workbook_bytes))
+    assert [cell.value for cell in wb["Dominio1"][2]][-1] == "Baixo"
+    assert [cell.value for cell in wb["Resumo"][2]] == ["Alto", "NA"]
+    pre = {cell.value: valor.value for cell, valor in zip(wb["Pre_Consideracoes"][1], wb["Pre_Consideracoes"][2])}
+    assert pre["ResultadoNumerico"] == "10%"
+    assert pre["Comparador"] == "Placebo"
+
+
+def test_export_project_workbook_deve_gravar_uma_linha_por_resultado(monkeypatch):
+    def registros_falsos(db, project_id):
+        for idx in range(1, 4):
+            yield {
+                "resultado": {"id": idx, "desfecho": f"Desfecho {idx}", "fontes": None},
+                "estudo": {"referencia": "Estudo X", "desenho": None},
+                "avaliacao": {"pre_consideracoes": None, "julgamento_global": "Baixo", "direcao_global": "NA"},
+                "dominios": {1: {"respostas": {"1.1": "Y"}, "comentarios": None, "observacoes_itens": {}, "julgamento": "Baixo", "direcao": "NA"}},
+            }
+
+    monkeypatch.setattr(import_export, "iter_project_records", registros_falsos)
+    buffer = BytesIO()
+
+    total = import_export.export_project_workbook(None, 1, buffer)
+
+    assert total == 3
+    wb = load_workbook(filename=BytesIO(buffer.getvalue()))
+    ws = wb["Dominio1"]
+    assert [cell.value for cell in ws[1]][:3] == ["ResultadoId", "Referencia", "Q1_1"]
+    assert [row[0] for row in ws.iter_rows(min_row=2, values_only=True)] == [1, 2, 3]
+
+
+def test_get_compiled_mapping_deve_recompilar_apenas_quando_arquivo_muda(tmp_path, monkeypatch):
+    arquivo = tmp_path / "mapeamento.xlsx.yaml"
+    arquivo.write_text('abas:\n  Resumo:\n    colunas:\n      JulgamentoGlobal: "AvaliacaoRob2.julgamentoGlobal"\n', encoding="utf-8")
+    monkeypatch.setattr(import_export, "MAP_PATH", arquivo)
+    monkeypatch.setattr(import_export, "_MAPPING_CACHE", None)
+
+    primeiro = import_export.get_compiled_mapping()
+    assert import_export.get_compiled_mapping() is primeiro
+
+    arquivo.write_text('abas:\n  Dominio1:\n    colunas:\n      Q1_1: "Dominio[1].respostas[1.1]"\n', encoding="utf-8")
+    os.utime(arquivo, ns=(arquivo.stat().st_atime_ns, arquivo.stat().st_mtime_ns + 1_000_000))
+    segundo = import_export.get_compiled_mapping()
+
+    assert segundo is not primeiro
+    coluna = segundo.sheets[0].columns[0]
+    payload = {}
+    coluna.setter(payload, "PY", [])
+    assert payload["dominios"][1]["respostas"] == {"1.1": "PY"}
+    assert coluna.getter({"dominios": {1: {"respostas": {"1.1": "PY"}}}}) == "PY"
+
+
+def test_iter_workbook_evaluations_deve_separar_resultados_por_linha(tmp_path):
+    wb = Workbook()
+    ws_pre = wb.active
+    ws_pre.title = "Pre_Consideracoes"
+    ws_pre.append(["ResultadoId", "Referencia", "Desfecho"])
+    ws_pre.append([10, "Estudo A", "Dor"])
+    ws_pre.append([None, None, None])
+    ws_pre.append([11, "Estudo B", "Náusea"])
+    ws_dom1 = wb.create_sheet("Dominio1")
+    ws_dom1.append(["ResultadoId", "Q1_1", "Q1_2"])
+    ws_dom1.append([11, "N", "PN"])
+    ws_dom1.append([10, "Y", "Y"])
+    arquivo = tmp_path / "projeto.xlsx"
+    wb.save(arquivo)
+
+    warnings = []
+    linhas = list(import_export.iter_workbook_evaluations(arquivo, warnings))
+
+    linhas = sorted(linhas, key=lambda linha: linha.resultado_id)
+    assert [linha.resultado_id for linha in linhas] == [10, 11]
+    assert linhas[0].referencia == "Estudo A"
+    assert linhas[0].payload["resultado"] == {"desfecho": "Dor"}
+    assert linhas[0].payload["dominios"][0]["respostas"] == {"1.1": "Y", "1.2": "Y"}
+    assert [linha.line for linha in linhas] == [2, 2]
+    assert linhas[1].payload["dominios"][0]["respostas"] == {"1.1": "N", "1.2": "PN"}
+    assert "Aba 'Resumo' não encontrada no arquivo." in warnings
+
+
+def test_persist_imported_evaluations_deve_gravar_lote_e_relatar_falhas(sessao_sqlite):
+    db = sessao_sqlite
+    usuario = models.User(nome="Ana", email="ana@example.com", senha_hash="x")
+    projeto = models.Project(nome="Projeto")
+    estudo = models.Study(projeto=projeto, referencia="Estudo A")
+    estudo.resultados = [models.Result(desfecho="Dor"), models.Result(desfecho="Náusea")]
+    existente = models.Evaluation(resultado=estudo.resultados[0], julgamento_global="Alto")
+    existente.dominios = [models.Domain(tipo=2, respostas={"2.1": "N"})]
+    db.add_all([usuario, projeto, existente])
+    db.commit()
+    dor, nausea = estudo.resultados
+
+    def linha(numero, resultado_id=None, referencia=None, desfecho=None, direcao="NA"):
+        payload = {
+            "pre_consideracoes": None,
+            "resultado": {"desfecho": desfecho, "comparador": "Placebo"} if desfecho else {},
+            "dominios": [{"tipo": 1, "respostas": {"1.1": "Y", "1.2": "Y", "1.3": "N"}, "direcao": direcao}],
+        }
+        return import_export.ImportedRow(numero, resultado_id, referencia, payload, [])
+
+    relatorio = import_export.persist_imported_evaluations(
+        db,
+        usuario,
+        projeto.id,
+        [
+            linha(2, resultado_id=dor.id),
+            linha(3, referencia="Estudo A", desfecho="Náusea", direcao="Para cima"),
+            linha(4, resultado_id=999),
+            linha(5, referencia="Estudo A"),
+        ],
+        batch_size=3,
+    )
+
+    assert (relatorio["importados"], relatorio["falhas"]) == (2, 2)
+    status = [(item["linha"], item["status"]) for item in relatorio["linhas"]]
+    assert status == [(2, "importado"), (3, "importado"), (4, "falha"), (5, "falha")]
+    assert "Direção 'Para cima' inválida" in relatorio["linhas"][1]["avisos"][0]
+    db.expire_all()
+    assert [dom.tipo for dom in dor.avaliacao.dominios] == [1]
+    assert dor.avaliacao.id == existente.id
+    assert nausea.avaliacao.dominios[0].julgamento == dor.avaliacao.dominios[0].julgamento
+    assert nausea.fontes == {"comparador": "Placebo"}
+
+
+def test_linha_com_falha_de_gravacao_nao_deve_bloquear_o_resultado(monkeypatch, sessao_sqlite):
+    db = sessao_sqlite
+    usuario = models.User(nome="Ana", email="ana@example.com", senha_hash="x")
+    projeto = models.Project(nome="Projeto")
+    estudo = models.Study(projeto=projeto, referencia="Estudo A", resultados=[models.Result(desfecho="Dor")])
+    db.add_all([usuario, projeto])
+    db.commit()
+    resultado_id = estudo.resultados[0].id
+    gravar = import_export._write_import_batch
+
+    def gravar_falhando_linha_2(db, usuario_id, projeto_id, itens):
+        if any(item["entry"]["linha"] == 2 for item in itens):
+            raise import_export.SQLAlchemyError("falha simulada")
+        return gravar(db, usuario_id, projeto_id, itens)
+
+    monkeypatch.setattr(import_export, "_write_import_batch", gravar_falhando_linha_2)
+    payload = {"resultado": {}, "dominios": [{"tipo": 1, "respostas": {"1.1": "Y"}}]}
+    linhas = [import_export.ImportedRow(numero, resultado_id, None, payload, []) for numero in (2, 3, 4)]
+
+    em_lotes_unitarios = import_export.persist_imported_evaluations(db, usuario, projeto.id, linhas, batch_size=1)
+    no_mesmo_lote = import_export.persist_imported_evaluations(db, usuario, projeto.id, linhas[:2], batch_size=2)
+
+    assert [item["status"] for item in em_lotes_unitarios["linhas"]] == ["falha", "importado", "falha"]
+    assert em_lotes_unitarios["linhas"][2]["erro"] == f"Resultado {resultado_id} já importado na linha 3."
+    assert [item["erro"] for item in no_mesmo_lote["linhas"]] == [
+        "Falha ao gravar avaliação: SQLAlchemyError",
+        f"Resultado {resultado_id} não importado: a gravação da linha 2 falhou.",
+    ]
+
+
+def test_iter_archive_evaluations_deve_ler_planilhas_do_zip(tmp_path):
+    criar_planilha_exemplo(tmp_path / "avaliacao.xlsx")
+    arquivo = BytesIO()
+    with zipfile.ZipFile(arquivo, "w") as zip_file:
+        zip_file.write(tmp_path / "avaliacao.xlsx", "revisor1/avaliacao_resultado_7.xlsx")
+        zip_file.writestr("notas.txt", "sem planilha")
+    arquivo.seek(0)
+
+    assert import_export.is_workbook_archive(arquivo)
+    eventos = []
+    linhas = list(import_export.iter_archive_evaluations(arquivo, eventos, max_workers=1))
+
+    assert [(linha.resultado_id, linha.source) for linha in linhas] == [(7, "revisor1/avaliacao_resultado_7.xlsx")]
+    assert linhas[0].payload["resultado"]["desfecho"] == "Dor"
+    assert sorted((evento["arquivo"], evento["linhas"]) for evento in eventos) == [
+        ("notas.txt", 0),
+        ("revisor1/avaliacao_resultado_7.xlsx", 1),
+    ]
+
+
+def test_iter_archive_evaluations_deve_isolar_planilha_corrompida(tmp_path, sessao_sqlite):
+    db = sessao_sqlite
+    usuario = models.User(nome="Ana", email="ana@example.com", senha_hash="x")
+    projeto = models.Project(nome="Projeto")
+    estudo = models.Study(projeto=projeto, referencia="Estudo A")
+    estudo.resultados = [models.Result(desfecho="Dor")]
+    db.add_all([usuario, projeto])
+    db.commit()
+    resultado = estudo.resultados[0]
+
+    criar_planilha_exemplo(tmp_path / "avaliacao.xlsx")
+    corrompida = BytesIO()
+    with zipfile.ZipFile(tmp_path / "avaliacao.xlsx") as origem, zipfile.ZipFile(corrompida, "w") as destino:
+        for info in origem.infolist():
+            dados = b"<worksheet><sheetData>" if info.filename == "xl/worksheets/sheet1.xml" else origem.read(info)
+            destino.writestr(info, dados)
+    arquivo = BytesIO()
+    with zipfile.ZipFile(arquivo, "w") as zip_file:
+        zip_file.writestr("avaliacao_resultado_999.xlsx", corrompida.getvalue())
+        zip_file.write(tmp_path / "avaliacao.xlsx", f"avaliacao_resultado_{resultado.id}.xlsx")
+    arquivo.seek(0)
+
+    eventos = []
+    linhas = import_export.iter_archive_evaluations(arquivo, eventos, max_workers=1)
+    relatorio = import_export.persist_imported_evaluations(db, usuario, projeto.id, linhas)
+
+    assert (relatorio["importados"], relatorio["falhas"]) == (1, 0)
+    erros = {evento["arquivo"]: evento["erro"] for evento in eventos}
+    assert erros == {
+        "avaliacao_resultado_999.xlsx": "Arquivo não é uma planilha Excel válida.",
+        f"avaliacao_resultado_{resultado.id}.xlsx": None,
+    }
+    db.expire_all()
+    assert resultado.avaliacao.julgamento_global is not None
+
+
+def test_parse_workbook_member_nao_deve_mascarar_erros_de_programacao(monkeypatch):
+    def falhar(*args):
+        raise TypeError("bug")
+
+    monkeypatch.setattr(import_export, "iter_workbook_evaluations", falhar)
+
+    with pytest.raises(TypeError):
+        import_export.parse_workbook_member("avaliacao.xlsx", b"")
+
+
+def test_formatos_planos_devem_fazer_ida_e_volta_com_o_mapeamento():
+    registro = {
+        "resultado": {"id": 5, "desfecho": "Dor", "fontes": {"comparador": "Placebo"}},
+        "estudo": {"referencia": "Estudo X", "desenho": "Paralelo"},
+        "avaliacao": {"pre_consideracoes": None, "julgamento_global": "Baixo", "direcao_global": "NA"},
+        "dominios": {1: {"respostas": {"1.1": "Y", "1.2": "PN"}, "comentarios": "a, b;\n\"c\"", "observacoes_itens": {}, "julgamento": "Baixo", "direcao": "NA"}},
+    }
+
+    for exportar, importar in (
+        (import_export.iter_csv_export, import_export.iter_csv_evaluations),
+        (import_export.iter_ndjson_export, import_export.iter_ndjson_evaluations),
+    ):
+        conteudo = b"".join(exportar([registro]))
+        avisos = []
+        (linha,) = list(importar(BytesIO(conteudo), avisos))
+
+        assert avisos == []
+        assert (linha.resultado_id, linha.referencia) == (5, "Estudo X")
+        assert linha.payload["resultado"]["comparador"] == "Placebo"
+        assert linha.payload["dominios"][0]["respostas"] == {"1.1": "Y", "1.2": "PN"}
+        assert linha.payload["dominios"][0]["comentarios"] == "a, b;\n\"c\""
+
+
+def test_iter_csv_evaluations_deve_aceitar_ponto_e_virgula_e_colunas_parciais():
+    conteudo = "\ufeffResultadoId;Dominio2.Q2_1;Extra\n8;N;x\n;;\n".encode("utf-8")
+    avisos = []
+
+    linhas = list(import_export.iter_csv_evaluations(BytesIO(conteudo), avisos))
+
+    assert [(linha.resultado_id, linha.payload["dominios"][0]["respostas"]) for linha in linhas] == [(8, {"2.1": "N"})]
+    assert avisos == ["Coluna 'Extra' não mapeada foi ignorada."]
@@ -0,0 +1,26 @@
+import json
+from io import BytesIO
+
+from backend.app import ingest
+
+
+def test_ingest_studies_deve_devolver_ids_na_ordem_das_linhas(criar_projeto):
+    db, usuario, projeto, _ = criar_projeto(0)
+    linhas = [
+        {"referencia": "Silva 2020", "resultados": [{"desfecho": "Dor"}, {"desfecho": "Náusea", "medida_efeito": "RR"}]},
+        {"referencia": "", "resultados": []},
+        {"referencia": "Souza 2021", "desenho": "Cluster"},
+        {"referencia": "Lima 2022", "resultados": [{"desfecho": "Óbito", "fontes": {"pagina": 4}}]},
+    ]
+    corpo = BytesIO("\n".join(json.dumps(linha) for linha in linhas).encode("utf-8") + b"\n{quebrado\n")
+
+    relatorio = ingest.ingest_studies(db, projeto.id, ingest.iter_study_lines(corpo), batch_size=2)
+
+    assert (relatorio["estudos"], relatorio["resultados"], relatorio["falhas"]) == (3, 3, 2)
+    assert [item["status"] for item in relatorio["linhas"]] == ["importado", "falha", "importado", "importado", "falha"]
+    pagina = ingest.list_studies(db, projeto.id)
+    por_estudo = {estudo.id: [r.id for r in estudo.resultados] for estudo in pagina["itens"]}
+    importados = [item for item in relatorio["linhas"] if item["status"] == "importado"]
+    assert all(por_estudo[item["estudo_id"]] == item["resultado_ids"] for item in importados)
+    assert [estudo.referencia for estudo in pagina["itens"]][-3:] == ["Silva 2020", "Souza 2021", "Lima 2022"]
+    assert pagina["itens"][-1].resultados[0].fontes == {"pagina": 4}
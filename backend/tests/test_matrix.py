@@ -0,0 +1,52 @@
+import struct
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import matrix, models
+
+
+def criar_projeto():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    projeto = models.Project(nome="Projeto")
+    estudo_b = models.Study(projeto=projeto, referencia="B")
+    estudo_a = models.Study(projeto=projeto, referencia="A")
+    estudo_a.resultados = [models.Result(desfecho="Dor"), models.Result(desfecho="Náusea")]
+    estudo_b.resultados = [models.Result(desfecho="Dor")]
+    avaliacao = models.Evaluation(resultado=estudo_a.resultados[0], julgamento_global="Alto")
+    avaliacao.dominios = [
+        models.Domain(tipo=1, respostas={}, julgamento="Baixo"),
+        models.Domain(tipo=3, respostas={}, julgamento="Algumas preocupações"),
+    ]
+    db.add_all([projeto, avaliacao])
+    db.commit()
+    return db, projeto, estudo_a, estudo_b
+
+
+def test_load_project_matrix_deve_retornar_colunas_paralelas():
+    db, projeto, estudo_a, estudo_b = criar_projeto()
+
+    dados = matrix.load_project_matrix(db, projeto.id)
+    json_dados = matrix.matrix_to_json(projeto.id, dados)
+
+    assert json_dados["estudo_ids"] == [estudo_a.id, estudo_a.id, estudo_b.id]
+    assert json_dados["desfechos"] == ["Dor", "Náusea", "Dor"]
+    assert json_dados["estudos"] == {str(estudo_a.id): "A", str(estudo_b.id): "B"}
+    d1, d2, d3, _, _, global_ = json_dados["julgamentos"]
+    assert (d1, d2, d3, global_) == ([1, 0, 0], [0, 0, 0], [2, 0, 0], [3, 0, 0])
+
+
+def test_matrix_to_binary_deve_usar_typed_arrays_little_endian():
+    db, projeto, _, _ = criar_projeto()
+    dados = matrix.load_project_matrix(db, projeto.id)
+
+    payload = matrix.matrix_to_binary(dados)
+
+    magic, versao, colunas, _, linhas = struct.unpack_from("<4sBBHI", payload)
+    assert (magic, versao, colunas, linhas) == (b"RB2M", 1, 6, 3)
+    assert list(struct.unpack_from("<3i", payload, 12)) == dados["resultado_ids"].tolist()
+    codigos_offset = 12 + 8 * linhas
+    assert payload[codigos_offset + 5 * linhas:] == bytes([3, 0, 0])
+    assert len(payload) == codigos_offset + colunas * linhas
@@ -0,0 +1,41 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from backend.app import metrics, rule_engine
+
+
+def test_middleware_deve_registrar_latencia_por_modelo_de_rota():
+    metrics.reset()
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/itens/{item_id}")
+    def obter(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/itens/1")
+    client.get("/itens/2")
+    client.get("/outra")
+
+    texto = metrics.render()
+    assert 'rob2_http_requests_total{metodo="GET",rota="/itens/{item_id}",status="200"} 2' in texto
+    assert f'rob2_http_requests_total{{metodo="GET",rota="{metrics.UNMATCHED_ROUTE}",status="404"}} 1' in texto
+    assert 'rob2_http_request_duration_seconds_bucket{metodo="GET",rota="/itens/{item_id}",le="+Inf"} 2' in texto
+    assert "rob2_http_requests_in_progress 0" in texto
+
+
+def test_render_deve_incluir_contadores_do_motor_e_pool():
+    metrics.reset()
+    rule_engine.evaluate_domain(1, {"1.1": "Y"})
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+    with engine.connect():
+        metrics.record_pool_stats(engine)
+
+    texto = metrics.render()
+    assert "# TYPE rob2_rule_evaluations_total counter" in texto
+    assert 'rob2_rule_evaluations_total{dominio="1"} 1' in texto
+    assert 'rob2_db_pool_connections{estado="em_uso"} 1' in texto
+    assert 'rob2_db_pool_connections{estado="tamanho"} 3' in texto
@@ -0,0 +1,36 @@
+from sqlalchemy import select
+
+from backend.app import models, query_profiling
+
+
+def assert_max_queries(response, maximum):
+    """Falha se a rota fez mais de ``maximum`` consultas (cabeçalho X-DB-Queries)."""
+    total = int(response.headers["x-db-queries"])
+    rota = f"{response.request.method} {response.request.url.path}"
+    assert total <= maximum, f"{rota} fez {total} consultas (máximo {maximum})"
+
+
+def test_listagem_de_estudos_deve_ter_consultas_constantes(cliente_api):
+    client, _, _, projeto, _ = cliente_api(3)
+    pequeno = client.get(f"/api/projects/{projeto.id}/studies")
+    client, _, _, projeto, _ = cliente_api(30)
+    grande = client.get(f"/api/projects/{projeto.id}/studies")
+
+    assert grande.json()["total"] == 30
+    assert grande.headers["x-db-queries"] == pequeno.headers["x-db-queries"]
+    assert_max_queries(grande, 6)
+    assert grande.headers["server-timing"].startswith("db;dur=")
+
+
+def test_count_queries_deve_apontar_instrucoes_repetidas(cliente_api):
+    _, db, _, projeto, _ = cliente_api(4)
+    projeto_id = projeto.id
+    db.expire_all()
+
+    with query_profiling.count_queries() as stats:
+        estudos = db.execute(select(models.Study).where(models.Study.projeto_id == projeto_id)).scalars().all()
+        for estudo in estudos:
+            estudo.resultados  # carga preguiçosa: uma consulta por estudo
+
+    assert stats.count == 5
+    assert [total for _, total in stats.repeated(threshold=4)] == [4]
@@ -0,0 +1,54 @@
+from backend.app import import_export, revisions
+
+
+def estado(respostas, julgamento="Baixo", **extras):
+    dominios = {"1": {"respostas": respostas, "comentarios": None, "observacoes_itens": {}, "julgamento": julgamento, "direcao": "NA"}}
+    dominios.update(extras)
+    return {"avaliacao": {"pre_consideracoes": None, "julgamento_global": julgamento, "direcao_global": "NA"}, "dominios": dominios}
+
+
+def test_delta_deve_guardar_apenas_respostas_alteradas():
+    anterior = estado({"1.1": "Y", "1.2": "Y", "1.3": "N"})
+    novo = estado({"1.1": "Y", "1.2": "N"}, julgamento="Alto")
+
+    delta = revisions.state_delta(anterior, novo)
+
+    assert delta["dominios"]["1"]["respostas"] == {"alterados": {"1.2": "N"}, "removidos": ["1.3"]}
+    assert revisions.apply_delta(anterior, delta) == novo
+    assert revisions.state_delta(novo, novo) == {}
+    com_dominio_2 = estado({"1.1": "Y"}, **{"2": novo["dominios"]["1"]})
+    delta = revisions.state_delta(com_dominio_2, novo)
+    assert delta["dominios"]["2"] is None
+    assert revisions.apply_delta(com_dominio_2, delta) == novo
+
+
+def test_reconstrucao_deve_partir_do_ultimo_checkpoint(monkeypatch, criar_projeto):
+    monkeypatch.setattr(revisions, "REVISION_CHECKPOINT_INTERVAL", 3)
+    db, usuario, projeto, resultados = criar_projeto(1)
+    avaliacao = revisions.models.Evaluation(resultado_id=resultados[0].id)
+    db.add(avaliacao)
+    db.flush()
+
+    estados = [estado({"1.1": "Y", "1.2": codigo}) for codigo in ("Y", "PY", "PN", "N", "NI")]
+    anterior = revisions.EMPTY_STATE
+    for atual in estados:
+        revisions.record_revision(db, avaliacao.id, usuario.id, anterior, atual)
+        anterior = atual
+
+    lista = revisions.list_revisions(db, avaliacao.id)
+    assert [item["checkpoint"] for item in lista] == [True, False, False, True, False]
+    reconstruidos = revisions.reconstruct(db, avaliacao.id, 2, 5)
+    assert reconstruidos == {2: estados[1], 5: estados[4]}
+    diff = revisions.diff_states(reconstruidos[2], reconstruidos[5])
+    assert diff == {"dominios": {"1": {"respostas": {"1.2": {"de": "PY", "para": "NI"}}}}}
+
+
+def test_reimportacao_deve_incrementar_versao_e_gravar_checkpoint(criar_projeto, linha):
+    db, usuario, projeto, resultados = criar_projeto(2)
+    for respostas in ({"1.1": "Y"}, {"1.1": "N"}):
+        import_export.persist_imported_evaluations(db, usuario, projeto.id, [linha(r, respostas) for r in resultados])
+    db.expire_all()
+
+    avaliacao = resultados[0].avaliacao
+    assert avaliacao.versao == 2
+    assert [item["checkpoint"] for item in revisions.list_revisions(db, avaliacao.id)] == [True, True]
@@ -0,0 +1,40 @@
+from backend.app import import_export, summary
+
+
+def test_resumo_deve_acompanhar_gravacoes_incrementais(criar_projeto, linha):
+    db, usuario, projeto, resultados = criar_projeto(3)
+    baixo = {"1.1": "Y", "1.2": "Y", "1.3": "N"}
+    alto = {"1.1": "N", "1.2": "N", "1.3": "Y"}
+
+    import_export.persist_imported_evaluations(db, usuario, projeto.id, [linha(r, baixo) for r in resultados])
+    primeira = summary.serialize_summary(summary.ensure_summary(db, projeto.id))
+    import_export.persist_imported_evaluations(db, usuario, projeto.id, [linha(resultados[0], alto)])
+    db.expire_all()
+    segunda = summary.serialize_summary(summary.ensure_summary(db, projeto.id))
+
+    assert primeira["avaliacoes"] == segunda["avaliacoes"] == 3
+    assert segunda["versao"] == primeira["versao"] + 1
+    recalculado = summary._count_project(db, projeto.id)
+    resumo = summary.ensure_summary(db, projeto.id)
+    assert all(getattr(resumo, coluna) == valor for coluna, valor in recalculado.items())
+    assert segunda["dominios"]["1"]["Alto"] == primeira["dominios"]["1"]["Alto"] + 1
+
+
+def test_snapshot_delta_deve_ignorar_julgamentos_sem_categoria():
+    anterior = ({1: "Baixo", 2: None}, "Baixo")
+    novo = ({1: "Alto", 2: "Algumas preocupações"}, "Alto")
+
+    delta = summary.snapshot_delta([(anterior, novo), (summary.EMPTY_SNAPSHOT, ({}, "NA"))])
+
+    assert delta == {"d1_baixo": -1, "d1_alto": 1, "d2_algumas": 1, "global_baixo": -1, "global_alto": 1}
+
+
+def test_gravacao_em_lote_deve_avaliar_dominios_em_uma_passada(monkeypatch, criar_projeto, linha):
+    db, usuario, projeto, resultados = criar_projeto(4)
+    chamadas = []
+    original = import_export.rule_engine.evaluate_domains
+    monkeypatch.setattr(import_export.rule_engine, "evaluate_domains", lambda itens: chamadas.append(1) or original(itens))
+
+    relatorio = import_export.persist_imported_evaluations(db, usuario, projeto.id, [linha(r, {"1.1": "Y"}) for r in resultados])
+
+    assert relatorio["importados"] == 4 and len(chamadas) == 1
@@ -0,0 +1,53 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app import tracing
+
+
+@tracing.traced("renderizacao")
+def renderizar(aninhado=False):
+    return renderizar() if aninhado else b"ok"
+
+
+def criar_app():
+    app = FastAPI(default_response_class=tracing.TracedJSONResponse)
+    app.add_middleware(tracing.TracingMiddleware)
+
+    @app.get("/itens/{item_id}")
+    def item(item_id: int):
+        with tracing.span("auth"):
+            pass
+        renderizar(aninhado=True)
+        return {"id": item_id}
+
+    return TestClient(app)
+
+
+def test_requisicao_amostrada_deve_publicar_etapas(monkeypatch, tmp_path):
+    destino = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(tracing, "SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(destino))
+
+    response = criar_app().get("/itens/7")
+
+    timing = response.headers["server-timing"]
+    assert 'renderizacao;dur=' in timing and 'desc="1 chamadas"' in timing
+    assert "auth;dur=" in timing and "serializacao;dur=" in timing and "total;dur=" in timing
+    registro = json.loads(destino.read_text(encoding="utf-8"))
+    assert registro["rota"] == "/itens/{item_id}" and registro["status"] == 200
+    assert registro["etapas"]["renderizacao"]["chamadas"] == 1
+    assert [span["nome"] for span in registro["spans"]] == ["auth", "renderizacao", "serializacao"]
+
+
+def test_rastreamento_desligado_nao_deve_medir(monkeypatch, tmp_path):
+    destino = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(tracing, "SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(destino))
+
+    response = criar_app().get("/itens/7")
+
+    assert "server-timing" not in response.headers
+    assert not destino.exists()
+    assert tracing.span("auth") is tracing.span("regras")